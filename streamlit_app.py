@@ -1,5 +1,8 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import requests
+import urllib3
+import io
 import json
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
@@ -9,7 +12,27 @@ import datetime
 import random
 import urllib.parse
 import html
+from html.parser import HTMLParser
 import textwrap
+import numpy as np
+import os
+import sys
+import sqlite3
+import threading
+import hashlib
+import functools
+import socket
+import uuid
+import tempfile
+import zlib
+import codecs
+import math
+import heapq
+import bisect
+import collections
+import concurrent.futures
+import email.utils
+import xml.etree.ElementTree as ET
 
 # -----------------------------------------------------------------------------
 # 0. DEPENDENCY CHECK
@@ -32,16 +55,220 @@ except:
     NEWS_API_KEY = None
     KEYS_LOADED = False
 
+def get_setting(name, default=None):
+    """Read an optional setting from st.secrets, falling back to environment variables."""
+    try:
+        value = st.secrets.get(name, None)
+    except:
+        value = None
+    if value is None:
+        value = os.environ.get(name, default)
+    return value
+
+# Upstream endpoints (overridable to point at stand-in servers, e.g. tools/loadtest.py)
+GAMMA_API_BASE = get_setting("GAMMA_API_BASE", "https://gamma-api.polymarket.com")
+BINANCE_API_BASE = get_setting("BINANCE_API_BASE", "https://api.binance.com")
+EXA_API_BASE = get_setting("EXA_API_BASE", "https://api.exa.ai")
+GEMINI_API_ENDPOINT = get_setting("GEMINI_API_ENDPOINT")
+
+# ================= 📼 NETWORK RECORD / REPLAY =================
+# BEHOLMES_NET_MODE=record  -> every upstream exchange is also written to BEHOLMES_ARCHIVE
+# BEHOLMES_NET_MODE=replay  -> the app is served entirely from the archive (no keys, no network)
+# REPLAY_TIME_SCALE: 1 = original upstream timing, 0.1 = 10x faster, 0 = instant
+NET_MODE = str(get_setting("BEHOLMES_NET_MODE", "live")).lower()
+NET_ARCHIVE_PATH = get_setting("BEHOLMES_ARCHIVE") or os.path.join(tempfile.gettempdir(), "beholmes_archive.sqlite3")
+REPLAY_TIME_SCALE = float(get_setting("REPLAY_TIME_SCALE", 1.0))
+
+def exchange_key(method, url, body=None):
+    """Stable fingerprint of a request: method, URL with sorted query, hash of the body."""
+    parts = urllib.parse.urlsplit(url)
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True)))
+    key = f"{method.upper()} {parts.scheme}://{parts.netloc}{parts.path}?{query}"
+    if body:
+        if isinstance(body, str): body = body.encode("utf-8")
+        key += " #" + hashlib.sha1(body).hexdigest()[:16]
+    return key
+
+class NetArchive:
+    """
+    Compact on-disk archive of upstream exchanges (SQLite).
+    Bodies are zlib-compressed and stored once per content hash, so repeated polls of
+    an unchanged feed cost a row, not a copy. Repeated requests for the same key are
+    replayed in recorded order; once exhausted, the last recording keeps being served.
+    """
+    def __init__(self, path, time_scale=1.0):
+        self.path = path
+        self.time_scale = time_scale
+        self._lock = threading.Lock()
+        self._cursors = collections.Counter()
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = collections.Counter()
+        self.conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS blobs (sha TEXT PRIMARY KEY, data BLOB)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS exchanges (id INTEGER PRIMARY KEY, kind TEXT, key TEXT, status INTEGER, "
+            "reason TEXT, headers TEXT, body_sha TEXT, elapsed REAL, recorded_at REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS exchanges_key ON exchanges (key, id)")
+
+    def record(self, kind, key, body, elapsed, status=200, reason="OK", headers=None):
+        sha = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            self.conn.execute("INSERT OR IGNORE INTO blobs (sha, data) VALUES (?, ?)", (sha, zlib.compress(body, 6)))
+            self.conn.execute(
+                "INSERT INTO exchanges (kind, key, status, reason, headers, body_sha, elapsed, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, key, status, reason, json.dumps(headers or {}), sha, elapsed, time.time())
+            )
+            self.recorded += 1
+
+    def replay(self, key):
+        """Next recorded exchange for `key` as a dict (after the scaled original delay), or None."""
+        with self._lock:
+            n = self._cursors[key]
+            rows = self.conn.execute(
+                "SELECT e.status, e.reason, e.headers, b.data, e.elapsed FROM exchanges e JOIN blobs b ON b.sha = e.body_sha "
+                "WHERE e.key = ? ORDER BY e.id LIMIT 2 OFFSET ?", (key, max(n - 1, 0))
+            ).fetchall()
+            if not rows:
+                self.misses[key] += 1
+                return None
+            row = rows[-1] if n > 0 else rows[0]
+            self._cursors[key] += 1
+            self.replayed += 1
+        status, reason, headers, data, elapsed = row
+        if self.time_scale > 0 and elapsed:
+            time.sleep(elapsed * self.time_scale)
+        return {"status": status, "reason": reason, "headers": json.loads(headers), "body": zlib.decompress(data)}
+
+    def stats(self):
+        with self._lock:
+            exchanges, stored = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM exchanges, blobs WHERE blobs.sha = exchanges.body_sha").fetchone()
+        return {"mode": NET_MODE, "exchanges": exchanges, "stored_bytes": stored, "recorded": self.recorded, "replayed": self.replayed, "misses": sum(self.misses.values())}
+
+def _rebuild_response(adapter, request, status, reason, headers, body):
+    """A requests.Response around an in-memory body, so stream/iter_content/raw all keep working."""
+    headers = {k: v for k, v in headers.items() if k.lower() not in ("content-encoding", "transfer-encoding", "content-length")}
+    raw = urllib3.HTTPResponse(
+        body=io.BytesIO(body), headers=headers, status=status, reason=reason,
+        preload_content=False, decode_content=False, request_method=request.method,
+    )
+    return adapter.build_response(request, raw)
+
+class _TeeRaw:
+    """
+    Stand-in for a urllib3 response body that copies every chunk read through it,
+    whether the caller goes through iter_content (raw.stream) or reads raw directly
+    (ET.iterparse in stream_feed_entries). `on_eof` runs once the body is exhausted.
+    """
+    def __init__(self, raw, chunks, on_eof):
+        object.__setattr__(self, "_raw", raw)
+        object.__setattr__(self, "_chunks", chunks)
+        object.__setattr__(self, "_on_eof", on_eof)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._raw, name, value)   # e.g. decode_content
+
+    def read(self, amt=None, *args, **kwargs):
+        data = self._raw.read(amt, *args, **kwargs)
+        if data: self._chunks.append(data)
+        if not data or amt is None: self._on_eof()
+        return data
+
+    def stream(self, *args, **kwargs):
+        for chunk in self._raw.stream(*args, **kwargs):
+            if chunk: self._chunks.append(chunk)
+            yield chunk
+        self._on_eof()
+
+def _tee_stream(resp, record):
+    """
+    Keep a streamed response streaming while recording it: the body is copied aside
+    as the caller reads it and recorded once exhausted or when the response is closed.
+    A caller that stops early (a size cap, a parser that found its closing bracket,
+    a feed reader that reached seen entries) gets exactly the prefix it read recorded,
+    and replayed. Readers of resp.raw should set decode_content, as the archive keeps
+    decoded bodies.
+    """
+    live_close, chunks, done = resp.close, [], []
+
+    def finish():
+        if not done:
+            done.append(True)
+            record(b"".join(chunks))
+
+    def close():
+        finish()
+        live_close()
+
+    resp.raw = _TeeRaw(resp.raw, chunks, finish)
+    resp.close = close
+    return resp
+
+def install_http_archive(archive):
+    """Route every requests.Session through the archive (idempotent; the latest archive wins)."""
+    adapter_cls = requests.adapters.HTTPAdapter
+    adapter_cls._net_archive = archive
+    if hasattr(adapter_cls, "_live_send"): return
+    adapter_cls._live_send = adapter_cls.send
+
+    def send(self, request, **kwargs):
+        archive = adapter_cls._net_archive
+        key = exchange_key(request.method, request.url, request.body)
+        if NET_MODE == "replay":
+            hit = archive.replay(key)
+            if hit is None:
+                raise requests.ConnectionError(f"Not in archive: {key}")
+            return _rebuild_response(self, request, hit["status"], hit["reason"], hit["headers"], hit["body"])
+        start = time.monotonic()
+        resp = adapter_cls._live_send(self, request, **kwargs)
+        record = lambda body: archive.record("http", key, body, time.monotonic() - start, resp.status_code, resp.reason or "", dict(resp.headers))
+        if kwargs.get("stream"):
+            return _tee_stream(resp, record)
+        body = resp.content
+        record(body)
+        return _rebuild_response(self, request, resp.status_code, resp.reason, dict(resp.headers), body)
+
+    adapter_cls.send = send
+
+@st.cache_resource(show_spinner=False)
+def get_net_archive():
+    archive = NetArchive(NET_ARCHIVE_PATH, REPLAY_TIME_SCALE)
+    install_http_archive(archive)
+    return archive
+
+if NET_MODE in ("record", "replay"):
+    get_net_archive()
+    if NET_MODE == "replay":
+        # Placeholders so key-gated features light up; nothing leaves the machine
+        EXA_API_KEY = EXA_API_KEY or "replay"
+        GOOGLE_API_KEY = GOOGLE_API_KEY or "replay"
+
 if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
+    if GEMINI_API_ENDPOINT:
+        genai.configure(api_key=GOOGLE_API_KEY, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+    else:
+        genai.configure(api_key=GOOGLE_API_KEY)
 
 # ================= 🛠️ DEPENDENCY CHECK (EXA) =================
 try:
     from exa_py import Exa
+    from exa_py.api import ExaJSONEncoder
     EXA_AVAILABLE = True
 except ImportError:
     EXA_AVAILABLE = False
 
+# ================= 🛠️ DEPENDENCY CHECK (OPENAI) =================
+try:
+    from openai import OpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
 # ================= 🕵️‍♂️ 2. SYSTEM CONFIGURATION =================
 st.set_page_config(
     page_title="Be Holmes | News Analysis",
@@ -52,22 +279,170 @@ st.set_page_config(
 
 # ================= 🧠 3. STATE MANAGEMENT =================
 default_state = {
-    "messages": [],
-    "current_market": None,
-    "search_candidates": [],     # Stores list of found markets
+    "session_id": uuid.uuid4().hex,
+    "messages": [],              # Recent turns only (older ones are spilled to disk)
+    "archived_turns": 0,
+    "current_market_slug": None,
+    "search_candidates": [],     # Slugs of found markets (payloads live in the shared MarketStore)
     "search_stage": "input",     # input -> selection -> analysis
+    "search_degraded": [],       # Search stages cut short by the time budget
     "user_news_text": "",
     "is_processing": False,
     "last_user_input": "",
     "news_category": "all",
     "market_sort": "volume",
-    "debug_logs": []             # Store debug info
+    "debug_logs": [],            # Store debug info
+    "analysis_job": None,        # Id of this session's job in the analysis queue
+    "watch_alerts_seen": 0.0,    # Timestamp of the newest watchlist alert already toasted
+    "parked": False,             # Idle session: payload moved to the transcript spill
+    "last_active": 0.0
 }
 
 for key, value in default_state.items():
     if key not in st.session_state:
         st.session_state[key] = value
 
+# --- ⏱️ Rerun Profiler (?profile=1 if PROFILE_ON_REQUEST, or PROFILE_SAMPLE_RATE) ---
+# A sampling profiler for script reruns and fragment ticks. A helper thread reads the
+# script thread's stack every PROFILE_INTERVAL via sys._current_frames() and charges
+# the elapsed wall time, and the thread's CPU time (pthread CPU clock, Linux), to that
+# stack. It stops by itself once the frame that started it has returned (this also
+# covers st.rerun / st.stop), then writes <label>.folded and <label>.speedscope.json
+# to PROFILE_DIR, which keeps the newest PROFILE_KEEP profiles. Sampling a few percent
+# of production reruns costs ~1 stack walk per 5ms. The ?profile=1 switch is an operator
+# tool (any visitor could otherwise fill the disk), off unless PROFILE_ON_REQUEST is set.
+PROFILE_INTERVAL = 0.005
+PROFILE_MAX_SECONDS = 120
+PROFILE_SAMPLE_RATE = float(get_setting("PROFILE_SAMPLE_RATE", 0) or 0)
+PROFILE_ON_REQUEST = str(get_setting("PROFILE_ON_REQUEST", "off")).lower() in ("1", "on", "true", "yes")
+PROFILE_DIR = get_setting("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "beholmes_profiles")
+PROFILE_KEEP = int(get_setting("PROFILE_KEEP", 50))
+
+@st.cache_resource
+def get_profile_store():
+    """Process-wide: {"active": {thread id: profiler}, "finished": deque of recent summaries (newest last)}."""
+    return {"active": {}, "finished": collections.deque(maxlen=20)}
+
+class RerunProfiler:
+    def __init__(self, label, anchor, thread_id, store):
+        self.label = label
+        self.anchor = anchor
+        self.thread_id = thread_id
+        self.store = store
+        self.stacks = collections.defaultdict(lambda: [0.0, 0.0])   # stack tuple -> [wall s, cpu s]
+        self.started_at = time.time()
+        try: self.cpu_clock = time.pthread_getcpuclockid(thread_id)
+        except (AttributeError, OSError): self.cpu_clock = None
+
+    def _cpu(self):
+        if self.cpu_clock is None: return 0.0
+        try: return time.clock_gettime(self.cpu_clock)
+        except OSError: return 0.0
+
+    def _stack(self, frame):
+        """Frames from the anchor down to the leaf, or None once the anchor has returned."""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            if frame is self.anchor:
+                return tuple(reversed(names))
+            frame = frame.f_back
+        return None
+
+    def _run(self):
+        last_wall, last_cpu = time.perf_counter(), self._cpu()
+        deadline = last_wall + PROFILE_MAX_SECONDS
+        try:
+            while True:
+                time.sleep(PROFILE_INTERVAL)
+                frame = sys._current_frames().get(self.thread_id)
+                stack = self._stack(frame) if frame is not None else None
+                now, cpu = time.perf_counter(), self._cpu()
+                if stack is None or now > deadline: break
+                cell = self.stacks[stack]
+                cell[0] += now - last_wall
+                cell[1] += max(cpu - last_cpu, 0.0)
+                last_wall, last_cpu = now, cpu
+        finally:
+            self.anchor = None
+            self.store["active"].pop(self.thread_id, None)
+            if self.stacks:
+                self._export()
+
+    def summary(self, top=15):
+        """Per-function self / total wall and CPU milliseconds, heaviest self-wall first."""
+        funcs = collections.defaultdict(lambda: [0.0, 0.0, 0.0, 0.0])    # self wall, total wall, self cpu, total cpu
+        for stack, (wall, cpu) in self.stacks.items():
+            funcs[stack[-1]][0] += wall
+            funcs[stack[-1]][2] += cpu
+            for name in set(stack):
+                funcs[name][1] += wall
+                funcs[name][3] += cpu
+        rows = sorted(funcs.items(), key=lambda kv: kv[1][0], reverse=True)[:top]
+        return [{"function": name, "self ms": round(v[0] * 1000, 1), "total ms": round(v[1] * 1000, 1),
+                 "self cpu ms": round(v[2] * 1000, 1), "total cpu ms": round(v[3] * 1000, 1)} for name, v in rows]
+
+    def _export(self):
+        stamp = datetime.datetime.fromtimestamp(self.started_at).strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(PROFILE_DIR, f"{stamp}-{re.sub(r'[^A-Za-z0-9_.-]+', '_', self.label)}-{uuid.uuid4().hex[:6]}")
+        wall = sum(w for w, _ in self.stacks.values())
+        cpu = sum(c for _, c in self.stacks.values())
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            with open(base + ".folded", "w", encoding="utf-8") as fh:     # flamegraph.pl / speedscope / inferno
+                for stack, (w, _) in self.stacks.items():
+                    fh.write(f"{';'.join(stack)} {int(w * 1e6)}\n")
+            frames, index = [], {}
+            def frame_ids(stack):
+                for name in stack:
+                    if name not in index:
+                        index[name] = len(frames)
+                        frames.append({"name": name})
+                return [index[n] for n in stack]
+            samples = [frame_ids(stack) for stack in self.stacks]
+            profile = lambda name, k, total: {"type": "sampled", "name": f"{self.label} ({name})", "unit": "milliseconds",
+                                              "startValue": 0, "endValue": total * 1000, "samples": samples,
+                                              "weights": [v[k] * 1000 for v in self.stacks.values()]}
+            with open(base + ".speedscope.json", "w", encoding="utf-8") as fh:
+                json.dump({"$schema": "https://www.speedscope.app/file-format-schema.json", "name": self.label,
+                           "exporter": "beholmes", "shared": {"frames": frames},
+                           "profiles": [profile("wall", 0, wall), profile("cpu", 1, cpu)]}, fh)
+        except OSError:
+            base = None
+        prune_profiles(PROFILE_DIR, PROFILE_KEEP)
+        self.store["finished"].append({"label": self.label, "at": self.started_at, "wall_ms": round(wall * 1000, 1),
+                                       "cpu_ms": round(cpu * 1000, 1), "files": base, "summary": self.summary()})
+
+def prune_profiles(directory, keep):
+    """Delete all but the newest `keep` profiles (each a .folded + .speedscope.json pair) in directory."""
+    try: names = os.listdir(directory)
+    except OSError: return
+    profiles = collections.defaultdict(list)
+    for name in names:
+        for ext in (".folded", ".speedscope.json"):
+            if name.endswith(ext): profiles[name[:-len(ext)]].append(name)
+    # Names start with the start time, so they sort oldest first
+    for base in sorted(profiles)[:max(len(profiles) - keep, 0)]:
+        for name in profiles[base]:
+            try: os.remove(os.path.join(directory, name))
+            except OSError: pass
+
+def maybe_profile(label):
+    """Profile the calling frame (script body or fragment) if ?profile=1 (when allowed) or the sample rate says so."""
+    try: requested = PROFILE_ON_REQUEST and st.query_params.get("profile") == "1"
+    except Exception: requested = False
+    if not requested and (PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE):
+        return
+    store = get_profile_store()
+    thread_id = threading.get_ident()
+    if thread_id in store["active"]: return     # already inside a profiled rerun
+    profiler = RerunProfiler(label, sys._getframe(1), thread_id, store)
+    store["active"][thread_id] = profiler
+    threading.Thread(target=profiler._run, daemon=True, name=f"profiler-{label}").start()
+
+maybe_profile("rerun")
+
 # ================= 🎨 4. UI THEME (MOBILE OPTIMIZED VERSION) =================
 st.markdown("""
 <style>
@@ -373,8 +748,277 @@ st.markdown("""
 
 # ================= 🧠 5. LOGIC CORE =================
 
+# --- 🗄️ Shared Cache Backend (Cross-Replica) ---
+# Every replica behind the load balancer reads the same backend, so only one of
+# them has to hit Gamma / RSS / Binance / Exa / Gemini per refresh window.
+# Values are stored as JSON with a "fresh until" stamp plus a longer stale window:
+# replicas that lose the refresh lease keep serving the stale copy meanwhile.
+REPLICA_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+class SharedCacheBackend:
+    """
+    Minimal key/value + lease interface shared by all replicas.
+    Mirrors the Redis primitives (GET / SET EX / SET NX PX / DEL) so that any
+    Redis-compatible server can back it.
+    """
+    def get(self, key):
+        """Returns (value, fresh_until) or None."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl, stale_ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def acquire_lease(self, name, ttl):
+        """Returns True if this replica now owns the lease."""
+        raise NotImplementedError
+
+    def release_lease(self, name):
+        raise NotImplementedError
+
+    def get_or_refresh(self, key, loader, ttl, stale_ttl=None, lease_ttl=30, wait=5.0, cacheable=None):
+        """
+        Serve a fresh entry if there is one. Otherwise exactly one replica (the
+        lease holder) runs `loader`; the others serve the stale copy or wait
+        briefly for the holder to publish.
+        """
+        now = time.time()
+        entry = self.get(key)
+        if entry and entry[1] > now:
+            return entry[0]
+
+        lease = f"lease:{key}"
+        if self.acquire_lease(lease, lease_ttl):
+            try:
+                value = loader()
+                if cacheable is None or cacheable(value):
+                    self.set(key, value, ttl, stale_ttl)
+                return value
+            finally:
+                self.release_lease(lease)
+
+        # Another replica is refreshing this dataset
+        if entry:
+            return entry[0]
+        deadline = now + wait
+        while time.time() < deadline:
+            time.sleep(0.2)
+            entry = self.get(key)
+            if entry:
+                return entry[0]
+        return loader()
+
+class SQLiteSharedCache(SharedCacheBackend):
+    """Local implementation: one SQLite file shared by all replicas on the host / volume."""
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, fresh_until REAL, expires_at REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT, expires_at REAL)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        try:
+            row = self._conn().execute(
+                "SELECT value, fresh_until FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+            if row: return json.loads(row[0]), row[1]
+        except: pass
+        return None
+
+    def set(self, key, value, ttl, stale_ttl=None):
+        now = time.time()
+        stale_ttl = max(stale_ttl or ttl * 10, ttl)
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, fresh_until, expires_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now + stale_ttl)
+            )
+            # Cheap housekeeping so the file doesn't grow forever
+            if random.random() < 0.02:
+                conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+        except: pass
+
+    def delete(self, key):
+        try: self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except: pass
+
+    def acquire_lease(self, name, ttl):
+        now = time.time()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != REPLICA_ID and row[1] > now:
+                conn.execute("COMMIT")
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)", (name, REPLICA_ID, now + ttl))
+            conn.execute("COMMIT")
+            return True
+        except:
+            try: conn.execute("ROLLBACK")
+            except: pass
+            # If the lease table is unavailable, fall back to refreshing locally
+            return True
+
+    def release_lease(self, name):
+        try: self._conn().execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, REPLICA_ID))
+        except: pass
+
+class RedisSharedCache(SharedCacheBackend):
+    """Adapter for any client exposing redis-py style get / set(ex, px, nx) / delete."""
+    def __init__(self, client, prefix="beholmes:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+            if raw:
+                payload = json.loads(raw)
+                return payload["v"], payload["f"]
+        except: pass
+        return None
+
+    def set(self, key, value, ttl, stale_ttl=None):
+        stale_ttl = max(stale_ttl or ttl * 10, ttl)
+        try:
+            payload = json.dumps({"v": value, "f": time.time() + ttl})
+            self.client.set(self.prefix + key, payload, ex=int(stale_ttl))
+        except: pass
+
+    def delete(self, key):
+        try: self.client.delete(self.prefix + key)
+        except: pass
+
+    def acquire_lease(self, name, ttl):
+        try:
+            return bool(self.client.set(self.prefix + name, REPLICA_ID, px=int(ttl * 1000), nx=True))
+        except:
+            return True
+
+    def release_lease(self, name):
+        try:
+            owner = self.client.get(self.prefix + name)
+            if owner and (owner.decode() if isinstance(owner, bytes) else owner) == REPLICA_ID:
+                self.client.delete(self.prefix + name)
+        except: pass
+
+@st.cache_resource
+def get_shared_cache():
+    """
+    SHARED_CACHE_URL=redis://... uses a Redis-compatible server (needs the `redis` package);
+    otherwise SHARED_CACHE_PATH (default: system temp dir) holds a SQLite cache.
+    """
+    url = get_setting("SHARED_CACHE_URL")
+    if url and url.startswith(("redis://", "rediss://")):
+        try:
+            import redis
+            return RedisSharedCache(redis.Redis.from_url(url))
+        except Exception:
+            pass
+    path = get_setting("SHARED_CACHE_PATH") or os.path.join(tempfile.gettempdir(), "beholmes_shared_cache.sqlite3")
+    return SQLiteSharedCache(path)
+
+def shared_cache(namespace, ttl, stale_ttl=None, cacheable=None, ignore=()):
+    """Decorator: route a fetcher through the shared backend, keyed by its arguments (minus `ignore`d kwargs)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key_kwargs = {k: v for k, v in kwargs.items() if k not in ignore}
+            arg_key = hashlib.sha1(json.dumps([args, key_kwargs], sort_keys=True, default=str).encode()).hexdigest()
+            return get_shared_cache().get_or_refresh(
+                f"{namespace}:{arg_key}", lambda: func(*args, **kwargs),
+                ttl, stale_ttl=stale_ttl, cacheable=cacheable
+            )
+        return wrapper
+    return decorator
+
+# --- 🛡️ Content Filter (Compiled Multi-Pattern) ---
+# Blocklist / allowlist phrases are compiled into ONE alternation regex, so every
+# text is scanned once regardless of list length. Allowlist phrases win over
+# block phrases they contain (e.g. allow "china open" while blocking "china").
+CONTENT_FILTER_RELOAD = 60          # seconds between re-reads of the list settings
+SENSITIVE_KEYWORDS = ["china", "chinese", "xi jinping", "taiwan", "ccp", "beijing", "hong kong", "communist"]
+
+def _setting_list(name):
+    raw = get_setting(name)
+    if not raw: return []
+    if isinstance(raw, (list, tuple)): return [str(x) for x in raw]
+    try: return [str(x) for x in json.loads(raw)]
+    except Exception: return [x for x in str(raw).split(",")]
+
+def content_filter_config():
+    """(blocklist, allowlist) from defaults + CONTENT_FILTER_BLOCKLIST / CONTENT_FILTER_ALLOWLIST."""
+    block = SENSITIVE_KEYWORDS + _setting_list("CONTENT_FILTER_BLOCKLIST")
+    allow = _setting_list("CONTENT_FILTER_ALLOWLIST")
+    norm = lambda xs: tuple(sorted({x.strip().lower() for x in xs if x.strip()}))
+    return norm(block), norm(allow)
+
+class ContentFilter:
+    def __init__(self, block, allow):
+        self.rules = {p: "allow" for p in allow}
+        self.rules.update({p: "block" for p in block if p not in self.rules})
+        # Longest first: at any position the most specific phrase wins the alternation
+        phrases = sorted(self.rules, key=len, reverse=True)
+        self.pattern = re.compile("|".join(re.escape(p) for p in phrases)) if phrases else None
+        # Identifies the rule set, for caches holding filtered results
+        self.version = hashlib.sha1(repr(sorted(self.rules.items())).encode()).hexdigest()[:12]
+        self.hits = collections.Counter()
+        self.checked = 0
+        self.blocked = 0
+
+    def blocked_by(self, *texts):
+        """Return the first blocking phrase found in any of the texts, or None."""
+        self.checked += 1
+        if self.pattern is None: return None
+        hit = None
+        for m in self.pattern.finditer("\n".join(t for t in texts if t).lower()):
+            phrase = m.group(0)
+            self.hits[phrase] += 1
+            if hit is None and self.rules[phrase] == "block":
+                hit = phrase
+        if hit: self.blocked += 1
+        return hit
+
+    def stats(self):
+        return [{"rule": p, "type": self.rules[p], "hits": n} for p, n in self.hits.most_common()]
+
+@st.cache_resource
+def _build_content_filter(block, allow):
+    return ContentFilter(block, allow)
+
+@st.cache_resource
+def _content_filter_state():
+    return {"lock": threading.Lock(), "filter": None, "read_at": 0.0}
+
+def get_content_filter():
+    """The filter for the current settings, re-read at most every CONTENT_FILTER_RELOAD seconds."""
+    state = _content_filter_state()
+    stale = lambda: state["filter"] is None or time.monotonic() - state["read_at"] >= CONTENT_FILTER_RELOAD
+    if stale():
+        with state["lock"]:
+            if stale():
+                # Same lists -> same cached ContentFilter (regex and hit counters kept)
+                state["filter"] = _build_content_filter(*content_filter_config())
+                state["read_at"] = time.monotonic()
+    return state["filter"]
+
 # --- 🔥 A. Crypto Prices (Extended List) ---
 @st.cache_data(ttl=60)
+@shared_cache("crypto", ttl=60)
 def fetch_crypto_prices_v2():
     symbols = [
         "BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT", "XRPUSDT", 
@@ -385,7 +1029,7 @@ def fetch_crypto_prices_v2():
     ]
     crypto_data = []
     try:
-        url = "https://api.binance.com/api/v3/ticker/24hr"
+        url = f"{BINANCE_API_BASE}/api/v3/ticker/24hr"
         response = requests.get(url, timeout=5)
         if response.status_code == 200:
             all_tickers = {t['symbol']: t for t in response.json()}
@@ -410,7 +1054,8 @@ def fetch_crypto_prices_v2():
                         "price": price_str,
                         "change": change_24h,
                         "volume": vol_str,
-                        "trend": "up" if change_24h > 0 else "down"
+                        "trend": "up" if change_24h > 0 else "down",
+                        "price_value": price
                     })
     except: pass 
     if not crypto_data:
@@ -418,51 +1063,403 @@ def fetch_crypto_prices_v2():
     return crypto_data
 
 # --- 🔥 B. Categorized News Fetcher ---
-@st.cache_data(ttl=300)
-def fetch_categorized_news_v2():
-    def fetch_rss(url, limit=20):
-        items = []
+# Feed registry: defaults below, extended / overridden (by url) with the JSON list
+# in NEWS_FEEDS_FILE, e.g. [{"name": "Reuters World", "category": "politics", "url": "..."}]
+# (or {"replace_defaults": true, "feeds": [...]} to drop the defaults)
+DEFAULT_FEEDS = [
+    {"name": "Google News", "category": "all", "url": "https://news.google.com/rss?hl=en-US&gl=US&ceid=US:en"},
+    {"name": "NYT Politics", "category": "politics", "url": "https://rss.nytimes.com/services/xml/rss/nyt/Politics.xml"},
+    {"name": "CoinDesk", "category": "web3", "url": "https://www.coindesk.com/arc/outboundfeeds/rss/"},
+    {"name": "TechCrunch", "category": "tech", "url": "https://techcrunch.com/feed/"},
+]
+FEED_MIN_INTERVAL = 60
+FEED_MAX_INTERVAL = 1800
+FEED_MAX_WORKERS = 8
+FEED_ITEMS_PER_FEED = 30
+
+def load_feed_registry():
+    feeds = {f["url"]: dict(f) for f in DEFAULT_FEEDS}
+    path = get_setting("NEWS_FEEDS_FILE")
+    if path:
         try:
-            feed = feedparser.parse(url)
-            for entry in feed.entries[:limit]:
-                time_display = "Recent"
-                if hasattr(entry, 'published_parsed'):
+            with open(path, encoding="utf-8") as fh:
+                extra = json.load(fh)
+            # {"replace_defaults": true, "feeds": [...]} swaps the defaults out entirely
+            if isinstance(extra, dict):
+                if extra.get("replace_defaults"): feeds = {}
+                extra = extra.get("feeds", [])
+            for f in extra:
+                if f.get("url"):
+                    feeds[f["url"]] = {"name": f.get("name", "News"), "category": f.get("category", "all"), "url": f["url"]}
+        except Exception:
+            pass
+    return list(feeds.values())
+
+def feed_categories():
+    return list(dict.fromkeys(f["category"] for f in load_feed_registry()))
+
+def _xml_local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+def _parse_feed_time(text):
+    if not text: return None
+    try: return email.utils.parsedate_to_datetime(text).timestamp()
+    except Exception: pass
+    try: return datetime.datetime.fromisoformat(text.strip().replace("Z", "+00:00")).timestamp()
+    except Exception: return None
+
+def publisher_domain(link, source_url=""):
+    """Who published an entry: its <source url>'s domain (aggregators such as Google News link to themselves), else its link's."""
+    netloc = urllib.parse.urlparse(source_url or link or "").netloc.lower()
+    return netloc[4:] if netloc.startswith("www.") else netloc
+
+def stream_feed_entries(resp, seen, feed_name, stop_after_seen=3):
+    """
+    Incrementally parse RSS <item> / Atom <entry> elements from a streamed response.
+    Already-seen GUIDs are skipped; since feeds are newest-first, the parse (and the
+    download) stops after a few consecutive seen entries.
+    """
+    resp.raw.decode_content = True
+    new_items = []
+    consecutive_seen = 0
+    for event, elem in ET.iterparse(resp.raw, events=("end",)):
+        if _xml_local(elem.tag) not in ("item", "entry"): continue
+        fields = {}
+        for child in elem:
+            name = _xml_local(child.tag)
+            if name == "link" and child.get("href"):
+                fields.setdefault("link", child.get("href"))
+            elif name == "source":
+                fields["source"] = (child.text or "").strip()
+                fields["source_url"] = child.get("url", "")
+            elif name not in fields:
+                fields[name] = (child.text or "").strip()
+        elem.clear()
+        guid = fields.get("guid") or fields.get("id") or fields.get("link")
+        if not guid or not fields.get("title"): continue
+        if guid in seen:
+            consecutive_seen += 1
+            if consecutive_seen >= stop_after_seen: break
+            continue
+        consecutive_seen = 0
+        new_items.append({
+            "guid": guid,
+            "title": html.unescape(fields["title"]),
+            "source": fields.get("source") or feed_name,
+            "domain": publisher_domain(fields.get("link", ""), fields.get("source_url", "")),
+            "link": fields.get("link", ""),
+            "published": _parse_feed_time(fields.get("pubDate") or fields.get("published") or fields.get("updated")),
+        })
+    return new_items
+
+def feedparser_entries(content, feed_name):
+    """Fallback for feeds that are not well-formed XML."""
+    items = []
+    for entry in feedparser.parse(content).entries:
+        published = None
+        if getattr(entry, 'published_parsed', None):
+            try: published = time.mktime(entry.published_parsed)
+            except: pass
+        items.append({
+            "guid": entry.get("id") or entry.link,
+            "title": entry.title,
+            "source": entry.get("source", {}).get("title", feed_name),
+            "domain": publisher_domain(entry.link, entry.get("source", {}).get("href", "")),
+            "link": entry.link,
+            "published": published,
+        })
+    return items
+
+class FeedScheduler:
+    """
+    Polls each registered feed on its own adaptive interval: quick publishers are
+    polled often, quiet ones back off. Conditional GETs plus a per-feed seen-GUID
+    set mean an unchanged feed costs one 304 and no parsing.
+    """
+    def __init__(self):
+        self.state = {}   # url -> poll state
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=FEED_MAX_WORKERS, thread_name_prefix="feed")
+        self._lock = threading.Lock()
+
+    def _state(self, feed):
+        state = self.state.get(feed["url"])
+        if state is None:
+            state = self.state[feed["url"]] = {
+                "interval": float(FEED_MIN_INTERVAL * 5), "next_poll": 0.0, "gap": None,
+                "etag": None, "modified": None, "last_new_at": None,
+                "seen": collections.OrderedDict(), "items": collections.deque(maxlen=FEED_ITEMS_PER_FEED),
+            }
+        state["feed"] = feed
+        return state
+
+    def poll_due(self, timeout=10):
+        now = time.time()
+        with self._lock:
+            due = [self._state(f) for f in load_feed_registry()]
+            due = [s for s in due if s["next_poll"] <= now and not s.get("in_flight")]
+            for s in due: s["in_flight"] = True
+        futures = [self.executor.submit(self._poll, s) for s in due]
+        concurrent.futures.wait(futures, timeout=timeout)
+
+    def _poll(self, s):
+        feed = s["feed"]
+        new_items = []
+        try:
+            headers = {"User-Agent": "Mozilla/5.0 (BeHolmes News Reader)"}
+            if s["etag"]: headers["If-None-Match"] = s["etag"]
+            if s["modified"]: headers["If-Modified-Since"] = s["modified"]
+            with requests.get(feed["url"], headers=headers, timeout=8, stream=True) as resp:
+                if resp.status_code == 200:
+                    s["etag"] = resp.headers.get("ETag")
+                    s["modified"] = resp.headers.get("Last-Modified")
                     try:
-                        dt = datetime.datetime.fromtimestamp(time.mktime(entry.published_parsed))
-                        diff = datetime.datetime.now() - dt
-                        if diff.total_seconds() < 3600: time_display = f"{int(diff.total_seconds()/60)}m ago"
-                        else: time_display = f"{int(diff.total_seconds()/3600)}h ago"
-                    except: pass
-                items.append({
-                    "title": entry.title,
-                    "source": entry.get("source", {}).get("title", "News"),
-                    "link": entry.link,
-                    "time": time_display
-                })
-        except: pass
-        return items
+                        new_items = stream_feed_entries(resp, s["seen"], feed["name"])
+                    except ET.ParseError:
+                        fallback = requests.get(feed["url"], headers={"User-Agent": headers["User-Agent"]}, timeout=8)
+                        new_items = [i for i in feedparser_entries(fallback.content, feed["name"]) if i["guid"] not in s["seen"]]
+        except Exception:
+            pass
+        finally:
+            self._record(s, new_items)
 
-    feeds = {
-        "all": "https://news.google.com/rss?hl=en-US&gl=US&ceid=US:en",
-        "politics": "https://rss.nytimes.com/services/xml/rss/nyt/Politics.xml",
-        "tech": "https://techcrunch.com/feed/",
-        "web3": "https://www.coindesk.com/arc/outboundfeeds/rss/"
-    }
-    return {k: fetch_rss(v, 30) for k, v in feeds.items()}
+    def _record(self, s, new_items):
+        now = time.time()
+        with self._lock:
+            for item in reversed(new_items):
+                s["seen"][item["guid"]] = None
+                s["items"].appendleft(item)
+            while len(s["seen"]) > 500:
+                s["seen"].popitem(last=False)
+            # Adapt the interval to the observed publish rate (EWMA of the gap between new entries)
+            if new_items and s["last_new_at"]:
+                gap = (now - s["last_new_at"]) / len(new_items)
+                s["gap"] = gap if s["gap"] is None else 0.7 * s["gap"] + 0.3 * gap
+                s["interval"] = min(max(s["gap"] / 2, FEED_MIN_INTERVAL), FEED_MAX_INTERVAL)
+            elif not new_items:
+                s["interval"] = min(s["interval"] * 1.5, FEED_MAX_INTERVAL)
+            if new_items: s["last_new_at"] = now
+            s["next_poll"] = now + s["interval"] * random.uniform(0.9, 1.1)
+            s["in_flight"] = False
+
+    def snapshot(self, limit=30):
+        """Newest items per category across every feed in that category."""
+        by_cat = {}
+        with self._lock:
+            for s in self.state.values():
+                by_cat.setdefault(s["feed"]["category"], []).extend(s["items"])
+        now = time.time()
+        content_filter = get_content_filter()
+        result = {}
+        for cat in feed_categories():
+            items = [i for i in by_cat.get(cat, []) if not content_filter.blocked_by(i["title"])]
+            items = sorted(items, key=lambda i: i["published"] or 0, reverse=True)[:limit]
+            result[cat] = [{"title": i["title"], "source": i["source"], "domain": i.get("domain") or i["source"], "link": i["link"],
+                            "time": _time_ago(i["published"], now)} for i in items]
+        return result
+
+def _time_ago(ts, now):
+    if not ts: return "Recent"
+    diff = max(now - ts, 0)
+    if diff < 3600: return f"{int(diff/60)}m ago"
+    return f"{int(diff/3600)}h ago"
+
+@st.cache_resource
+def get_feed_scheduler():
+    return FeedScheduler()
+
+@st.cache_data(ttl=30)
+@shared_cache("news", ttl=30, cacheable=lambda v: any(v.values()))
+def fetch_categorized_news_v2():
+    scheduler = get_feed_scheduler()
+    scheduler.poll_due()
+    raw = scheduler.snapshot(FEED_ITEMS_PER_FEED)
+    # Register every category before reading counts so "all" sees cross-feed duplicates too
+    cluster_ids = {k: [get_headline_index().add(item["title"], item["domain"], item["link"]) for item in v] for k, v in raw.items()}
+    news = {k: cluster_headlines(v, cluster_ids[k]) for k, v in raw.items()}
+    # Once per refresh, not per rerun: the idle-time pre-analysis follows the feeds
+    get_speculator().offer(news.get('all', []))
+    return news
+
+# --- 🔥 B2. Headline Near-Duplicate Clustering (MinHash + LSH bands) ---
+# Each headline gets a MinHash signature over its word set. Signatures are cut
+# into bands; headlines that share any band land in the same bucket, so an
+# insert only compares against a handful of candidates instead of every known
+# headline. Candidates are confirmed by estimated Jaccard similarity. A cluster's
+# source count is the number of distinct publisher domains reporting it. Headlines
+# with no words left to hash (all stopwords, emoji, other scripts) are never merged.
+MINHASH_PERMUTATIONS = 32
+MINHASH_BANDS = 8              # 8 bands x 4 rows: ~93% recall at Jaccard 0.73, ~6% at 0.3
+MINHASH_THRESHOLD = 0.5
+_MINHASH_PRIME = (1 << 61) - 1
+_MINHASH_RNG = random.Random(20240601)
+_MINHASH_COEFFS = [(_MINHASH_RNG.randrange(1, _MINHASH_PRIME), _MINHASH_RNG.randrange(0, _MINHASH_PRIME)) for _ in range(MINHASH_PERMUTATIONS)]
+_HEADLINE_STOPWORDS = {"the", "a", "an", "of", "to", "in", "on", "for", "and", "or", "is", "are", "at", "by", "with", "from", "as", "after", "over", "says"}
+
+def normalize_headline(title):
+    # Google News appends " - Publisher" to every title
+    title = re.sub(r"\s+[-–|]\s+[^-–|]{2,40}$", "", title or "")
+    return re.findall(r"[a-z0-9\u4e00-\u9fff]+", title.lower())
+
+def minhash_headline(title):
+    """MinHash signature of a headline's word set; None if it has no words to compare."""
+    tokens = {t for t in normalize_headline(title) if t not in _HEADLINE_STOPWORDS}
+    if not tokens: return None
+    hashed = [int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "big") for t in tokens]
+    return tuple(min((a * h + b) % _MINHASH_PRIME for h in hashed) for a, b in _MINHASH_COEFFS)
+
+def _minhash_similarity(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / MINHASH_PERMUTATIONS
+
+class HeadlineClusterIndex:
+    """Incremental, bounded index of headline clusters shared across feeds, categories and sessions."""
+    def __init__(self, max_clusters=20000):
+        self.max_clusters = max_clusters
+        self.clusters = {}          # cluster_id -> {"sig", "title", "link", "sources", "last_seen"}
+        self.buckets = {}           # (band, band values) -> set(cluster_id)
+        self.by_link = {}           # link -> cluster_id (repeat polls skip hashing entirely)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _band_keys(self, sig):
+        rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+        return [(i, sig[i * rows:(i + 1) * rows]) for i in range(MINHASH_BANDS)]
+
+    def add(self, title, source, link=""):
+        """Insert a headline (source: its publisher domain) and return its cluster id."""
+        with self._lock:
+            cid = self.by_link.get(link) if link else None
+            if cid is None or cid not in self.clusters:
+                sig = minhash_headline(title)
+                band_keys = self._band_keys(sig) if sig else []
+                cid, best = None, MINHASH_THRESHOLD
+                candidates = set()
+                for key in band_keys:
+                    candidates.update(self.buckets.get(key, ()))
+                for candidate in candidates:
+                    sim = _minhash_similarity(self.clusters[candidate]["sig"], sig)
+                    if sim >= best:
+                        cid, best = candidate, sim
+                if cid is None:
+                    cid = self._next_id
+                    self._next_id += 1
+                    self.clusters[cid] = {"sig": sig, "title": title, "link": link, "sources": set(), "last_seen": 0.0}
+                    for key in band_keys:
+                        self.buckets.setdefault(key, set()).add(cid)
+                    if len(self.clusters) > self.max_clusters:
+                        self._evict()
+                if link: self.by_link[link] = cid
+            cluster = self.clusters[cid]
+            cluster["sources"].add(source)
+            cluster["last_seen"] = time.time()
+            return cid
+
+    def _evict(self):
+        # Drop the least recently seen 10% in one go
+        victims = sorted(self.clusters, key=lambda c: self.clusters[c]["last_seen"])[:max(1, self.max_clusters // 10)]
+        for cid in victims:
+            cluster = self.clusters.pop(cid)
+            for key in self._band_keys(cluster["sig"]) if cluster["sig"] else []:
+                bucket = self.buckets.get(key)
+                if bucket:
+                    bucket.discard(cid)
+                    if not bucket: del self.buckets[key]
+        victims = set(victims)
+        self.by_link = {l: c for l, c in self.by_link.items() if c not in victims}
+
+    def source_count(self, cid):
+        cluster = self.clusters.get(cid)
+        return len(cluster["sources"]) if cluster else 1
+
+@st.cache_resource
+def get_headline_index():
+    return HeadlineClusterIndex()
+
+def cluster_headlines(items, cluster_ids=None):
+    """
+    Collapse near-duplicate headlines: one representative per cluster, annotated with its
+    source count. cluster_ids: the items' ids if they are already in the index.
+    """
+    index = get_headline_index()
+    if cluster_ids is None:
+        cluster_ids = [index.add(item["title"], item.get("domain") or publisher_domain(item.get("link", "")) or item.get("source", ""),
+                                 item.get("link", ""))
+                       for item in items]
+    seen = set()
+    result = []
+    for item, cid in zip(items, cluster_ids):
+        if cid in seen: continue
+        seen.add(cid)
+        result.append(dict(item, cluster_id=cid))
+    for item in result:
+        item["sources"] = index.source_count(item["cluster_id"])
+    return result
 
 # --- 🔥 C. Polymarket Fetcher (ENHANCED - supports Sub-markets & Liquidity) ---
-def process_polymarket_event(event):
+def build_sub_market(sub_m, default_question):
+    """Normalize one raw Gamma market (question / outcomes / outcomePrices / volume) for the UI and context generator."""
+    # Basic sub-market data
+    q_text = sub_m.get('question', default_question)
+    sub_out = json.loads(sub_m.get('outcomes')) if isinstance(sub_m.get('outcomes'), str) else sub_m.get('outcomes')
+    sub_pri = json.loads(sub_m.get('outcomePrices')) if isinstance(sub_m.get('outcomePrices'), str) else sub_m.get('outcomePrices')
+    sub_vol = float(sub_m.get('volume', 0) or 0)
+
+    # Determine top outcome for this sub-market
+    best_opt = ""
+    best_price = 0.0
+    if sub_out and sub_pri:
+        temp_ops = []
+        for i, o in enumerate(sub_out):
+            if i < len(sub_pri):
+                try:
+                    p_val = float(sub_pri[i])
+                    temp_ops.append((o, p_val))
+                except: continue
+        temp_ops.sort(key=lambda x: x[1], reverse=True)
+        if temp_ops:
+            best_opt = temp_ops[0][0]
+            best_price = temp_ops[0][1]
+
+    # Structure for UI
+    sub_data = {
+        "id": sub_m.get('id'),
+        "question": q_text,
+        "volume": sub_vol,
+        "type": "binary" if len(sub_out) == 2 and "Yes" in sub_out and "No" in sub_out else "multiple",
+        "options": [],
+        # Extra fields for Context Generator
+        "top_option": best_opt,
+        "top_price": best_price
+    }
+
+    # Fill options for UI
+    if len(sub_out) == 2 and "Yes" in sub_out and "No" in sub_out:
+        y_idx = sub_out.index("Yes")
+        n_idx = sub_out.index("No")
+        sub_data['yes_price'] = float(sub_pri[y_idx]) * 100 if y_idx < len(sub_pri) else 0
+        sub_data['no_price'] = float(sub_pri[n_idx]) * 100 if n_idx < len(sub_pri) else 0
+    else:
+        for i, o in enumerate(sub_out):
+            if i < len(sub_pri):
+                sub_data['options'].append({
+                    "option": str(o), 
+                    "price": float(sub_pri[i]) * 100
+                })
+    return sub_data
+
+def process_polymarket_event(event, detail=False):
     """
     Core function to process ANY Polymarket event.
-    Returns standardized data structure tailored for generate_market_context.
+    By default returns the summary used by lists, search candidates and the catalog
+    (no per-sub-market detail). detail=True adds "markets": every sub-market with its
+    full option set, as needed by the analysis view and generate_market_context.
     """
     try:
         title = event.get('title', 'Untitled').strip()
         if not title: return None
         
-        # 1. Sensitive Keyword Filter
-        SENSITIVE_KEYWORDS = ["china", "chinese", "xi jinping", "taiwan", "ccp", "beijing", "hong kong", "communist"]
-        if any(kw in title.lower() for kw in SENSITIVE_KEYWORDS): return None
+        # 1. Sensitive Keyword Filter (title + every sub-market question, one pass)
+        questions = [sub_m.get('question', '') for sub_m in event.get('markets') or []]
+        if get_content_filter().blocked_by(title, *questions): return None
 
         # 2. Status Filter
         if event.get('closed') is True: return None
@@ -510,149 +1507,991 @@ def process_polymarket_event(event):
         
         # Get Top Probability (0.0 - 1.0 format) for the Generator
         top_prob_decimal = outcome_data[0][2] 
+        lead_outcome = outcome_data[0][0]
         
         # Format Top 3 Odds for Display
         top_odds = [f"{o}: {p:.1f}%" for o, p, r in outcome_data[:3]]
         odds_str = " | ".join(top_odds)
 
-        # 5. Extract Details for All Sub-Markets (V1.3 UPGRADE)
-        all_sub_markets = []
-        # We process the top 6 sub-markets to provide rich context
-        for sub_m in markets_list[:6]:
-            try:
-                # Basic sub-market data
-                q_text = sub_m.get('question', title)
-                sub_out = json.loads(sub_m.get('outcomes')) if isinstance(sub_m.get('outcomes'), str) else sub_m.get('outcomes')
-                sub_pri = json.loads(sub_m.get('outcomePrices')) if isinstance(sub_m.get('outcomePrices'), str) else sub_m.get('outcomePrices')
-                sub_vol = float(sub_m.get('volume', 0) or 0)
-                
-                # Determine top outcome for this sub-market
-                best_opt = ""
-                best_price = 0.0
-                if sub_out and sub_pri:
-                    temp_ops = []
-                    for i, o in enumerate(sub_out):
-                        if i < len(sub_pri):
-                            try:
-                                p_val = float(sub_pri[i])
-                                temp_ops.append((o, p_val))
-                            except: continue
-                    temp_ops.sort(key=lambda x: x[1], reverse=True)
-                    if temp_ops:
-                        best_opt = temp_ops[0][0]
-                        best_price = temp_ops[0][1]
-
-                # Structure for UI
-                sub_data = {
-                    "question": q_text,
-                    "volume": sub_vol,
-                    "type": "binary" if len(sub_out) == 2 else "multiple",
-                    "options": [],
-                    # Extra fields for Context Generator
-                    "top_option": best_opt,
-                    "top_price": best_price
-                }
-                
-                # Fill options for UI
-                if len(sub_out) == 2 and "Yes" in sub_out and "No" in sub_out:
-                    y_idx = sub_out.index("Yes")
-                    n_idx = sub_out.index("No")
-                    sub_data['yes_price'] = float(sub_pri[y_idx]) * 100 if y_idx < len(sub_pri) else 0
-                    sub_data['no_price'] = float(sub_pri[n_idx]) * 100 if n_idx < len(sub_pri) else 0
-                else:
-                    for i, o in enumerate(sub_out):
-                        if i < len(sub_pri):
-                            sub_data['options'].append({
-                                "option": str(o), 
-                                "price": float(sub_pri[i]) * 100
-                            })
-                all_sub_markets.append(sub_data)
-            except: continue
-
         # Return standardized dict matching generate_market_context requirements
-        return {
+        summary = {
             "title": title,
             "slug": event.get('slug', ''),
+            "market_id": m.get('id'),
             "volume": vol,
             "vol_str": vol_str, # This is the formatted string (e.g. $50M)
             "odds": odds_str,
             "url": f"https://polymarket.com/event/{event.get('slug', '')}",
-            "markets": all_sub_markets,
+            "questions": [q for q in (sub_m.get('question', '') for sub_m in markets_list[:3]) if q],
+            "sub_count": len(markets_list),
             
             # Fields specifically for generate_market_context:
             "probability": top_prob_decimal, # 0.72
+            "outcome": lead_outcome,         # the outcome `probability` is the price of
+            "outcome_index": [str(o) for o in outcomes].index(lead_outcome),   # its position in the main market's outcomes
             "liquidity": liquidity,          # 150000.0
             "change_24h": change_24h         # 0.05
         }
+        if not detail: return summary
+
+        # 5. Detail: every sub-market, highest volume first (V1.3 UPGRADE)
+        all_sub_markets = []
+        for sub_m in markets_list:
+            try:
+                all_sub_markets.append(build_sub_market(sub_m, title))
+            except: continue
+        summary["markets"] = all_sub_markets
+        return summary
     except: return None
 
+# Normalization memo: an event is re-processed only when its update stamp changes.
+# The stamp hashes the event/market updatedAt values together with each market's
+# price, volume and liquidity fields (prices can move without the event being
+# touched), and the content-filter version, since filtering is part of the result.
+EVENT_MEMO_MAX = 5000
+_EVENT_STAMP_FIELDS = ("id", "updatedAt", "outcomePrices", "volume", "liquidity", "oneDayPriceChange", "priceChange24h")
+
+def event_update_stamp(event):
+    h = hashlib.blake2b(digest_size=12)
+    h.update(str(event.get('updatedAt', '')).encode())
+    for sub_m in event.get('markets') or []:
+        h.update(repr(tuple(sub_m.get(f) for f in _EVENT_STAMP_FIELDS)).encode())
+    return h.hexdigest()
+
+class EventNormalizationMemo:
+    def __init__(self, max_entries=EVENT_MEMO_MAX):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()   # event id -> (stamp, processed event or None)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def process(self, event):
+        event_id = event.get('id') or event.get('slug')
+        if not event_id:
+            return process_polymarket_event(event)
+        stamp = (event_update_stamp(event), get_content_filter().version)
+        with self._lock:
+            cached = self.entries.get(event_id)
+            if cached and cached[0] == stamp:
+                self.entries.move_to_end(event_id)
+                self.hits += 1
+                return cached[1]
+        result = process_polymarket_event(event)
+        with self._lock:
+            self.misses += 1
+            self.entries[event_id] = (stamp, result)
+            self.entries.move_to_end(event_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return result
+
+@st.cache_resource
+def get_event_memo():
+    return EventNormalizationMemo()
+
+# Streaming read of the /events listing: events are decoded one array element at a
+# time from the response stream and pruned to the fields process_polymarket_event
+# reads, so a page never exists as a full JSON tree. Larger catalogs are fetched
+# as GAMMA_PAGE_SIZE pages rather than one big response.
+GAMMA_PAGE_SIZE = 100
+CATALOG_LIMIT = int(get_setting("CATALOG_LIMIT", 500))
+GAMMA_EVENT_FIELDS = frozenset({
+    "title", "slug", "closed", "markets",                                   # event
+    "id", "question", "outcomes", "outcomePrices", "volume", "liquidity",   # market
+    "oneDayPriceChange", "priceChange24h", "updatedAt",
+})
+
+def _prune_gamma_fields(pairs):
+    return {k: v for k, v in pairs if k in GAMMA_EVENT_FIELDS}
+
+def iter_json_array(resp, chunk_size=65536, object_pairs_hook=None):
+    """Yield the elements of a top-level JSON array from a streamed requests response."""
+    decoder = json.JSONDecoder(object_pairs_hook=object_pairs_hook)
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = resp.iter_content(chunk_size=chunk_size)
+    buf, pos, started, eof = "", 0, False, False
+
+    def more(need):
+        nonlocal buf, pos, eof
+        buf, pos = buf[pos:], 0
+        added = 0
+        while added < need and not eof:
+            chunk = next(chunks, None)
+            if chunk is None:
+                buf += utf8.decode(b"", final=True)
+                eof = True
+            else:
+                text = utf8.decode(chunk)
+                buf += text
+                added += len(text)
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf):
+            if eof: raise ValueError("Truncated JSON array")
+            more(chunk_size)
+            continue
+        if not started:
+            if buf[pos] != "[": raise ValueError("Expected a JSON array")
+            started, pos = True, pos + 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof: raise
+            # Element spans past the buffer: at least double what's buffered before retrying
+            more(max(chunk_size, len(buf) - pos))
+            continue
+        if not eof and buf[end - 1] not in '}]"' and (end == len(buf) or buf[end] not in " \t\r\n,]"):
+            # A number cut at the buffer edge ("4" of "456", "-7." of "-7.5") parses as a shorter one
+            more(chunk_size)
+            continue
+        pos = end
+        yield item
+
+def iter_gamma_events(params, timeout=12):
+    """Raw (pruned) events of one /events query, yielded as they stream in."""
+    with requests.get(f"{GAMMA_API_BASE}/events", params=params, timeout=timeout, stream=True) as resp:
+        resp.raise_for_status()
+        for event in iter_json_array(resp, object_pairs_hook=_prune_gamma_fields):
+            if isinstance(event, dict):
+                yield event
+
+def _prune_gamma_market_fields(pairs):
+    return {k: v for k, v in pairs if k in GAMMA_EVENT_FIELDS or k == "events"}
+
+def iter_gamma_markets(params, timeout=12):
+    """Raw (pruned) markets of one /markets query, each with its parent `events` stubs."""
+    with requests.get(f"{GAMMA_API_BASE}/markets", params=params, timeout=timeout, stream=True) as resp:
+        resp.raise_for_status()
+        for market in iter_json_array(resp, object_pairs_hook=_prune_gamma_market_fields):
+            if isinstance(market, dict):
+                yield market
+
+def stream_gamma_events(params, timeout=12):
+    """Processed events for one /events query, normalized as they stream in. Returns (events, raw_count)."""
+    events, raw_count = [], 0
+    memo = get_event_memo()
+    for event in iter_gamma_events(params, timeout):
+        raw_count += 1
+        market_data = memo.process(event)
+        if market_data:
+            events.append(market_data)
+    return events, raw_count
+
+# --- 🗂️ C2. Local Catalog Mirror (Full Sync + Delta Sync) ---
+# The whole open catalog is paginated once into a local SQLite mirror; after that a
+# background thread pulls only events updated since the cursor (newest-first by
+# updatedAt, stopping at the first already-synced event) and drops closed ones.
+# Gamma moves prices without touching the event's updatedAt, so each sync also
+# reads the /markets listing by market updatedAt down to a second cursor and
+# patches those markets into the stored raw events. A periodic full pass drops
+# events that silently left the open listing. The catalog snapshot, market search
+# and slug resolution read from the mirror once the first full sync has completed.
+# One syncer per mirror file (lease).
+MIRROR_SYNC_INTERVAL = int(get_setting("MIRROR_SYNC_INTERVAL", 60))
+MIRROR_FULL_RESYNC = 6 * 3600
+MIRROR_MAX_EVENTS = 50000
+MIRROR_DELTA_MAX_PAGES = 20
+MIRROR_CURSOR_OVERLAP = 5          # seconds re-read behind the cursor (same-second updates, clock skew)
+
+def _gamma_ts(value):
+    """Gamma ISO timestamp -> unix seconds (0 if missing / unparseable)."""
+    try: return datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except Exception: return 0.0
+
+class CatalogMirror:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._thread = None
+        self.last_error = None
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS events (slug TEXT PRIMARY KEY, event_id TEXT, title TEXT, volume REAL, "
+            "updated_ts REAL, closed INTEGER, active INTEGER, gen INTEGER, data BLOB, raw BLOB)"
+        )
+        try: conn.execute("ALTER TABLE events ADD COLUMN raw BLOB")   # mirrors created before raw events were kept
+        except sqlite3.OperationalError: pass
+        conn.execute("CREATE INDEX IF NOT EXISTS events_volume ON events (active, closed, volume)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(slug UNINDEXED, text)")
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False    # SQLite built without FTS5: search falls back to LIKE
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def _meta(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, conn, **values):
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items()])
+
+    # --- Reads ---
+    def ready(self):
+        return self._meta("full_sync_at") is not None
+
+    def synced_at(self):
+        return float(self._meta("synced_at", 0))
+
+    def top(self, limit):
+        rows = self._conn().execute(
+            "SELECT data FROM events WHERE active = 1 AND closed = 0 ORDER BY volume DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [json.loads(zlib.decompress(r[0])) for r in rows]
+
+    def get(self, slug):
+        row = self._conn().execute("SELECT data FROM events WHERE slug = ? AND active = 1 AND closed = 0", (slug,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def search(self, query, limit=10):
+        words = [w for w in re.findall(r"\w+", query.lower()) if len(w) > 3]
+        if not words: return []
+        conn = self._conn()
+        if self.fts:
+            match = " OR ".join(f'"{w}"' for w in words)
+            rows = conn.execute(
+                "SELECT e.data FROM events_fts f JOIN events e ON e.slug = f.slug "
+                "WHERE events_fts MATCH ? AND e.active = 1 AND e.closed = 0 ORDER BY bm25(events_fts), e.volume DESC LIMIT ?",
+                (match, limit)
+            ).fetchall()
+        else:
+            clause = " OR ".join("LOWER(title) LIKE ?" for _ in words)
+            rows = conn.execute(
+                f"SELECT data FROM events WHERE active = 1 AND closed = 0 AND ({clause}) ORDER BY volume DESC LIMIT ?",
+                [f"%{w}%" for w in words] + [limit]
+            ).fetchall()
+        return [json.loads(zlib.decompress(r[0])) for r in rows]
+
+    def stats(self):
+        conn = self._conn()
+        total, open_ = conn.execute("SELECT COUNT(*), COALESCE(SUM(active = 1 AND closed = 0), 0) FROM events").fetchone()
+        return {"events": total, "open": open_, "fts": self.fts, "synced_at": int(self.synced_at()),
+                "cursor": self._meta("cursor"), "market_cursor": self._meta("market_cursor"), "last_error": self.last_error}
+
+    # --- Sync ---
+    def _delete(self, conn, where, params):
+        if self.fts:
+            conn.execute(f"DELETE FROM events_fts WHERE slug IN (SELECT slug FROM events WHERE {where})", params)
+        conn.execute(f"DELETE FROM events WHERE {where}", params)
+
+    def _upsert(self, conn, raw, gen):
+        """
+        Store one raw event (closed ones are dropped). Returns (event updatedAt, newest
+        market updatedAt): the fields the /events and /markets listings are ordered by.
+        """
+        slug = raw.get('slug')
+        if not slug: return 0.0, 0.0
+        market_ts = max([_gamma_ts(m.get('updatedAt')) for m in raw.get('markets') or []], default=0.0)
+        event_ts = _gamma_ts(raw.get('updatedAt'))
+        if raw.get('closed') is True:
+            self._delete(conn, "slug = ?", (slug,))
+            return event_ts, market_ts
+        market = get_event_memo().process(raw)
+        conn.execute(
+            "INSERT OR REPLACE INTO events (slug, event_id, title, volume, updated_ts, closed, active, gen, data, raw) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?)",
+            (slug, str(raw.get('id') or ""), raw.get('title', ''), market['volume'] if market else 0.0, max(event_ts, market_ts),
+             1 if market else 0, gen, zlib.compress(json.dumps(market or {}, ensure_ascii=False).encode()),
+             zlib.compress(json.dumps(raw, ensure_ascii=False).encode()))
+        )
+        if self.fts:
+            conn.execute("DELETE FROM events_fts WHERE slug = ?", (slug,))
+            if market:
+                text = " ".join([market['title']] + [sm.get('question', '') for sm in raw.get('markets') or []])
+                conn.execute("INSERT INTO events_fts (slug, text) VALUES (?, ?)", (slug, text))
+        return event_ts, market_ts
+
+    def _pages(self, params, max_pages, fetch=iter_gamma_events):
+        for page in range(max_pages):
+            rows = list(fetch(dict(params, limit=GAMMA_PAGE_SIZE, offset=page * GAMMA_PAGE_SIZE)))
+            yield rows
+            if len(rows) < GAMMA_PAGE_SIZE: return
+
+    def full_sync(self):
+        conn = self._conn()
+        gen = int(self._meta("gen", 0)) + 1
+        cursor = market_cursor = 0.0
+        for events in self._pages({"closed": "false"}, MIRROR_MAX_EVENTS // GAMMA_PAGE_SIZE):
+            conn.execute("BEGIN")
+            for raw in events:
+                event_ts, market_ts = self._upsert(conn, raw, gen)
+                cursor, market_cursor = max(cursor, event_ts), max(market_cursor, market_ts)
+            conn.execute("COMMIT")
+        now = time.time()
+        conn.execute("BEGIN")
+        # Events that no longer appear in the open listing have closed (or been removed)
+        self._delete(conn, "gen < ?", (gen,))
+        self._set_meta(conn, gen=gen, cursor=cursor, market_cursor=market_cursor, full_sync_at=now, synced_at=now)
+        conn.execute("COMMIT")
+
+    def delta_sync(self):
+        """Pull events updated since the cursor. Returns False if the backlog is too deep (needs a full pass)."""
+        conn = self._conn()
+        gen = int(self._meta("gen", 0))
+        cursor = float(self._meta("cursor", 0))
+        newest, caught_up = cursor, False
+        for page, events in enumerate(self._pages({"order": "updatedAt", "ascending": "false"}, MIRROR_DELTA_MAX_PAGES)):
+            conn.execute("BEGIN")
+            for raw in events:
+                if _gamma_ts(raw.get('updatedAt')) <= cursor - MIRROR_CURSOR_OVERLAP:
+                    caught_up = True
+                    break
+                newest = max(newest, self._upsert(conn, raw, gen)[0])
+            conn.execute("COMMIT")
+            # Caught up at the cursor, or reached the end of the listing
+            caught_up = caught_up or len(events) < GAMMA_PAGE_SIZE
+            if caught_up: break
+        conn.execute("BEGIN")
+        self._set_meta(conn, cursor=newest)
+        conn.execute("COMMIT")
+        return caught_up and self.price_sync()
+
+    def price_sync(self):
+        """Patch markets updated since the market cursor into their stored events. False if the backlog is too deep."""
+        conn = self._conn()
+        gen = int(self._meta("gen", 0))
+        cursor = float(self._meta("market_cursor", 0))
+        newest, caught_up, changed = cursor, False, {}    # slug -> {market id: market}
+        pages = self._pages({"closed": "false", "order": "updatedAt", "ascending": "false"}, MIRROR_DELTA_MAX_PAGES, iter_gamma_markets)
+        for markets in pages:
+            for m in markets:
+                ts = _gamma_ts(m.get('updatedAt'))
+                if ts <= cursor - MIRROR_CURSOR_OVERLAP:
+                    caught_up = True
+                    break
+                newest = max(newest, ts)
+                for parent in m.pop('events', None) or []:
+                    if parent.get('slug'): changed.setdefault(parent['slug'], {})[str(m.get('id'))] = m
+            caught_up = caught_up or len(markets) < GAMMA_PAGE_SIZE
+            if caught_up: break
+        if not caught_up: return False
+        conn.execute("BEGIN")
+        for slug, updates in changed.items():
+            row = conn.execute("SELECT raw FROM events WHERE slug = ? AND raw IS NOT NULL", (slug,)).fetchone()
+            if not row: continue   # not mirrored (yet): the event listing brings it in
+            raw = json.loads(zlib.decompress(row[0]))
+            raw['markets'] = [dict(m, **updates.get(str(m.get('id')), {})) for m in raw.get('markets') or []]
+            self._upsert(conn, raw, gen)
+        self._set_meta(conn, market_cursor=newest, synced_at=time.time())
+        conn.execute("COMMIT")
+        return True
+
+    def sync_once(self):
+        lease = f"mirror:{socket.gethostname()}:{os.path.abspath(self.path)}"
+        backend = get_shared_cache()
+        if not backend.acquire_lease(lease, 600): return
+        try:
+            full_at = float(self._meta("full_sync_at", 0))
+            if time.time() - full_at > MIRROR_FULL_RESYNC or not self.delta_sync():
+                self.full_sync()
+            self.last_error = None
+        except Exception as e:
+            try: self._conn().execute("ROLLBACK")
+            except Exception: pass
+            self.last_error = str(e)
+        finally:
+            backend.release_lease(lease)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True, name="catalog-mirror")
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.sync_once()
+            time.sleep(MIRROR_SYNC_INTERVAL)
+
+@st.cache_resource
+def get_catalog_mirror():
+    """The local mirror (syncing in the background), or None if CATALOG_MIRROR is off."""
+    if str(get_setting("CATALOG_MIRROR", "on")).lower() in ("0", "off", "false", "no"):
+        return None
+    path = get_setting("CATALOG_MIRROR_PATH") or os.path.join(tempfile.gettempdir(), "beholmes_catalog.sqlite3")
+    mirror = CatalogMirror(path)
+    mirror.start()
+    return mirror
+
+def ready_mirror():
+    mirror = get_catalog_mirror()
+    return mirror if mirror is not None and mirror.ready() else None
+
+
 @st.cache_data(ttl=60)
+@shared_cache("catalog", ttl=60, cacheable=lambda v: bool(v["events"]))
+def fetch_open_markets_catalog():
+    """
+    Snapshot of open events (processed), shared by the dashboard and the match matrix.
+    Returns {"fetched_at": unix_ts, "events": [...]}.
+    """
+    mirror = ready_mirror()
+    if mirror:
+        return {"fetched_at": mirror.synced_at(), "events": mirror.top(CATALOG_LIMIT)}
+    events = []
+    try:
+        # Up to CATALOG_LIMIT open events (500 by default, to catch old whales if API sort fails)
+        for offset in range(0, CATALOG_LIMIT, GAMMA_PAGE_SIZE):
+            limit = min(GAMMA_PAGE_SIZE, CATALOG_LIMIT - offset)
+            page, raw_count = stream_gamma_events({"closed": "false", "limit": limit, "offset": offset})
+            events.extend(page)
+            if raw_count < limit: break
+    except: pass
+    return {"fetched_at": time.time(), "events": events}
+
+# --- 🔥 G. Trending Ranking Engine (Incremental Top-K) ---
+# Each catalog refresh folds the per-event deltas (volume traded, probability
+# move, liquidity change) into an exponentially time-decayed score. Scores are
+# stored scaled by 2^((t - epoch) / TREND_HALF_LIFE), so decay never changes the
+# stored value and an event whose numbers did not move keeps its place. Both sort
+# orders are kept as sorted lists; a refresh scans the snapshot once to spot changes
+# and re-slots (bisect) only the events that moved, appeared or closed, so switching
+# sort is a read.
+TREND_HALF_LIFE = 1800       # seconds
+TREND_TOP_K = 100
+TREND_WEIGHTS = {"volume": 1.0, "price": 0.5, "liquidity": 0.3}
+TREND_REBASE_HALF_LIVES = 512   # re-anchor the scale long before floats overflow (2^1024)
+
+class TrendingRanker:
+    def __init__(self, top_k=TREND_TOP_K):
+        self.top_k = top_k
+        self.state = {}          # slug -> {"volume", "probability", "liquidity", "scaled"}
+        self.events = {}         # slug -> latest processed event
+        self.as_of = 0.0
+        self.epoch = None
+        self.order = {"volume": [], "active": []}   # ascending (-key, slug), i.e. best first
+        self._lock = threading.Lock()
+
+    def _growth(self, t):
+        return 2.0 ** ((t - self.epoch) / TREND_HALF_LIFE)
+
+    def _keys(self, slug, entry):
+        return {"volume": (-entry["volume"], slug), "active": (-entry["scaled"], slug)}
+
+    def _unslot(self, slug):
+        for mode, key in self._keys(slug, self.state[slug]).items():
+            order = self.order[mode]
+            del order[bisect.bisect_left(order, key)]
+
+    def _slot(self, slug):
+        for mode, key in self._keys(slug, self.state[slug]).items():
+            bisect.insort(self.order[mode], key)
+
+    def observe(self, events, as_of):
+        """Fold one catalog snapshot into the scores (no-op if already seen)."""
+        with self._lock:
+            if as_of <= self.as_of: return
+            if self.epoch is None or as_of - self.epoch > TREND_REBASE_HALF_LIVES * TREND_HALF_LIFE:
+                self._rebase(as_of)
+            w, growth = TREND_WEIGHTS, self._growth(as_of)
+            seen = set()
+            for e in events:
+                slug = e.get('slug')
+                if not slug: continue
+                seen.add(slug)
+                self.events[slug] = e
+                prev = self.state.get(slug)
+                vol, prob, liq = e.get('volume', 0), e.get('probability', 0), e.get('liquidity', 0)
+                if prev is None:
+                    # No history yet: seed from the API's own 24h price move
+                    self.state[slug] = {"volume": vol, "probability": prob, "liquidity": liq,
+                                        "scaled": w["price"] * abs(e.get('change_24h', 0)) * 100 * growth}
+                    self._slot(slug)
+                    continue
+                if vol == prev["volume"] and prob == prev["probability"] and liq == prev["liquidity"]:
+                    continue
+                gain = (w["volume"] * math.log1p(max(vol - prev["volume"], 0))
+                        + w["price"] * abs(prob - prev["probability"]) * 100
+                        + w["liquidity"] * math.log1p(abs(liq - prev["liquidity"])))
+                self._unslot(slug)
+                prev.update(volume=vol, probability=prob, liquidity=liq, scaled=prev["scaled"] + gain * growth)
+                self._slot(slug)
+            # Events that left the catalog drop out
+            for slug in [s for s in self.state if s not in seen]:
+                self._unslot(slug)
+                del self.state[slug], self.events[slug]
+            self.as_of = as_of
+
+    def _rebase(self, as_of):
+        """Move the scale's anchor to as_of (rescales every stored score)."""
+        if self.epoch is not None:
+            shrink = self._growth(as_of)
+            for entry in self.state.values():
+                entry["scaled"] /= shrink
+            # Long-decayed scores can collapse to the same value, where the slug breaks the tie
+            self.order["active"] = sorted((key / shrink, slug) for key, slug in self.order["active"])
+        self.epoch = as_of
+
+    def score(self, slug):
+        return self.state[slug]["scaled"] / self._growth(self.as_of)
+
+    def top(self, mode, limit):
+        with self._lock:
+            return [dict(self.events[s], trend_score=self.score(s)) for _, s in self.order.get(mode, [])[:min(limit, self.top_k)]]
+
+@st.cache_resource
+def get_trending_ranker():
+    return TrendingRanker()
+
 def fetch_polymarket_v5_simple(limit=60, sort_mode='volume'):
     """
     Fetch Top Markets for Homepage.
-    Supports server-side sorting with robust fallback.
+    'volume' and 'active' (trending) are both read from the maintained rankings.
     """
-    try:
-        base_url = "https://gamma-api.polymarket.com/events?closed=false"
-        
-        # 1. Attempt API Sorting (Try sorting by volume or liquidity)
-        if sort_mode == 'volume':
-            # Try getting top liquidity/volume events (API dependent)
-            # Increased limit to 500 to catch old whales if API sort fails
-            api_url = f"{base_url}&limit=500" 
+    catalog = fetch_open_markets_catalog()
+    ranker = get_trending_ranker()
+    ranker.observe(catalog["events"], catalog["fetched_at"])
+    return ranker.top(sort_mode, limit)
+
+# --- 📈 K. Crypto ↔ Market Correlation Engine ---
+# A sampler thread records, every CORR_INTERVAL seconds, the log price of each
+# tracked Binance symbol and the implied probability of the top CORR_MAX_MARKETS
+# open markets into ring buffers. After each sample, per-step changes are
+# z-scored column-wise and every market × asset pair is scored in batched matrix
+# products: correlation (Zp.T @ Za), beta (probability points per 1% asset move)
+# and the lead/lag in [-CORR_MAX_LAG, +CORR_MAX_LAG] steps with the strongest
+# correlation; beta is taken at that lag. Missing samples count as "no move".
+CORR_INTERVAL = 60
+CORR_WINDOW = 240                # samples kept (4h at 60s)
+CORR_MAX_MARKETS = 500
+CORR_MAX_LAG = 3
+CORR_MIN_OBS = 30                # valid changes a column needs before it is scored
+CORR_MIN_ABS = 0.3               # weakest |correlation| worth mentioning to the agent
+
+class CorrelationEngine:
+    def __init__(self, window=CORR_WINDOW, max_markets=CORR_MAX_MARKETS):
+        self.window = window
+        self.max_markets = max_markets
+        self.assets = []                         # symbol per asset column
+        self.asset_col = {}
+        self.market_col = {}                     # slug -> column
+        self.market_title = {}
+        self.A = np.full((window, 0), np.nan)    # log prices   [time, asset]
+        self.P = np.full((window, max_markets), np.nan)   # probabilities [time, market]
+        self.head = 0                            # next row to write
+        self.samples = 0
+        self.result = None                       # latest scores (see _compute)
+        self.compute_ms = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True, name="correlation")
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                catalog = fetch_open_markets_catalog()
+                self.observe(fetch_crypto_prices_v2(), catalog["events"])
+            except Exception:
+                pass
+            time.sleep(CORR_INTERVAL)
+
+    def observe(self, crypto, events):
+        """Append one sample (crypto rows with numeric 'price_value', processed events) and rescore."""
+        with self._lock:
+            row = self.head
+            self.A[row] = np.nan
+            self.P[row] = np.nan
+            for coin in crypto:
+                if not coin.get('price_value'): continue
+                col = self.asset_col.get(coin['symbol'])
+                if col is None:
+                    col = self.asset_col[coin['symbol']] = len(self.assets)
+                    self.assets.append(coin['symbol'])
+                    self.A = np.hstack([self.A, np.full((self.window, 1), np.nan)])
+                self.A[row, col] = math.log(coin['price_value'])
+            for m in sorted(events, key=lambda e: e.get('volume', 0), reverse=True)[:self.max_markets]:
+                col = self._market_slot(m['slug'])
+                if col is None: continue
+                self.P[row, col] = m.get('probability', np.nan)
+                self.market_title[m['slug']] = m['title']
+            self.head = (row + 1) % self.window
+            self.samples += 1
+            start = time.perf_counter()
+            self.result = self._compute()
+            self.compute_ms = (time.perf_counter() - start) * 1000
+
+    def _market_slot(self, slug):
+        col = self.market_col.get(slug)
+        if col is not None or len(self.market_col) < self.max_markets:
+            if col is None: col = self.market_col[slug] = len(self.market_col)
+            return col
+        # Full: recycle a column whose market has had no observation for the whole window
+        for old, c in self.market_col.items():
+            if np.all(np.isnan(self.P[:, c])):
+                del self.market_col[old]
+                self.market_title.pop(old, None)
+                self.market_col[slug] = c
+                return c
+        return None
+
+    def _compute(self):
+        if not self.assets or self.samples < CORR_MIN_OBS + 1: return None
+        order = np.r_[self.head:self.window, 0:self.head]          # oldest -> newest
+        dA = np.diff(self.A[order], axis=0)                         # log returns      [T, na]
+        dP = np.diff(self.P[order][:, :len(self.market_col)], axis=0)   # prob. changes    [T, nm]
+        n_obs_a, n_obs_p = (~np.isnan(dA)).sum(0), (~np.isnan(dP)).sum(0)
+        dA, dP = np.nan_to_num(dA), np.nan_to_num(dP)
+        T = dA.shape[0]
+        a_c, p_c = dA - dA.mean(0), dP - dP.mean(0)
+        a_sd, p_sd = a_c.std(0), p_c.std(0)
+        valid = np.outer((p_sd > 0) & (n_obs_p >= CORR_MIN_OBS), (a_sd > 0) & (n_obs_a >= CORR_MIN_OBS))
+        Za = np.divide(a_c, a_sd, out=np.zeros_like(a_c), where=a_sd > 0)
+        Zp = np.divide(p_c, p_sd, out=np.zeros_like(p_c), where=p_sd > 0)
+        corr = (Zp.T @ Za) / T                                      # [nm, na]
+        # Lead/lag: lag k > 0 means the asset moves k steps before the market
+        lags = np.arange(-CORR_MAX_LAG, CORR_MAX_LAG + 1)
+        lagged = np.empty((len(lags),) + corr.shape)
+        for i, k in enumerate(lags):
+            if k > 0:   lagged[i] = (Zp[k:].T @ Za[:-k]) / (T - k)
+            elif k < 0: lagged[i] = (Zp[:k].T @ Za[-k:]) / (T + k)
+            else:       lagged[i] = corr
+        best = np.abs(lagged).argmax(0)
+        lag_corr = np.take_along_axis(lagged, best[None], 0)[0]
+        # Beta at the best lag: probability change per unit log return (= pp per +1% move)
+        beta = lag_corr * p_sd[:, None] / np.where(a_sd > 0, a_sd, np.inf)[None, :]
+        return {"corr": np.where(valid, corr, 0.0), "beta": np.where(valid, beta, 0.0),
+                "lag": lags[best], "lag_corr": np.where(valid, lag_corr, 0.0),
+                "markets": dict(self.market_col), "assets": list(self.assets)}
+
+    def pairs_for(self, slug, top=2):
+        """Strongest asset links for one market: [{"asset", "corr", "beta_pp", "lag", "lag_corr"}]."""
+        with self._lock:
+            res = self.result
+        if not res or slug not in res["markets"]: return []
+        m = res["markets"][slug]
+        row = res["lag_corr"][m]                  # ranked by the best-lag correlation (lag 0 included)
+        out = []
+        for a in np.argsort(-np.abs(row))[:top]:
+            if abs(row[a]) < CORR_MIN_ABS: break
+            out.append({"asset": res["assets"][a], "corr": float(res["corr"][m, a]), "beta_pp": float(res["beta"][m, a]),   # pp per +1%
+                        "lag": int(res["lag"][m, a]), "lag_corr": float(res["lag_corr"][m, a])})
+        return out
+
+    def stats(self):
+        return {"assets": len(self.assets), "markets": len(self.market_col), "samples": self.samples,
+                "scored": self.result is not None, "compute_ms": round(self.compute_ms, 1)}
+
+    def strongest(self, top=10):
+        with self._lock:
+            res = self.result
+            titles = dict(self.market_title)
+        if not res: return []
+        flat = np.argsort(-np.abs(res["lag_corr"]), axis=None)[:top]
+        slugs = {c: s for s, c in res["markets"].items()}
+        rows = []
+        for idx in flat:
+            m, a = np.unravel_index(idx, res["corr"].shape)
+            if res["lag_corr"][m, a] == 0: break
+            rows.append({"market": titles.get(slugs.get(m), slugs.get(m)), "asset": res["assets"][a],
+                         "corr": round(float(res["corr"][m, a]), 2), "beta (pp/1%)": round(float(res["beta"][m, a]), 2),
+                         "lead/lag": int(res["lag"][m, a]), "corr @ lag": round(float(res["lag_corr"][m, a]), 2)})
+        return rows
+
+@st.cache_resource
+def get_correlation_engine():
+    engine = CorrelationEngine()
+    engine.start()
+    return engine
+
+def correlation_context(slug, is_cn):
+    """Compact lines on the market's strongest crypto links, for generate_market_context."""
+    pairs = get_correlation_engine().pairs_for(slug)
+    if not pairs: return ""
+    lines = []
+    for p in pairs:
+        if p['lag'] > 0: lead = f"{p['asset']} 领先 {p['lag'] * CORR_INTERVAL // 60} 分钟" if is_cn else f"{p['asset']} leads by {p['lag'] * CORR_INTERVAL // 60} min"
+        elif p['lag'] < 0: lead = f"市场领先 {-p['lag'] * CORR_INTERVAL // 60} 分钟" if is_cn else f"market leads by {-p['lag'] * CORR_INTERVAL // 60} min"
+        else: lead = "同步" if is_cn else "in sync"
+        if is_cn:
+            lines.append(f"* **{p['asset']}**: 相关系数 {p['lag_corr']:+.2f}（{lead}），{p['asset']} 每涨 1% 概率随之变动 {p['beta_pp']:+.2f} 个百分点")
         else:
-            # Active/Trending
-            api_url = f"{base_url}&limit=50"
+            lines.append(f"* **{p['asset']}**: corr {p['lag_corr']:+.2f} ({lead}); {p['beta_pp']:+.2f} pp per +1% {p['asset']}")
+    header = f"**🔗 加密资产联动 (近 {CORR_WINDOW * CORR_INTERVAL // 3600} 小时)**" if is_cn else f"**🔗 Crypto Linkage (last {CORR_WINDOW * CORR_INTERVAL // 3600}h)**"
+    return "\n" + header + "\n" + "\n".join(lines) + "\n"
 
-        resp = requests.get(api_url, timeout=12) 
-        
-        # Fallback if API fails
-        if resp.status_code != 200:
-            return []
+# --- ⏳ Request Deadlines (Stage Budgets) ---
+# A search or an analysis gets one end-to-end budget (SEARCH_DEADLINE /
+# ANALYSIS_DEADLINE seconds, counted from the click). Each stage runs within a share
+# of whatever is left; a stage that runs out of time is abandoned and its fallback
+# used, and the Deadline records it so the UI can mark the result as degraded.
+SEARCH_DEADLINE = float(get_setting("SEARCH_DEADLINE", 20))
+ANALYSIS_DEADLINE = float(get_setting("ANALYSIS_DEADLINE", 60))
+STAGE_MIN_BUDGET = 0.2
 
-        data = resp.json()
-        markets = []
-        
-        if isinstance(data, list):
-            for event in data:
-                market_data = process_polymarket_event(event)
-                if market_data:
-                    markets.append(market_data)
-        
-        # 2. Strong Local Sort (Crucial for "Volume" view)
-        if sort_mode == 'volume':
-            markets.sort(key=lambda x: x['volume'], reverse=True)
-        # 'active' usually implies the default API return order (Trending)
-            
-        return markets[:limit]
+class Deadline:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+        self.degraded = []       # human-readable notes, one per skipped / cut-short stage
+
+    def remaining(self):
+        return max(self.expires - time.monotonic(), 0.0)
+
+    def budget(self, share=1.0, cap=None):
+        """Seconds for the next stage: `share` of what's left, at most `cap`."""
+        seconds = self.remaining() * share
+        return min(seconds, cap) if cap else seconds
+
+    def degrade(self, stage, reason):
+        self.degraded.append(f"{stage}: {reason}")
+        log_debug(f"Deadline: {stage} {reason}")
+
+@st.cache_resource
+def get_stage_executor():
+    return concurrent.futures.ThreadPoolExecutor(max_workers=32, thread_name_prefix="stage")
+
+def run_stage(deadline, stage, func, *args, share=1.0, cap=None, default=None, timeout_kw="timeout"):
+    """
+    Run func(*args) within its slice of the deadline; on timeout or error record it and return `default`.
+    The slice is also passed to func as `timeout_kw` (None: not passed), so the call itself gives up
+    when the stage does instead of holding a stage worker after it has been abandoned.
+    """
+    timeout = deadline.budget(share, cap)
+    if timeout < STAGE_MIN_BUDGET:
+        deadline.degrade(stage, "skipped, no time left")
+        return default
+    kwargs = {timeout_kw: timeout} if timeout_kw else {}
+    future = get_stage_executor().submit(func, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        deadline.degrade(stage, f"timed out after {timeout:.1f}s")
     except Exception as e:
-        return []
+        deadline.degrade(stage, f"failed ({e})")
+    return default
+
+# --- 📰 Source Enrichment (Concurrent Fetch + Content Cache) ---
+# The fact checker fetches the top FACT_CHECK_SOURCES result pages in parallel on
+# the stage pool, extracts their main text and passes the passages that best match
+# the query into the prompt. Extracted text is kept in a URL-keyed LRU bounded by
+# CONTENT_CACHE_BYTES, so an article is downloaded once per process, not per
+# session. Fetches still running when ENRICH_TIMEOUT (or the fact-check stage's
+# deadline, if sooner) expires are left to finish in the background and land in
+# the cache for the next check.
+FACT_CHECK_SOURCES = 5
+ENRICH_TIMEOUT = 4.0                # wall clock for the whole batch of page fetches
+ENRICH_MAX_PAGE_BYTES = 1_500_000
+CONTENT_CACHE_BYTES = 32 * 1024 * 1024
+CONTENT_FAILURE_TTL = 600           # unreachable pages are retried after this long
+PASSAGE_CHARS = 500                 # per source, in the prompt
+
+class ContentCache:
+    def __init__(self, max_bytes=CONTENT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()   # url -> (text or None on failure, size, stored_at)
+        self.size = 0
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """(found, text); text is None for a recently failed fetch."""
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry and (entry[0] is not None or time.time() - entry[2] < CONTENT_FAILURE_TTL):
+                self.entries.move_to_end(url)
+                self.hits += 1
+                return True, entry[0]
+            self.misses += 1
+            return False, None
+
+    def put(self, url, text):
+        size = len(text.encode()) if text else 0
+        if size > self.max_bytes: return
+        with self._lock:
+            old = self.entries.pop(url, None)
+            if old: self.size -= old[1]
+            self.entries[url] = (text, size, time.time())
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted, _) = self.entries.popitem(last=False)
+                self.size -= evicted
+
+    def stats(self):
+        with self._lock:
+            return {"pages": len(self.entries), "mb": round(self.size / 1048576, 1), "hits": self.hits, "misses": self.misses}
+
+@st.cache_resource
+def get_content_cache():
+    return ContentCache()
+
+class _MainTextExtractor(HTMLParser):
+    """Collects paragraph-level text, skipping scripts, styles and page chrome."""
+    SKIP = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "button"}
+    BLOCK = {"p", "h1", "h2", "h3", "li", "blockquote", "article", "section", "div", "br", "td"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skip_depth = 0
+        self.blocks, self.current = [], []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP: self.skip_depth += 1
+        elif tag in self.BLOCK: self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP: self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag in self.BLOCK: self._flush()
+
+    def handle_data(self, data):
+        if not self.skip_depth: self.current.append(data)
+
+    def _flush(self):
+        text = " ".join("".join(self.current).split())
+        if text: self.blocks.append(text)
+        self.current = []
+
+def extract_main_text(page):
+    parser = _MainTextExtractor()
+    try:
+        parser.feed(page)
+        parser.close()
+    except Exception: pass
+    parser._flush()
+    # Body copy comes in sentence-length blocks; menus and captions don't
+    body = [b for b in parser.blocks if len(b) >= 80]
+    return "\n".join(body or parser.blocks)
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?\s*([\w.:-]+)""", re.I)
+
+def page_encoding(resp, raw):
+    """
+    The charset of a fetched page: the Content-Type header's, else the <meta> tag's, else
+    UTF-8 if the bytes decode as such, else a guess from the bytes. (requests reports
+    ISO-8859-1 for any text/* response without a charset, which garbles UTF-8 pages.)
+    """
+    if "charset=" in resp.headers.get("Content-Type", "").lower() and resp.encoding:
+        return resp.encoding
+    match = _META_CHARSET.search(raw[:4096])
+    if match:
+        try: return codecs.lookup(match.group(1).decode("ascii")).name
+        except LookupError: pass
+    try:
+        raw.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        if e.start >= len(raw) - 3: return "utf-8"    # a multi-byte char cut by the size cap
+    return requests.compat.chardet.detect(raw[:65536])["encoding"] or "utf-8"
+
+def fetch_article_text(url, timeout=ENRICH_TIMEOUT):
+    """Download (size-capped) and extract one page, caching the outcome. Returns text or None."""
+    text = None
+    try:
+        with requests.get(url, timeout=timeout, stream=True, headers={"User-Agent": "Mozilla/5.0 (BeHolmes Fact Checker)"}) as resp:
+            if resp.status_code == 200 and "html" in resp.headers.get("Content-Type", "html"):
+                raw = b""
+                for chunk in resp.iter_content(65536):
+                    raw += chunk
+                    if len(raw) >= ENRICH_MAX_PAGE_BYTES: break
+                text = extract_main_text(raw.decode(page_encoding(resp, raw), errors="replace")) or None
+    except Exception: pass
+    get_content_cache().put(url, text)
+    return text
+
+def fetch_source_texts(urls, deadline=None):
+    """{url: text} for the pages available within ENRICH_TIMEOUT and `deadline` (cache first, misses fetched concurrently)."""
+    timeout = min(ENRICH_TIMEOUT, deadline.remaining()) if deadline else ENRICH_TIMEOUT
+    cache = get_content_cache()
+    texts, pending = {}, {}
+    for url in dict.fromkeys(urls):
+        found, text = cache.get(url)
+        if found:
+            if text: texts[url] = text
+        else:
+            pending[get_stage_executor().submit(fetch_article_text, url, max(timeout, STAGE_MIN_BUDGET))] = url
+    if pending:
+        done, _ = concurrent.futures.wait(pending, timeout=timeout)
+        for future in done:
+            text = future.result()
+            if text: texts[pending[future]] = text
+    return texts
+
+def key_passages(text, query, max_chars=PASSAGE_CHARS):
+    """The sentences sharing the most words with the query, in document order, up to max_chars."""
+    words = {w for w in re.findall(r"\w+", query.lower()) if len(w) > 2} - _HEADLINE_STOPWORDS - {"analyze", "this", "news", "latest"}
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?。！？])\s+|\n", text) if len(s.strip()) > 20]
+    if not sentences: return ""
+    overlap = [len(words & set(re.findall(r"\w+", s.lower()))) for s in sentences]
+    # Matching sentences, best first; a page that never mentions the query contributes its lead
+    ranked = sorted((i for i in range(len(sentences)) if overlap[i]), key=lambda i: -overlap[i]) or range(len(sentences))
+    picked, used = [], 0
+    for i in ranked:
+        if used + len(sentences[i]) > max_chars and picked: continue
+        picked.append(i)
+        used += len(sentences[i])
+        if used >= max_chars: break
+    passage = " ".join(sentences[i] for i in sorted(picked))
+    return passage if len(passage) <= max_chars else passage[:max_chars].rsplit(" ", 1)[0] + "…"
+
+def _exa_request(exa, timeout, endpoint, data=None, method="POST", params=None, headers=None):
+    """Exa.request with a timeout on plain POSTs (the SDK sends its requests without one)."""
+    if method.upper() != "POST" or params or (isinstance(data, dict) and data.get("stream")):
+        return Exa.request(exa, endpoint, data, method, params, headers)
+    body = data if isinstance(data, str) else json.dumps(data, cls=ExaJSONEncoder) if data else None
+    res = requests.post(exa.base_url + endpoint, data=body, headers={**exa.headers, **(headers or {})}, timeout=timeout)
+    if res.status_code >= 400:
+        raise ValueError(f"Request failed with status code {res.status_code}: {res.text}")
+    return res.json()
+
+def exa_search(query, num_results, timeout=10):
+    """Exa search that gives up after `timeout` seconds."""
+    exa = Exa(EXA_API_KEY, base_url=EXA_API_BASE)
+    exa.request = functools.partial(_exa_request, exa, timeout)
+    return exa.search(query, num_results=num_results)
 
 # --- 🔥 ROBUST FACT CHECKER (Exa V1.9) ---
-def verify_news_with_exa(query):
+def fact_check_cacheable(result):
+    """
+    Only complete checks are shared: not outages, and not results whose source pages
+    weren't fetched in time. Those fetches finish into the content cache, so the next
+    check of the same query comes back with the passages.
+    """
+    if result.startswith("⚠️ 事实核查服务暂时不可用"): return False
+    return not result.startswith("✅") or "(Key Passages)" in result
+
+@shared_cache("factcheck", ttl=1800, cacheable=fact_check_cacheable, ignore=("deadline", "timeout"))
+def verify_news_with_exa(query, deadline=None, timeout=10):
     """
     Searches EXA for the news topic itself (not just markets) to verify authenticity.
-    Uses 'auto' type which is the most robust.
+    Uses 'auto' type which is the most robust. The search gets at most `timeout` seconds;
+    source pages are fetched within `deadline`.
     """
     if not EXA_AVAILABLE or not EXA_API_KEY: 
         return "⚠️ 无法进行全网事实核查 (Exa API 未配置)。"
     
     try:
-        exa = Exa(EXA_API_KEY)
         # 🔥 V1.9 FIX: Use 'auto' search, remove ALL other fancy parameters
         # Also searches for X/Twitter specifically to mimic Grok
         search_query = f"{query} news latest"
-        
-        search_resp = exa.search(
+        # Half the check's time at most: the source pages need the rest
+        search_timeout = min(timeout, deadline.budget(0.5)) if deadline else timeout
+        search_resp = exa_search(
             search_query,
-            num_results=3
+            num_results=FACT_CHECK_SOURCES,
+            timeout=max(search_timeout, STAGE_MIN_BUDGET)
         )
         
         if not search_resp.results:
             return "⚠️ **事实核查警报**：全网未搜索到与此事件直接相关的权威新闻报道。这可能是一则假新闻，或者是尚未被主流媒体报道的传闻。请保持高度怀疑。"
             
         articles = []
-        for r in search_resp.results:
+        results = search_resp.results[:FACT_CHECK_SOURCES]
+        for r in results:
             title = getattr(r, 'title', 'Article')
             url = getattr(r, 'url', '#')
             # Extract domain
@@ -660,38 +2499,88 @@ def verify_news_with_exa(query):
             articles.append(f"- [{title}]({url}) (Via {domain})")
             
         articles_text = "\n".join(articles)
-        return f"✅ **全网事实核查 (Web Fact Check)**:\n{articles_text}\n\n(AI将基于上述搜索结果验证事件真实性)"
+
+        # Evidence: key passages from the source pages themselves (fetched concurrently, cached by URL)
+        texts = fetch_source_texts([getattr(r, 'url', '') for r in results if getattr(r, 'url', '').startswith("http")], deadline)
+        passages = []
+        for r in results:
+            passage = key_passages(texts.get(getattr(r, 'url', ''), ""), query)
+            if passage:
+                domain = urllib.parse.urlparse(r.url).netloc.replace('www.', '')
+                passages.append(f"> **{domain}**: {passage}")
+        if not passages:
+            return f"✅ **全网事实核查 (Web Fact Check)**:\n{articles_text}\n\n(AI将基于上述搜索结果验证事件真实性)"
+        passages_text = "\n>\n".join(passages)
+        return f"✅ **全网事实核查 (Web Fact Check)**:\n{articles_text}\n\n**📄 来源摘录 (Key Passages)**\n{passages_text}\n\n(AI将基于上述来源及摘录验证事件真实性)"
     except Exception as e:
-        st.session_state.debug_logs.append(f"Exa Fact Check Failed: {str(e)}")
+        log_debug(f"Exa Fact Check Failed: {str(e)}")
         return f"⚠️ 事实核查服务暂时不可用 (Connection Error)"
 
-def search_market_data_list(user_query):
+@shared_cache("gamma", ttl=60, cacheable=lambda v: v is not None, ignore=("timeout",))
+def fetch_gamma_json(url, timeout=5):
+    """GET a Gamma API url through the shared cache. Returns None on failure."""
+    resp = requests.get(url, timeout=timeout)
+    if resp.status_code != 200: return None
+    return resp.json()
+
+# Two-tier loading: lists carry event summaries; the full sub-market detail of an
+# event is built only when it is opened, and cached per slug. The structure changes
+# rarely and prices on screen come from the live-odds overlay, hence the long TTL.
+EVENT_DETAIL_TTL = 300
+# The detail view draws (and keeps live) the SUB_MARKETS_SHOWN highest-volume sub-markets;
+# the rest are drawn, and watched, only while their expander is open.
+SUB_MARKETS_SHOWN = 6
+
+@st.cache_data(ttl=EVENT_DETAIL_TTL, show_spinner=False)
+def fetch_event_detail(slug):
+    """Processed event with every sub-market for one slug. Raises LookupError (not cached) if unavailable."""
+    data = fetch_gamma_json(f"{GAMMA_API_BASE}/events?slug={urllib.parse.quote(slug)}")
+    market = process_polymarket_event(data[0], detail=True) if data and isinstance(data, list) else None
+    if market is None: raise LookupError(slug)
+    return market
+
+def market_detail(market):
+    """Full-detail version of a summary; on lookup failure, the summary with no sub-markets."""
+    if not market or "markets" in market: return market
+    try: return fetch_event_detail(market['slug'])
+    except Exception: return dict(market, markets=[])
+
+def search_market_data_list(user_query, deadline=None):
     """
     Search Markets with:
     1. Keyword Generation (Translate & Simplify)
     2. Dual Engine Search (API + Exa)
     3. Strict Filtering (Remove irrelevant junk)
+    Every remote stage runs within `deadline` (a Deadline); skipped stages are recorded on it.
     """
+    deadline = deadline or Deadline(SEARCH_DEADLINE)
     candidates = []
     seen_slugs = set()
     
     # 1. Generate Keywords (Crucial: Translate "SpaceX上市" -> "SpaceX IPO")
-    keywords = generate_keywords(user_query) 
+    keywords = run_stage(deadline, "keyword generation", generate_keywords, user_query, share=0.3, cap=10, default=user_query)
     
     # Define search terms: [Generated Keywords, Raw Input]
     search_terms = []
     if keywords: search_terms.append(keywords)
     
-    # --- Engine A: Direct Polymarket API Search ---
+    # --- Engine A: Local catalog mirror, else direct Polymarket API search ---
+    mirror = ready_mirror()
     for term in search_terms:
         if not term: continue
+        if mirror:
+            for market_data in mirror.search(term, limit=10):
+                title = market_data['title'].lower()
+                if any(w in title for w in term.lower().split() if len(w)>3) and market_data['slug'] not in seen_slugs:
+                    candidates.append(market_data)
+                    seen_slugs.add(market_data['slug'])
+            continue
         try:
             encoded_kw = urllib.parse.quote(term)
-            direct_url = f"https://gamma-api.polymarket.com/events?q={encoded_kw}&limit=10&closed=false"
-            direct_resp = requests.get(direct_url, timeout=5)
+            direct_url = f"{GAMMA_API_BASE}/events?q={encoded_kw}&limit=10&closed=false"
+            direct_data = run_stage(deadline, "market search", fetch_gamma_json, direct_url, share=0.5, cap=5)
             
-            if direct_resp.status_code == 200:
-                direct_data = direct_resp.json()
+            if direct_data is not None:
                 if isinstance(direct_data, list):
                     for event in direct_data:
                         # 🛡️ FILTER: Title must match keywords roughly
@@ -711,14 +2600,13 @@ def search_market_data_list(user_query):
     # Only run if API gave few results
     if EXA_AVAILABLE and EXA_API_KEY and len(candidates) < 5 and keywords:
         try:
-            exa = Exa(EXA_API_KEY)
             # Search specifically for Polymarket pages
-            search_resp = exa.search(
+            search_resp = run_stage(deadline, "Exa market search", exa_search,
                 f"site:polymarket.com {keywords}",
-                num_results=10
-            )
+                10,
+                share=0.6)
             
-            for result in search_resp.results:
+            for result in (search_resp.results if search_resp else []):
                 match = re.search(r'polymarket\.com/event/([^/]+)', result.url)
                 if match:
                     slug_raw = match.group(1)
@@ -726,9 +2614,15 @@ def search_market_data_list(user_query):
                     
                     if slug in seen_slugs: continue
                     seen_slugs.add(slug)
-                    
-                    api_url = f"https://gamma-api.polymarket.com/events?slug={slug}"
-                    data = requests.get(api_url, timeout=5).json()
+
+                    market_data = mirror.get(slug) if mirror else None
+                    if market_data:
+                        if any(w in market_data['title'].lower() for w in keywords.lower().split() if len(w)>3):
+                            candidates.append(market_data)
+                        continue
+
+                    api_url = f"{GAMMA_API_BASE}/events?slug={slug}"
+                    data = run_stage(deadline, f"slug lookup {slug}", fetch_gamma_json, api_url, share=0.5, cap=5)
                     
                     if data and isinstance(data, list):
                         # 🛡️ FILTER HERE TOO
@@ -738,23 +2632,375 @@ def search_market_data_list(user_query):
                             if market_data:
                                 candidates.append(market_data)
         except Exception as e:
-            st.session_state.debug_logs.append(f"Exa Market Search Failed: {str(e)}")
+            log_debug(f"Exa Market Search Failed: {str(e)}")
     
     return candidates
 
+# --- ⚡ Analysis Result Cache ---
+# Content-addressed: normalized query + market slug + language + implied-probability
+# bucket (+ any follow-up turns). Once the market trades out of its bucket the key
+# changes and the old entries for that slug are evicted.
+ANALYSIS_CACHE_TTL = 1800
+ANALYSIS_CACHE_MAX_ENTRIES = 500
+ANALYSIS_BUCKET_WIDTH = 0.05
+
+def normalize_query(text):
+    text = re.sub(r"^\s*analyze this news:\s*", "", text or "", flags=re.I)
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+def probability_bucket(prob):
+    return int(float(prob or 0) / ANALYSIS_BUCKET_WIDTH)
+
+def analysis_cache_key(history, market_data):
+    first_query = history[0]['content'] if history else ""
+    slug = market_data.get('slug', '') if market_data else ""
+    bucket = probability_bucket(market_data.get('probability', 0)) if market_data else -1
+    follow_ups = [(m['role'], m['content']) for m in history[1:]]
+    raw = json.dumps([normalize_query(first_query), slug, is_chinese_input(first_query), bucket, follow_ups], ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest(), slug, bucket
+
+class AnalysisCache:
+    """In-process LRU + TTL layer in front of the shared (cross-replica) backend."""
+    def __init__(self, max_entries=ANALYSIS_CACHE_MAX_ENTRIES, ttl=ANALYSIS_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()   # key -> (value, expires_at, slug, bucket)
+        self.by_slug = {}                          # slug -> set(key)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, slug, bucket):
+        self.invalidate_slug(slug, bucket)
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        shared = get_shared_cache().get(f"analysis:{key}")
+        if shared and shared[1] > now:
+            self._store(key, shared[0], slug, bucket)
+            self.hits += 1
+            return shared[0]
+        self.misses += 1
+        return None
+
+    def contains(self, key):
+        """Whether a live entry exists (no hit/miss accounting, no promotion)."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > time.time(): return True
+        shared = get_shared_cache().get(f"analysis:{key}")
+        return bool(shared and shared[1] > time.time())
+
+    def put(self, key, value, slug, bucket):
+        self._store(key, value, slug, bucket)
+        get_shared_cache().set(f"analysis:{key}", value, self.ttl, self.ttl)
+
+    def _store(self, key, value, slug, bucket):
+        with self._lock:
+            self.entries[key] = (value, time.time() + self.ttl, slug, bucket)
+            self.entries.move_to_end(key)
+            self.by_slug.setdefault(slug, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                old_key, (_, _, old_slug, _) = self.entries.popitem(last=False)
+                self.by_slug.get(old_slug, set()).discard(old_key)
+
+    def invalidate_slug(self, slug, current_bucket):
+        """Drop entries for `slug` that were produced in a different probability bucket."""
+        if not slug: return
+        with self._lock:
+            stale = [k for k in self.by_slug.get(slug, ()) if self.entries.get(k, (None, 0, None, current_bucket))[3] != current_bucket]
+            for k in stale:
+                self.entries.pop(k, None)
+                self.by_slug[slug].discard(k)
+        for k in stale:
+            get_shared_cache().delete(f"analysis:{k}")
+
+    def observe_markets(self, markets):
+        """Called on market refresh: evict analyses whose market moved out of its bucket."""
+        for m in markets:
+            if m.get('slug') in self.by_slug:
+                self.invalidate_slug(m['slug'], probability_bucket(m.get('probability', 0)))
+
+@st.cache_resource
+def get_analysis_cache():
+    return AnalysisCache()
+
+def analysis_cached(func):
+    """Decorator for get_agent_response: serve repeated (query, market, odds bucket) analyses from cache."""
+    @functools.wraps(func)
+    def wrapper(history, market_data, deadline=None, on_progress=None):
+        key, slug, bucket = analysis_cache_key(history, market_data)
+        cache = get_analysis_cache()
+        cached = cache.get(key, slug, bucket)
+        if cached is not None:
+            return cached
+        deadline = deadline or Deadline(ANALYSIS_DEADLINE)
+        text = func(history, market_data, deadline, on_progress)
+        # Degraded answers (a stage was cut short) are not worth replaying to the next analyst
+        if not text.startswith("Agent Analysis Failed") and not deadline.degraded:
+            cache.put(key, text, slug, bucket)
+        return text
+    return wrapper
+
+# --- 🤖 LLM Providers (Hedged Routing) ---
+# Every generation goes through one router. It asks the primary provider first and,
+# if no answer arrives within `hedge_after` seconds (or the call fails), fires the
+# same request at the next provider. The first usable answer wins.
+# Settings: LLM_PROVIDERS ("gemini,openai"), OPENAI_API_KEY / OPENAI_BASE_URL / OPENAI_MODEL,
+# LLM_HEDGE_AFTER (s), LLM_DEADLINE (s).
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# 🔥 CRITICAL FIX: Disable Safety Filters for Financial/Political Analysis
+GEMINI_SAFETY_SETTINGS = {
+    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+}
+
+class LLMProvider:
+    """messages: [{"role": "user" | "assistant", "content": str}, ...]"""
+    name = "base"
+
+    def generate(self, messages, timeout):
+        raise NotImplementedError
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, model_name=GEMINI_MODEL):
+        self.model_name = model_name
+
+    def generate(self, messages, timeout):
+        model = genai.GenerativeModel(self.model_name)
+        api_messages = [{"role": "user" if m['role'] == "user" else "model", "parts": [m['content']]} for m in messages]
+        response = model.generate_content(api_messages, safety_settings=GEMINI_SAFETY_SETTINGS, request_options={"timeout": timeout})
+        return response.text
+
+class OpenAICompatProvider(LLMProvider):
+    """Any OpenAI-compatible /chat/completions endpoint (OpenAI, vLLM, a local stand-in server...)."""
+    name = "openai"
+
+    def __init__(self, api_key, base_url=None, model="gpt-4o-mini"):
+        self.client = OpenAI(api_key=api_key or "not-needed", base_url=base_url, max_retries=0)
+        self.model = model
+
+    def generate(self, messages, timeout):
+        resp = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": m['role'], "content": m['content']} for m in messages],
+            timeout=timeout,
+        )
+        return resp.choices[0].message.content
+
+class RecordingProvider(LLMProvider):
+    """Wraps a live provider and archives each completion (record mode)."""
+    def __init__(self, inner, archive):
+        self.inner = inner
+        self.archive = archive
+        self.name = inner.name
+
+    def generate(self, messages, timeout):
+        start = time.monotonic()
+        text = self.inner.generate(messages, timeout)
+        self.archive.record("llm", llm_exchange_key(messages), text.encode("utf-8"), time.monotonic() - start)
+        return text
+
+class ReplayProvider(LLMProvider):
+    """Serves completions from the archive (replay mode)."""
+    name = "replay"
+
+    def __init__(self, archive):
+        self.archive = archive
+
+    def generate(self, messages, timeout):
+        hit = self.archive.replay(llm_exchange_key(messages))
+        if hit is None:
+            raise LookupError("LLM exchange not in archive")
+        return hit["body"].decode("utf-8")
+
+def llm_exchange_key(messages):
+    return "LLM #" + hashlib.sha1(json.dumps(messages, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+class LLMRouter:
+    def __init__(self, providers, hedge_after=8.0, deadline=90.0):
+        self.providers = providers
+        self.hedge_after = hedge_after
+        self.deadline = deadline
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm")
+        self.wins = collections.Counter()
+        self.hedges = 0
+
+    def generate(self, messages, deadline=None, hedge_after=None):
+        """Return the first successful completion; raise the last error (or TimeoutError) otherwise."""
+        if not self.providers:
+            raise RuntimeError("No LLM provider configured")
+        deadline = deadline or self.deadline
+        hedge_after = self.hedge_after if hedge_after is None else hedge_after
+        end = time.monotonic() + deadline
+        pending = {}
+        queue = list(self.providers)
+        last_error = None
+
+        def launch():
+            provider = queue.pop(0)
+            remaining = max(end - time.monotonic(), 0.1)
+            pending[self.executor.submit(provider.generate, messages, remaining)] = provider
+
+        launch()
+        while pending:
+            remaining = end - time.monotonic()
+            if remaining <= 0: break
+            wait_for = min(hedge_after, remaining) if queue else remaining
+            done, _ = concurrent.futures.wait(pending, timeout=wait_for, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    text = future.result()
+                    if text:
+                        self.wins[provider.name] += 1
+                        return text
+                    last_error = RuntimeError(f"{provider.name}: empty response")
+                except Exception as e:
+                    last_error = e
+            # Slow or failed: hedge with the next provider
+            if queue and (not done or not pending):
+                if pending: self.hedges += 1
+                launch()
+        raise last_error or TimeoutError(f"LLM deadline of {deadline:g}s exceeded")
+
+@st.cache_resource
+def get_llm_router():
+    available = {}
+    if GOOGLE_API_KEY:
+        available["gemini"] = GeminiProvider()
+    openai_key = get_setting("OPENAI_API_KEY")
+    openai_base = get_setting("OPENAI_BASE_URL")
+    if OPENAI_AVAILABLE and (openai_key or openai_base):
+        available["openai"] = OpenAICompatProvider(openai_key, openai_base, get_setting("OPENAI_MODEL", "gpt-4o-mini"))
+    order = [p.strip() for p in str(get_setting("LLM_PROVIDERS", "gemini,openai")).split(",")]
+    providers = [available[p] for p in order if p in available]
+    if NET_MODE == "replay":
+        providers = [ReplayProvider(get_net_archive())]
+    elif NET_MODE == "record":
+        providers = [RecordingProvider(p, get_net_archive()) for p in providers]
+    return LLMRouter(providers, hedge_after=float(get_setting("LLM_HEDGE_AFTER", 8)), deadline=float(get_setting("LLM_DEADLINE", 90)))
+
+# --- 🧮 D0. Pricing Precomputation (Implied Odds, Spread, EV) ---
+# The arithmetic the memo needs (odds, spreads, expected value, entry prices) is
+# done here and handed to the model as a compact table, so generation is spent on
+# the narrative only. Prices are share prices in 0-1 (Polymarket pays $1 per share).
+PRICING_MAX_ROWS = 8                         # sub-markets in the table (highest volume first)
+EV_PROBABILITY_OFFSETS = (-20, -10, -5, 5, 10, 20)   # subjective probabilities, pp around the price
+EV_TARGET_EDGE = 0.10                        # EV per $1 demanded for the "max entry" column
+
+def implied_odds(price):
+    """Share price -> (decimal odds, American odds); (None, None) at 0 or 1."""
+    if not 0 < price < 1: return None, None
+    american = -100 * price / (1 - price) if price >= 0.5 else 100 * (1 - price) / price
+    return 1 / price, american
+
+def outcome_prices(sub_market):
+    """[(outcome, price)] of a build_sub_market dict, highest price first."""
+    if sub_market.get('type') == 'binary':
+        pairs = [("Yes", sub_market.get('yes_price', 0) / 100), ("No", sub_market.get('no_price', 0) / 100)]
+    else:
+        pairs = [(o['option'], o['price'] / 100) for o in sub_market.get('options', [])]
+    return sorted(pairs, key=lambda x: x[1], reverse=True)
+
+def liquidity_confidence(liquidity):
+    """0 at <= $1K of liquidity, 1 at >= $1M, log-linear in between."""
+    return min(max(math.log10(max(liquidity, 1)) - 3, 0), 3) / 3
+
+def price_market(market_data):
+    """
+    Deterministic pricing for one processed event:
+    {"outcome", "against", "price", "against_price", "confidence", "sub_markets": [...], "ev": [...]}.
+    EV rows are per $1 staked on the main market's leading outcome (and on the other
+    side, at its own quoted price, when the main market has exactly two outcomes).
+    """
+    subs = market_data.get('markets', [])
+    rows = []
+    for sm in subs[:PRICING_MAX_ROWS]:
+        prices = outcome_prices(sm)
+        if not prices: continue
+        top_name, top = prices[0]
+        decimal, american = implied_odds(top)
+        rows.append({"question": sm.get('question', ''), "outcome": top_name, "price": top, "decimal": decimal, "american": american,
+                     "spread_pp": (top - prices[1][1]) * 100 if len(prices) > 1 else None,
+                     "overround_pp": (sum(p for _, p in prices) - 1) * 100})
+
+    main = outcome_prices(subs[0]) if subs else []      # the highest-volume market
+    p = main[0][1] if main else market_data.get('probability', 0)
+    outcome = main[0][0] if main else "Yes"
+    # The other side's own price: with a spread or overround on the book it isn't 1 - p
+    against, pa = (main[1][0], main[1][1]) if len(main) == 2 and 0 < main[1][1] < 1 else (None, None)
+    confidence = liquidity_confidence(market_data.get('liquidity', 0))
+    ev = []
+    if 0 < p < 1:
+        for q in sorted({min(max(round(p * 100) + off, 1), 99) / 100 for off in EV_PROBABILITY_OFFSETS} | {round(p, 2)}):
+            ev_for = q / p - 1
+            ev_against = (1 - q) / pa - 1 if against else None
+            if ev_against is None or ev_for >= ev_against: side, kelly = outcome, (q - p) / (1 - p)
+            else: side, kelly = against, (1 - q - pa) / (1 - pa)
+            ev.append({"q": q, "ev_for": ev_for, "ev_against": ev_against,
+                       "side": side if kelly > 0 and side else None,
+                       "kelly_adj": max(kelly, 0) * confidence if side else 0.0,
+                       "max_entry_for": q / (1 + EV_TARGET_EDGE),
+                       "max_entry_against": (1 - q) / (1 + EV_TARGET_EDGE) if against else None})
+    return {"outcome": outcome, "against": against, "price": p, "against_price": pa, "confidence": confidence,
+            "sub_markets": rows, "ev": ev}
+
+def pricing_table(market_data, is_cn=True):
+    """Markdown block with the precomputed numbers, for the market context."""
+    pricing = price_market(market_data)
+    if not pricing["sub_markets"] and not pricing["ev"]: return ""
+    cents = lambda v: f"{v * 100:.1f}¢"
+    pct = lambda v: f"{v * 100:+.0f}%" if v is not None else "—"
+    odds = lambda r: f"{r['decimal']:.2f} / {r['american']:+.0f}" if r['decimal'] else "—"
+    if is_cn:
+        lines = [f"**🧮 定价表（已预先计算，请直接引用）** · 流动性置信度 {pricing['confidence']:.2f}",
+                 "| 细分市场 | 领先结果 | 价格 | 赔率 (小数/美式) | 领先差 | 溢价 |", "|---|---|---|---|---|---|"]
+    else:
+        lines = [f"**🧮 Pricing Table (precomputed; quote, don't recompute)** · liquidity confidence {pricing['confidence']:.2f}",
+                 "| Sub-market | Leading | Price | Odds (dec/US) | Spread | Overround |", "|---|---|---|---|---|---|"]
+    for r in pricing["sub_markets"]:
+        spread = f"{r['spread_pp']:.1f}pp" if r['spread_pp'] is not None else "—"
+        lines.append(f"| {r['question'][:60]} | {r['outcome']} | {cents(r['price'])} | {odds(r)} | {spread} | {r['overround_pp']:+.1f}pp |")
+    if pricing["ev"]:
+        o, a = pricing["outcome"], pricing["against"] or "—"
+        quoted = f"「{o}」现价 {cents(pricing['price'])}" + (f"，「{a}」现价 {cents(pricing['against_price'])}" if pricing["against"] else "")
+        quoted_en = f"'{o}' trades at {cents(pricing['price'])}" + (f", '{a}' at {cents(pricing['against_price'])}" if pricing["against"] else "")
+        lines.append("")
+        if is_cn:
+            lines.append(f"**EV 表**（每投入 $1 的期望收益；{quoted}；凯利仓位已乘流动性置信度；最高入场价对应 +{EV_TARGET_EDGE:.0%} EV）")
+            lines += [f"| 你的概率 ({o}) | EV 买 {o} | EV 买 {a} | 方向 | 凯利×置信 | 最高入场 {o} | 最高入场 {a} |", "|---|---|---|---|---|---|---|"]
+        else:
+            lines.append(f"**EV Table** (per $1 staked; {quoted_en}; Kelly scaled by liquidity confidence; max entry = price for +{EV_TARGET_EDGE:.0%} EV)")
+            lines += [f"| Your P({o}) | EV buy {o} | EV buy {a} | Side | Kelly×conf | Max entry {o} | Max entry {a} |", "|---|---|---|---|---|---|---|"]
+        for r in pricing["ev"]:
+            against_entry = cents(r['max_entry_against']) if r['max_entry_against'] is not None else "—"
+            lines.append(f"| {r['q']:.0%} | {pct(r['ev_for'])} | {pct(r['ev_against'])} | {r['side'] or '—'} | {r['kelly_adj']:.1%} | {cents(r['max_entry_for'])} | {against_entry} |")
+    return "\n" + "\n".join(lines) + "\n"
+
 # --- 🔥 D. AGENT LOGIC (GEMINI) ---
-def generate_keywords(user_text):
+@shared_cache("keywords", ttl=86400, ignore=("timeout",))
+def generate_keywords(user_text, timeout=10):
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
         prompt = f"Translate this news topic into 2-3 simple English keywords for searching on Polymarket. Example: 'SpaceX上市' -> 'SpaceX IPO'. Input: {user_text}"
-        resp = model.generate_content(prompt)
-        return resp.text.strip()
+        return get_llm_router().generate([{"role": "user", "content": prompt}], deadline=timeout, hedge_after=min(2.5, timeout / 2)).strip()
     except: return user_text
 
 def is_chinese_input(text):
     return bool(re.search(r'[\u4e00-\u9fff]', text))
 
 def generate_market_context(market_data, is_cn=True):
+    # Prefer live odds for the selected market over the snapshot taken at search time
+    market_data = get_live_prices().overlay(market_data)
     if not market_data:
         if is_cn: return "❌ **无直接预测市场数据** (No direct prediction market found)."
         else: return "❌ **NO DIRECT MARKET DATA**."
@@ -775,12 +3021,16 @@ def generate_market_context(market_data, is_cn=True):
     sub_markets_str = ""
     if market_data.get('markets'):
         sub_items = []
-        for sm in market_data['markets']:
+        # Highest-volume sub-markets only; events can carry dozens
+        for sm in market_data['markets'][:PRICING_MAX_ROWS]:
             q = sm.get('question', 'Sub-market')
             top = sm.get('top_option', 'N/A')
             price = sm.get('top_price', 0) * 100
             item = f"- **{q}**: 倾向于 **{top}** ({price:.1f}%)" if is_cn else f"- **{q}**: Leaning **{top}** ({price:.1f}%)"
             sub_items.append(item)
+        hidden = len(market_data['markets']) - PRICING_MAX_ROWS
+        if hidden > 0:
+            sub_items.append(f"- （另有 {hidden} 个较小的细分市场）" if is_cn else f"- (+{hidden} smaller sub-markets)")
         sub_markets_str = "\n".join(sub_items)
 
     if is_cn:
@@ -819,10 +3069,12 @@ def generate_market_context(market_data, is_cn=True):
 2. **Strength & Trend:** Consensus is **{trend_text_en}**, with **{confidence_text_en}** reliability due to liquidity.
 3. **How to Use This:** Treat **{prob:.0%}** as your **neutral baseline** for credibility. Be skeptical if news narratives deviate wildly from this anchor.
 """
+    market_context += pricing_table(market_data, is_cn)
+    market_context += correlation_context(market_data.get('slug'), is_cn)
     return market_context
 
-def get_agent_response(history, market_data):
-    model = genai.GenerativeModel('gemini-2.5-flash')
+@analysis_cached
+def get_agent_response(history, market_data, deadline, on_progress=None):
     current_date = datetime.datetime.now().strftime("%Y-%m-%d")
     first_query = history[0]['content'] if history else ""
     is_cn = is_chinese_input(first_query)
@@ -830,8 +3082,14 @@ def get_agent_response(history, market_data):
     # 1. Market Context
     market_context = generate_market_context(market_data, is_cn)
     
-    # 2. 🔥 Fact Check via Exa (Simplified call)
-    fact_check_info = verify_news_with_exa(first_query)
+    # 2. 🔥 Fact Check via Exa (Simplified call) - at most 30% of the budget; the memo gets the rest
+    skipped = "⚠️ 事实核查超时，本次分析未包含全网核查结果。" if is_cn else "⚠️ Fact check timed out; this analysis does not include web verification."
+    # The source fetches inside get the same slice (less a margin to format the result) as a deadline
+    # of their own, so slow pages cost the passages rather than the whole fact check
+    check_deadline = Deadline(deadline.budget(0.3, 15) - STAGE_MIN_BUDGET)
+    fact_check_info = run_stage(deadline, "fact check", functools.partial(verify_news_with_exa, deadline=check_deadline),
+                                first_query, share=0.3, cap=15, default=skipped)
+    if on_progress: on_progress("fact_check", fact_check_info)
     
     combined_context = f"{fact_check_info}\n\n{market_context}"
 
@@ -846,7 +3104,7 @@ def get_agent_response(history, market_data):
         2. **逻辑自洽:** 严禁逻辑断层。
         3. **强制链接:** 提到标的时必须加链接 (如 [NVDA](https://finance.yahoo.com/quote/NVDA))。
         4. **语言强制:** **必须全程使用中文回答**。
-        5. **事实核查:** 基于上方提供的全网事实核查结果进行分析。如果核查结果显示新闻可疑或无法验证，必须在分析中明确指出风险。
+        5. **事实核查:** 基于上方提供的全网事实核查结果（含来源摘录）进行分析。如果核查结果显示新闻可疑或无法验证，必须在分析中明确指出风险。
 
         {combined_context}
         
@@ -879,10 +3137,7 @@ def get_agent_response(history, market_data):
         #### A. 🔮 预测市场策略 (Prediction Market Alpha)
         * **Polymarket 标的**: [引用上方提供的市场名称]
         * **操作建议**: **买入 YES** / **买入 NO** / **观望**
-        * **价格策略**: 
-            * 当前价格: [填入价格]
-            * 目标入场价: [建议价格]
-            * **胜率赔率分析 (EV)**: (例如："当前价格30¢暗示30%概率，但我基于新闻判断实际概率为60%，存在巨大的正期望值。")
+        * **价格策略**: 给出你对该结果的概率判断，并引用上方 EV 表中最接近的一行（EV、最高入场价）。所有数字以定价表为准，不要自行计算。
         
         #### B. 📈 传统金融市场 (TradFi / Crypto)
         * **核心多头 (Long)**:
@@ -905,7 +3160,7 @@ def get_agent_response(history, market_data):
         2. **LOGIC:** Maintain strict logical consistency.
         3. **LINKS:** Link all tickers (e.g. [AAPL](https://finance.yahoo.com/quote/AAPL)).
         4. **LANGUAGE:** English Only.
-        5. **FACT CHECK:** Base your analysis on the fact-checking results provided above. If results show the news is suspicious or unverifiable, clearly highlight the risks in your analysis.
+        5. **FACT CHECK:** Base your analysis on the fact-checking results (sources and excerpts) provided above. If results show the news is suspicious or unverifiable, clearly highlight the risks in your analysis.
 
         {combined_context}
         
@@ -939,10 +3194,7 @@ def get_agent_response(history, market_data):
         #### A. 🔮 Prediction Market Alpha
         * **Polymarket Target**: [Reference the market name above]
         * **Action**: **Buy YES** / **Buy NO** / **Wait**
-        * **Pricing Strategy**: 
-            * Current Price: [Insert Price]
-            * Target Entry: [Suggested Price]
-            * **EV Analysis**: (e.g., "Current price 30¢ implies 30% odds, but based on news I estimate 60% probability. Positive Expected Value.")
+        * **Pricing Strategy**: State your probability estimate and cite the nearest EV Table row above (EV, max entry). Take every number from the Pricing Table; do not compute your own.
         
         #### B. 📈 Traditional Markets (TradFi / Crypto)
         * **Core Long (Long)**:
@@ -956,27 +3208,1108 @@ def get_agent_response(history, market_data):
         * One-sentence summary of trading direction.
         """
     
-    api_messages = [{"role": "user", "parts": [system_prompt]}]
+    api_messages = [{"role": "user", "content": system_prompt}]
     for msg in history:
-        role = "user" if msg['role'] == "user" else "model"
-        api_messages.append({"role": role, "parts": [msg['content']]})
+        role = "user" if msg['role'] == "user" else "assistant"
+        api_messages.append({"role": role, "content": msg['content']})
         
+    if on_progress: on_progress("memo", None)
+    if deadline.remaining() < 1:
+        deadline.degrade("memo", "skipped, no time left")
+        return "Agent Analysis Failed: time budget exhausted"
     try:
-        # 🔥 CRITICAL FIX: Disable Safety Filters for Financial/Political Analysis
-        safety_settings = {
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
-        
-        response = model.generate_content(api_messages, safety_settings=safety_settings)
-        return response.text
+        return get_llm_router().generate(api_messages, deadline=deadline.remaining())
     except Exception as e:
+        deadline.degrade("memo", f"failed ({e})")
         return f"Agent Analysis Failed: {str(e)}"
 
+# --- 🔥 E. Headline → Market Match Matrix (Precomputed) ---
+# Headlines and markets are embedded with the hashing trick into one shared
+# feature space, so a refresh is a single matrix product. Only rows (headlines)
+# and columns (markets) that are new since the last refresh get scored.
+MATCH_DIM = 4096
+MATCH_TOP_K = 5
+MATCH_MIN_SCORE = 0.12
+_MATCH_STOPWORDS = _HEADLINE_STOPWORDS | {"will", "be", "before", "new", "than", "more", "this", "that", "who", "what", "how", "why", "2024", "2025", "2026"}
+
+def match_vector(text):
+    tokens = [t for t in normalize_headline(text) if t not in _MATCH_STOPWORDS and len(t) > 1]
+    vec = np.zeros(MATCH_DIM, dtype=np.float32)
+    for feat in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        h = int.from_bytes(hashlib.blake2b(feat.encode(), digest_size=4).digest(), "big")
+        vec[h % MATCH_DIM] += 1.0
+    np.log1p(vec, out=vec)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+class HeadlineMarketMatcher:
+    """Incrementally maintained cosine-similarity matrix between current headlines and open markets."""
+    def __init__(self):
+        self.headlines = []                                  # row keys (headline titles)
+        self.slugs = []                                      # column keys (market slugs)
+        self.markets = {}                                    # slug -> market dict
+        self.H = np.zeros((0, MATCH_DIM), dtype=np.float32)
+        self.M = np.zeros((0, MATCH_DIM), dtype=np.float32)
+        self.S = np.zeros((0, 0), dtype=np.float32)
+        self.top = {}                                        # headline -> [(slug, score), ...]
+        self.version = None
+        self._lock = threading.Lock()
+        self._running = False
+
+    def update(self, headlines, markets):
+        headlines = list(dict.fromkeys(headlines))
+        markets = {m['slug']: m for m in markets if m.get('slug')}
+
+        # 1. Drop stale rows / columns
+        wanted = set(headlines)
+        keep_rows = [i for i, h in enumerate(self.headlines) if h in wanted]
+        keep_cols = [j for j, s in enumerate(self.slugs) if s in markets]
+        H = self.H[keep_rows]
+        M = self.M[keep_cols]
+        S = self.S[np.ix_(keep_rows, keep_cols)]
+        rows = [self.headlines[i] for i in keep_rows]
+        cols = [self.slugs[j] for j in keep_cols]
+
+        # 2. New columns: score every kept headline against the new markets only
+        known_cols = set(cols)
+        new_cols = [s for s in markets if s not in known_cols]
+        if new_cols:
+            M_new = np.stack([match_vector(self._market_text(markets[s])) for s in new_cols])
+            S = np.hstack([S, H @ M_new.T])
+            M = np.vstack([M, M_new])
+            cols += new_cols
+
+        # 3. New rows: score the new headlines against every market
+        known_rows = set(rows)
+        new_rows = [h for h in headlines if h not in known_rows]
+        if new_rows:
+            H_new = np.stack([match_vector(h) for h in new_rows])
+            S = np.vstack([S, H_new @ M.T])
+            H = np.vstack([H, H_new])
+            rows += new_rows
+
+        # 4. Top matches per headline
+        top = {}
+        if S.size:
+            k = min(MATCH_TOP_K, S.shape[1])
+            idx = np.argpartition(-S, k - 1, axis=1)[:, :k]
+            for r, headline in enumerate(rows):
+                ranked = sorted(((cols[c], float(S[r, c])) for c in idx[r]), key=lambda x: x[1], reverse=True)
+                top[headline] = [(slug, score) for slug, score in ranked if score >= MATCH_MIN_SCORE]
+
+        with self._lock:
+            self.headlines, self.slugs, self.markets = rows, cols, markets
+            self.H, self.M, self.S, self.top = H, M, S, top
+
+    @staticmethod
+    def _market_text(m):
+        questions = " ".join(m.get('questions', []))
+        return f"{m['title']} {questions}"
+
+    def lookup(self, headline):
+        """Ranked candidate markets for a headline (no upstream calls)."""
+        with self._lock:
+            return [dict(self.markets[slug], match_score=score) for slug, score in self.top.get(headline, []) if slug in self.markets]
+
+    def refresh_async(self, version, headlines, markets):
+        """Run update() in a background thread when the news / market snapshot changed."""
+        with self._lock:
+            if self._running or version == self.version: return
+            self._running = True
+        def job():
+            try:
+                self.update(headlines, markets)
+                self.version = version
+            except Exception: pass
+            finally:
+                self._running = False
+        threading.Thread(target=job, daemon=True, name="match-matrix").start()
+
+@st.cache_resource
+def get_match_matrix():
+    return HeadlineMarketMatcher()
+
+def refresh_match_matrix():
+    """Kick the background scorer if either the news or the market snapshot moved."""
+    all_news = fetch_categorized_news_v2()
+    catalog = fetch_open_markets_catalog()
+    headlines = [n['title'] for items in all_news.values() for n in items]
+    version = (catalog["fetched_at"], hashlib.sha1("\n".join(headlines).encode()).hexdigest())
+    get_match_matrix().refresh_async(version, headlines, catalog["events"])
+
+def open_headline_matches(headline):
+    """Button callback: jump straight to market selection using the precomputed matches."""
+    st.session_state.news_input_box = headline
+    st.session_state.user_news_text = headline
+    st.session_state.search_candidates = [remember_market(m) for m in get_match_matrix().lookup(headline)]
+    st.session_state.search_stage = "selection"
+    st.session_state.debug_logs = []
+    st.session_state.pending_app_rerun = True
+
+# --- 📡 F. Live Odds (Delta Polling of Watched Markets) ---
+# Views register the Gamma market ids they display; one background poller per
+# process re-reads only those markets in batched /markets?id=... calls and
+# writes changed prices into a shared table. Watches lapse unless renewed, and a
+# lapsed market's price leaves the table with it; a price the poller hasn't confirmed
+# for LIVE_STALE_AFTER (upstream errors, a slow round) is not served as live.
+LIVE_POLL_INTERVAL = 5
+LIVE_WATCH_TTL = 120
+LIVE_BATCH_SIZE = 50
+LIVE_STALE_AFTER = 4 * LIVE_POLL_INTERVAL
+
+class LivePriceTable:
+    def __init__(self):
+        self.prices = {}        # market_id -> {"outcomes": [...], "prices": [...], "updated_at": ts of change, "polled_at": ts}
+        self.watched = {}       # market_id -> last renewal ts
+        self.pinned = collections.Counter()   # market_id -> holders that need it polled indefinitely
+        self.listeners = []     # callables receiving {market_id: [price per outcome]} after each poll
+        self.version = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, market_ids):
+        now = time.time()
+        with self._lock:
+            for mid in market_ids:
+                if mid: self.watched[str(mid)] = now
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="live-odds")
+                self._thread.start()
+
+    def pin(self, market_ids):
+        """Poll these ids until unpinned (watchlist rules), independent of any open view."""
+        with self._lock:
+            for mid in market_ids: self.pinned[str(mid)] += 1
+        self.watch([])
+
+    def unpin(self, market_ids):
+        with self._lock:
+            for mid in market_ids:
+                self.pinned[str(mid)] -= 1
+                if self.pinned[str(mid)] <= 0: del self.pinned[str(mid)]
+
+    def subscribe(self, listener):
+        with self._lock:
+            self.listeners.append(listener)
+
+    def _run(self):
+        while True:
+            time.sleep(LIVE_POLL_INTERVAL)
+            ids = self._due()
+            for i in range(0, len(ids), LIVE_BATCH_SIZE):
+                try: self._poll(ids[i:i + LIVE_BATCH_SIZE])
+                except Exception: pass
+
+    def _due(self):
+        """Drop lapsed watches, and the prices of markets nobody polls any more; the ids to poll."""
+        now = time.time()
+        with self._lock:
+            self.watched = {mid: ts for mid, ts in self.watched.items() if now - ts < LIVE_WATCH_TTL}
+            ids = set(self.watched) | set(self.pinned)
+            self.prices = {mid: entry for mid, entry in self.prices.items() if mid in ids}
+        return list(ids)
+
+    def _poll(self, ids):
+        query = "&".join(f"id={urllib.parse.quote(mid)}" for mid in ids)
+        resp = requests.get(f"{GAMMA_API_BASE}/markets?{query}", timeout=5)
+        if resp.status_code != 200: return
+        changed = {}
+        for market in resp.json():
+            mid = str(market.get('id'))
+            outcomes = json.loads(market.get('outcomes')) if isinstance(market.get('outcomes'), str) else market.get('outcomes')
+            prices = json.loads(market.get('outcomePrices')) if isinstance(market.get('outcomePrices'), str) else market.get('outcomePrices')
+            if not outcomes or not prices: continue
+            prices = [float(p) for p in prices]
+            now = time.time()
+            with self._lock:
+                current = self.prices.get(mid)
+                if current and current["prices"] == prices:
+                    current["polled_at"] = now
+                    continue
+                self.prices[mid] = {"outcomes": outcomes, "prices": prices, "updated_at": now, "polled_at": now}
+                changed[mid] = prices
+        if changed:
+            with self._lock:
+                self.version += 1
+                listeners = list(self.listeners)
+            for listener in listeners:
+                try: listener(changed)
+                except Exception: pass
+
+    def get(self, market_id):
+        """The live entry for a market, or None if there is none recent enough to trust."""
+        with self._lock:
+            entry = self.prices.get(str(market_id)) if market_id else None
+        return entry if entry and time.time() - entry["polled_at"] < LIVE_STALE_AFTER else None
+
+    def overlay(self, market_data):
+        """Copy of a processed market with every watched sub-market's prices replaced by live ones."""
+        if not market_data: return market_data
+        live_subs = []
+        updated_at = None
+        for sm in market_data.get('markets', []):
+            live = self.get(sm.get('id'))
+            if live:
+                try:
+                    sm = build_sub_market({"id": sm['id'], "question": sm['question'], "volume": sm['volume'],
+                                           "outcomes": live["outcomes"], "outcomePrices": live["prices"]}, sm['question'])
+                    updated_at = max(updated_at or 0, live["updated_at"])
+                except Exception: pass
+            live_subs.append(sm)
+        result = dict(market_data, markets=live_subs) if "markets" in market_data else dict(market_data)   # summaries stay summaries
+        main = self.get(market_data.get('market_id'))
+        if main:
+            ranked = sorted(zip(main["outcomes"], main["prices"]), key=lambda x: x[1], reverse=True)
+            if ranked:
+                result["probability"] = ranked[0][1]
+                result["odds"] = " | ".join(f"{o}: {p * 100:.1f}%" for o, p in ranked[:3])
+                updated_at = max(updated_at or 0, main["updated_at"])
+        if updated_at: result["live_updated_at"] = updated_at
+        return result
+
+@st.cache_resource
+def get_live_prices():
+    return LivePriceTable()
+
+def watch_market(market_data):
+    """Keep a processed market (main + sub-markets) on the live poll list."""
+    if market_data:
+        get_live_prices().watch([market_data.get('market_id')] + [sm.get('id') for sm in market_data.get('markets', [])])
+
+# --- 📌 J. Watchlist & Threshold Alerts (Vectorized Rule Evaluation) ---
+# Users pin markets with rules on one outcome (the one leading when the rule was added,
+# i.e. the price the popover showed): "above" / "below" fire when its price crosses the threshold, "move" fires when it has moved that many points since the
+# rule was armed (and re-arms). Rules live in flat numpy columns; every live-odds
+# refresh diffs the new prices against the previous snapshot and evaluates all rules
+# in one masked pass, so thousands of rules cost a few array ops per refresh.
+# Alerts go to the owning session's inbox and, if WATCHLIST_WEBHOOK_URL is set, are
+# POSTed there in batches.
+WATCH_ABOVE, WATCH_BELOW, WATCH_MOVE = 0, 1, 2
+WATCH_RULE_KINDS = {"above": WATCH_ABOVE, "below": WATCH_BELOW, "move": WATCH_MOVE}
+WATCHLIST_SESSION_TTL = 86400
+WATCHLIST_INBOX_SIZE = 50
+
+class WatchlistEngine:
+    def __init__(self, webhook_url=None):
+        self.webhook_url = webhook_url
+        self.market_index = {}                 # (market_id, outcome index) -> column in self.last_prices
+        self.market_columns = {}               # market_id -> [(outcome index, column)]
+        self.last_prices = np.full(0, np.nan)
+        self.capacity = 0
+        self.size = 0                          # rows used (including retired ones)
+        self.rule_market = np.zeros(0, dtype=np.int32)
+        self.rule_kind = np.zeros(0, dtype=np.int8)
+        self.rule_threshold = np.zeros(0)
+        self.rule_baseline = np.zeros(0)
+        self.rule_active = np.zeros(0, dtype=bool)
+        self.rule_meta = []                    # row -> {"id", "session_id", "market_id", "outcome_index", "outcome", "title", "kind", "threshold"}
+        self.inbox = {}                        # session_id -> deque of alerts
+        self.seen = {}                         # session_id -> last touch
+        self.alerts_sent = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._webhook = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="watch-hook")
+
+    def _grow(self):
+        capacity = max(64, self.capacity * 2)
+        def resize(arr, fill):
+            out = np.full(capacity, fill, dtype=arr.dtype)
+            out[:self.size] = arr[:self.size]
+            return out
+        self.rule_market = resize(self.rule_market, 0)
+        self.rule_kind = resize(self.rule_kind, 0)
+        self.rule_threshold = resize(self.rule_threshold, 0.0)
+        self.rule_baseline = resize(self.rule_baseline, np.nan)
+        self.rule_active = resize(self.rule_active, False)
+        self.capacity = capacity
+
+    def _market_col(self, market_id, outcome_index):
+        col = self.market_index.get((market_id, outcome_index))
+        if col is None:
+            col = self.market_index[(market_id, outcome_index)] = len(self.market_index)
+            self.market_columns.setdefault(market_id, []).append((outcome_index, col))
+            if col >= len(self.last_prices):
+                self.last_prices = np.concatenate([self.last_prices, np.full(max(64, len(self.last_prices)), np.nan)])
+        return col
+
+    def add_rule(self, session_id, market, kind, threshold):
+        """
+        threshold is in percentage points (e.g. 65 for 65%). The rule follows the market's
+        leading outcome as of `market` (its "outcome_index"), the price the popover showed.
+        """
+        market_id = str(market.get('market_id') or "")
+        if not market_id or kind not in WATCH_RULE_KINDS: return None
+        outcome_index = market.get('outcome_index')
+        if outcome_index is None:
+            # Summaries stored before outcome_index existed: take the leading outcome from live odds
+            live = get_live_prices().get(market_id)
+            outcome_index = int(np.argmax(live["prices"])) if live else 0
+        with self._lock:
+            if self.size == self.capacity: self._grow()
+            row = self.size
+            self.size += 1
+            col = self._market_col(market_id, outcome_index)
+            # Seed from the live table: listeners only hear about changes, so a market that is
+            # already polled would otherwise have no price (and no "move" baseline) until it moves
+            live = get_live_prices().get(market_id)
+            if np.isnan(self.last_prices[col]) and live and outcome_index < len(live["prices"]):
+                self.last_prices[col] = live["prices"][outcome_index]
+            self.rule_market[row] = col
+            self.rule_kind[row] = WATCH_RULE_KINDS[kind]
+            self.rule_threshold[row] = float(threshold) / 100
+            self.rule_baseline[row] = self.last_prices[col]
+            self.rule_active[row] = True
+            self._seq += 1
+            self.rule_meta.append({"id": self._seq, "session_id": session_id, "market_id": market_id,
+                                   "outcome_index": outcome_index, "outcome": market.get('outcome', ''), "slug": market.get('slug'), "title": market.get('title', ''), "kind": kind, "threshold": float(threshold)})
+            self.seen[session_id] = time.time()
+        get_live_prices().pin([market_id])
+        return self._seq
+
+    def remove_rule(self, session_id, rule_id):
+        with self._lock:
+            for row, meta in enumerate(self.rule_meta):
+                if meta["id"] == rule_id and meta["session_id"] == session_id and self.rule_active[row]:
+                    self._retire([row])
+                    break
+
+    def _retire(self, rows):
+        self.rule_active[rows] = False
+        released = {self.rule_meta[r]["market_id"] for r in rows}
+        still_used = {self.rule_meta[r]["market_id"] for r in np.flatnonzero(self.rule_active[:self.size])}
+        get_live_prices().unpin(released - still_used)
+        # Compact once most rows are dead, so evaluation stays proportional to live rules
+        if self.size > 256 and self.rule_active[:self.size].sum() < self.size // 2:
+            keep = np.flatnonzero(self.rule_active[:self.size])
+            for arr in ("rule_market", "rule_kind", "rule_threshold", "rule_baseline", "rule_active"):
+                values = getattr(self, arr)[keep]
+                getattr(self, arr)[:len(keep)] = values
+            self.rule_meta = [self.rule_meta[r] for r in keep]
+            self.size = len(keep)
+
+    def rules(self, session_id):
+        with self._lock:
+            self.seen[session_id] = time.time()
+            out = []
+            for row, meta in enumerate(self.rule_meta):
+                if meta["session_id"] == session_id and self.rule_active[row]:
+                    price = self.last_prices[self.rule_market[row]]
+                    out.append(dict(meta, price=None if np.isnan(price) else float(price) * 100))
+            return out
+
+    def alerts(self, session_id):
+        with self._lock:
+            return list(self.inbox.get(session_id, ()))
+
+    def on_prices(self, updates):
+        """Live-odds listener. updates: {market_id: [price per outcome (0-1)]}."""
+        with self._lock:
+            cols = [(col, prices[i]) for mid, prices in updates.items() for i, col in self.market_columns.get(mid, ()) if i < len(prices)]
+            if not cols or not self.size: return
+            new_prices = self.last_prices.copy()
+            idx, values = zip(*cols)
+            new_prices[list(idx)] = values
+
+            n = self.size
+            market = self.rule_market[:n]
+            kind = self.rule_kind[:n]
+            thr = self.rule_threshold[:n]
+            base = self.rule_baseline[:n]
+            price = new_prices[market]
+            prev = self.last_prices[market]
+            with np.errstate(invalid="ignore"):
+                changed = self.rule_active[:n] & (price != prev) & ~np.isnan(price)
+                # A crossing needs a known previous price: the first price seen for a market is not one
+                known = np.isfinite(prev)
+                crossed_up = changed & known & (kind == WATCH_ABOVE) & (price >= thr) & (prev < thr)
+                crossed_down = changed & known & (kind == WATCH_BELOW) & (price <= thr) & (prev > thr)
+                moved = changed & (kind == WATCH_MOVE) & (np.abs(price - base) >= thr)
+                # A "move" rule without a baseline yet arms on its first observed price
+                base[changed & (kind == WATCH_MOVE) & np.isnan(base)] = price[changed & (kind == WATCH_MOVE) & np.isnan(base)]
+            fired = np.flatnonzero(crossed_up | crossed_down | moved)
+            alerts = []
+            for row in fired:
+                meta = self.rule_meta[row]
+                p, b = price[row] * 100, base[row] * 100
+                outcome = f"{meta['outcome']} " if meta.get('outcome') else ""
+                if kind[row] == WATCH_MOVE:
+                    text = f"{outcome}moved {p - b:+.1f} pts to {p:.1f}%"
+                    base[row] = price[row]
+                else:
+                    text = f"{outcome}crossed {'above' if kind[row] == WATCH_ABOVE else 'below'} {meta['threshold']:g}% (now {p:.1f}%)"
+                alert = {"ts": time.time(), "rule_id": meta["id"], "session_id": meta["session_id"],
+                         "slug": meta["slug"], "title": meta["title"], "message": text}
+                self.inbox.setdefault(meta["session_id"], collections.deque(maxlen=WATCHLIST_INBOX_SIZE)).append(alert)
+                alerts.append(alert)
+            self.last_prices = new_prices
+            self.alerts_sent += len(alerts)
+            self._expire()
+        if alerts and self.webhook_url:
+            self._webhook.submit(self._post, alerts)
+
+    def _post(self, alerts):
+        try: requests.post(self.webhook_url, json={"alerts": alerts}, timeout=5)
+        except Exception: pass
+
+    def _expire(self):
+        cutoff = time.time() - WATCHLIST_SESSION_TTL
+        gone = {sid for sid, ts in self.seen.items() if ts < cutoff}
+        if not gone: return
+        rows = [r for r, meta in enumerate(self.rule_meta) if meta["session_id"] in gone and self.rule_active[r]]
+        if rows: self._retire(rows)
+        for sid in gone:
+            self.seen.pop(sid, None)
+            self.inbox.pop(sid, None)
+
+    def stats(self):
+        with self._lock:
+            return {"rules": int(self.rule_active[:self.size].sum()), "markets": len(self.market_index),
+                    "sessions": len(self.seen), "alerts": self.alerts_sent}
+
+@st.cache_resource
+def get_watchlist():
+    engine = WatchlistEngine(get_setting("WATCHLIST_WEBHOOK_URL"))
+    get_live_prices().subscribe(engine.on_prices)
+    return engine
+
+# --- 🧠 H. Session Memory (Shared Market Store + Transcript Spill) ---
+# Sessions keep only market slugs; the market dicts live once per process in
+# MarketStore. Chat history in st.session_state is capped (the opening question is
+# pinned) and older turns are spilled, zlib-compressed, to SQLite. A session idle
+# for SESSION_IDLE_TIMEOUT parks its remaining transcript there too and drops its
+# market references; the next interaction restores it.
+CHAT_HISTORY_LIMIT = 12
+DEBUG_LOG_LIMIT = 50
+SESSION_IDLE_TIMEOUT = 900
+MARKET_STORE_MAX = 3000
+
+class MarketStore:
+    """Deduplicated slug -> market dict store shared by every session in the process."""
+    def __init__(self, max_entries=MARKET_STORE_MAX):
+        self.max_entries = max_entries
+        self.markets = collections.OrderedDict()   # slug -> market dict (LRU order)
+        self.refs = {}                             # slug -> set(session_id)
+        self._lock = threading.Lock()
+
+    def put(self, market, session_id=None):
+        slug = market.get('slug')
+        if not slug: return None
+        with self._lock:
+            self.markets[slug] = market
+            self.markets.move_to_end(slug)
+            if session_id: self.refs.setdefault(slug, set()).add(session_id)
+            self._evict()
+        return slug
+
+    def get(self, slug):
+        with self._lock:
+            market = self.markets.get(slug)
+            if market is not None: self.markets.move_to_end(slug)
+            return market
+
+    def release(self, session_id):
+        with self._lock:
+            for sessions in self.refs.values():
+                sessions.discard(session_id)
+            self.refs = {slug: s for slug, s in self.refs.items() if s}
+            self._evict()
+
+    def _evict(self):
+        # Unreferenced entries go first (LRU); referenced ones only past twice the bound
+        if len(self.markets) <= self.max_entries: return
+        for slug in list(self.markets):
+            if len(self.markets) <= self.max_entries: break
+            if slug not in self.refs: del self.markets[slug]
+        while len(self.markets) > self.max_entries * 2:
+            slug, _ = self.markets.popitem(last=False)
+            self.refs.pop(slug, None)
+
+class TranscriptSpill:
+    """Compact on-disk store for archived chat turns and parked idle sessions."""
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute("CREATE TABLE IF NOT EXISTS spill (session_id TEXT, kind TEXT, seq INTEGER, blob BLOB, created_at REAL)")
+        self._conn().execute("CREATE INDEX IF NOT EXISTS spill_session ON spill (session_id, kind, seq)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def append(self, session_id, kind, payload):
+        blob = zlib.compress(json.dumps(payload, ensure_ascii=False).encode())
+        self._conn().execute(
+            "INSERT INTO spill (session_id, kind, seq, blob, created_at) VALUES (?, ?, (SELECT COUNT(*) FROM spill WHERE session_id = ? AND kind = ?), ?, ?)",
+            (session_id, kind, session_id, kind, blob, time.time())
+        )
+        # Sessions that never came back: forget them after a day
+        if random.random() < 0.01:
+            self._conn().execute("DELETE FROM spill WHERE created_at < ?", (time.time() - 86400,))
+
+    def load(self, session_id, kind):
+        rows = self._conn().execute("SELECT blob FROM spill WHERE session_id = ? AND kind = ? ORDER BY seq", (session_id, kind)).fetchall()
+        return [json.loads(zlib.decompress(r[0])) for r in rows]
+
+    def drop(self, session_id, kind=None):
+        if kind: self._conn().execute("DELETE FROM spill WHERE session_id = ? AND kind = ?", (session_id, kind))
+        else: self._conn().execute("DELETE FROM spill WHERE session_id = ?", (session_id,))
+
+@st.cache_resource
+def get_market_store():
+    return MarketStore()
+
+@st.cache_resource
+def get_transcript_spill():
+    path = get_setting("SESSION_SPILL_PATH") or os.path.join(tempfile.gettempdir(), "beholmes_sessions.sqlite3")
+    return TranscriptSpill(path)
+
+def log_debug(message):
+    """Append to the (capped) per-session debug log; a no-op outside a script run."""
+    if get_script_run_ctx() is None: return    # worker / sync threads have no session
+    try:
+        logs = st.session_state.debug_logs
+        logs.append(message)
+        del logs[:-DEBUG_LOG_LIMIT]
+    except Exception:
+        pass
+
+def remember_market(market):
+    """Put a market in the shared store and return the slug to keep in session state."""
+    return get_market_store().put(market, st.session_state.session_id)
+
+def resolve_market(slug):
+    """Market dict for a slug: shared store first, then the catalog mirror, then a Gamma slug lookup."""
+    if not slug: return None
+    market = get_market_store().get(slug)
+    if market is None and ready_mirror():
+        market = ready_mirror().get(slug)
+        if market: remember_market(market)
+    if market is None:
+        try: market = fetch_event_detail(slug)
+        except Exception: return None
+        remember_market(market)
+    return market
+
+def session_candidates():
+    return [m for m in (resolve_market(slug) for slug in st.session_state.search_candidates) if m]
+
+def session_market():
+    """The selected market with full sub-market detail (built on first open, then kept in the store)."""
+    market = resolve_market(st.session_state.current_market_slug)
+    if market and "markets" not in market:
+        market = market_detail(market)
+        if market.get('markets'): remember_market(market)
+    return market
+
+def start_analysis(market=None):
+    st.session_state.current_market_slug = remember_market(market) if market else None
+    st.session_state.search_stage = "analysis"
+    st.session_state.messages = [{"role": "user", "content": f"Analyze this news: {st.session_state.user_news_text}"}]
+    reset_transcript_spill()
+
+def reset_transcript_spill():
+    if st.session_state.archived_turns:
+        get_transcript_spill().drop(st.session_state.session_id, "turns")
+    st.session_state.archived_turns = 0
+
+def compact_session():
+    """Run at the start of every full rerun: restore a parked session, then enforce the caps."""
+    spill = get_transcript_spill()
+    sid = st.session_state.session_id
+    if st.session_state.parked:
+        parked = spill.load(sid, "parked")
+        if parked:
+            st.session_state.messages = parked[-1]["messages"]
+            for slug in [parked[-1].get("current")] + parked[-1].get("candidates", []):
+                if slug and get_market_store().get(slug) is not None:
+                    get_market_store().put(get_market_store().get(slug), sid)
+        spill.drop(sid, "parked")
+        st.session_state.parked = False
+    st.session_state.last_active = time.time()
+
+    messages = st.session_state.messages
+    if len(messages) > CHAT_HISTORY_LIMIT:
+        overflow = messages[1:len(messages) - (CHAT_HISTORY_LIMIT - 1)]
+        for msg in overflow:
+            spill.append(sid, "turns", msg)
+        st.session_state.archived_turns += len(overflow)
+        st.session_state.messages = [messages[0]] + messages[-(CHAT_HISTORY_LIMIT - 1):]
+    del st.session_state.debug_logs[:-DEBUG_LOG_LIMIT]
+
+def release_if_idle():
+    """Called from periodic fragments: park an idle session's payload and drop its references."""
+    if st.session_state.parked or time.time() - st.session_state.last_active < SESSION_IDLE_TIMEOUT:
+        return
+    sid = st.session_state.session_id
+    get_transcript_spill().append(sid, "parked", {
+        "messages": st.session_state.messages,
+        "current": st.session_state.current_market_slug,
+        "candidates": st.session_state.search_candidates,
+    })
+    st.session_state.messages = []
+    st.session_state.debug_logs = []
+    st.session_state.parked = True
+    get_market_store().release(sid)
+
+# --- 📚 H2. Analysis History (Append-Only, Full-Text Search) ---
+# Every memo an analysis job actually computes is appended to a local SQLite file,
+# together with the query, the market slug, the prices it was written against and
+# the fact-check sources. Writes are handed to a single writer thread and committed
+# in batches, so the worker that produced the memo never waits on disk. Past memos
+# can be searched (FTS5 over query, market title and memo; LIKE without FTS5) and
+# reopened as a fresh conversation. Each memo belongs to whoever asked for it (the
+# signed-in user, else the browser session) and only they see it, unless the operator
+# shares the history with everyone (ANALYSIS_HISTORY_SHARED). Memos older than
+# ANALYSIS_HISTORY_RETENTION_DAYS are deleted.
+HISTORY_WRITE_BATCH = 50
+HISTORY_SEARCH_LIMIT = 20
+HISTORY_SHARED = str(get_setting("ANALYSIS_HISTORY_SHARED", "off")).lower() in ("1", "on", "true", "yes")
+HISTORY_RETENTION_DAYS = float(get_setting("ANALYSIS_HISTORY_RETENTION_DAYS", 30))
+HISTORY_PRUNE_INTERVAL = 3600
+SOURCE_LINK_RE = re.compile(r"^- \[(.*?)\]\((\S+?)\)", re.M)
+
+class AnalysisHistory:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self.pending = collections.deque()
+        self.written = self.write_errors = self.expired = 0
+        self.pruned_at = 0.0
+        self._cond = threading.Condition()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses (id INTEGER PRIMARY KEY, created_at REAL, query TEXT, turn INTEGER, "
+            "slug TEXT, title TEXT, probability REAL, prices TEXT, sources TEXT, memo TEXT, degraded TEXT, owner TEXT)"
+        )
+        try: conn.execute("ALTER TABLE analyses ADD COLUMN owner TEXT")     # histories written before memos had owners
+        except sqlite3.OperationalError: pass
+        conn.execute("CREATE INDEX IF NOT EXISTS analyses_created ON analyses (created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS analyses_slug ON analyses (slug, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS analyses_owner ON analyses (owner, created_at)")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5(query, title, memo, content='analyses', content_rowid='id')")
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False    # SQLite built without FTS5: search falls back to LIKE
+        threading.Thread(target=self._write_loop, name="analysis-history", daemon=True).start()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def record(self, history, market_data, memo, fact_check=None, degraded=None, owner=None):
+        """Queue one computed memo (asked for by `owner`) for the writer; returns immediately."""
+        market = market_data or {}
+        entry = {
+            "created_at": time.time(),
+            "query": history[0]['content'].replace("Analyze this news: ", "", 1) if history else "",
+            "turn": sum(1 for m in history if m['role'] == 'user'),
+            "slug": market.get('slug'), "title": market.get('title'), "probability": market.get('probability'),
+            "prices": json.dumps([{"question": sm.get('question'), "top_option": sm.get('top_option'), "top_price": sm.get('top_price')}
+                                  for sm in market.get('markets', [])], ensure_ascii=False),
+            "sources": json.dumps([{"title": t, "url": u} for t, u in SOURCE_LINK_RE.findall(fact_check or "")], ensure_ascii=False),
+            "memo": memo,
+            "degraded": json.dumps(degraded) if degraded else None,
+            "owner": owner,
+        }
+        with self._cond:
+            self.pending.append(entry)
+            self._cond.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self.pending:
+                    self._cond.wait()
+                batch = [self.pending.popleft() for _ in range(min(len(self.pending), HISTORY_WRITE_BATCH))]
+            conn = self._conn()
+            try:
+                conn.execute("BEGIN")
+                for e in batch:
+                    cur = conn.execute(
+                        "INSERT INTO analyses (created_at, query, turn, slug, title, probability, prices, sources, memo, degraded, owner) "
+                        "VALUES (:created_at, :query, :turn, :slug, :title, :probability, :prices, :sources, :memo, :degraded, :owner)", e
+                    )
+                    if self.fts:
+                        conn.execute("INSERT INTO analyses_fts (rowid, query, title, memo) VALUES (?, ?, ?, ?)",
+                                     (cur.lastrowid, e["query"], e["title"] or "", e["memo"]))
+                conn.execute("COMMIT")
+                self.written += len(batch)
+            except sqlite3.Error:
+                if conn.in_transaction: conn.execute("ROLLBACK")
+                self.write_errors += len(batch)
+            if time.time() - self.pruned_at > HISTORY_PRUNE_INTERVAL:
+                self.prune()
+
+    def prune(self, max_age=None):
+        """Delete memos older than max_age seconds (default: the retention setting)."""
+        max_age = HISTORY_RETENTION_DAYS * 86400 if max_age is None else max_age
+        self.pruned_at = time.time()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN")
+            cutoff = self.pruned_at - max_age
+            if self.fts:
+                # External-content FTS: each row's indexed text has to be removed explicitly
+                conn.execute("INSERT INTO analyses_fts (analyses_fts, rowid, query, title, memo) "
+                             "SELECT 'delete', id, query, COALESCE(title, ''), memo FROM analyses WHERE created_at < ?", (cutoff,))
+            self.expired += conn.execute("DELETE FROM analyses WHERE created_at < ?", (cutoff,)).rowcount
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction: conn.execute("ROLLBACK")
+
+    # --- Reads (owner=None: everyone's memos) ---
+    def _rows(self, rows):
+        cols = ("id", "created_at", "query", "turn", "slug", "title", "probability", "prices", "sources", "memo", "degraded", "owner")
+        out = []
+        for r in rows:
+            e = dict(zip(cols, r))
+            e["prices"], e["sources"] = json.loads(e["prices"] or "[]"), json.loads(e["sources"] or "[]")
+            e["degraded"] = json.loads(e["degraded"]) if e["degraded"] else None
+            out.append(e)
+        return out
+
+    def recent(self, owner=None, limit=HISTORY_SEARCH_LIMIT):
+        if owner is None:
+            return self._rows(self._conn().execute("SELECT * FROM analyses ORDER BY id DESC LIMIT ?", (limit,)).fetchall())
+        return self._rows(self._conn().execute("SELECT * FROM analyses WHERE owner = ? ORDER BY id DESC LIMIT ?", (owner, limit)).fetchall())
+
+    def get(self, entry_id):
+        rows = self._rows(self._conn().execute("SELECT * FROM analyses WHERE id = ?", (entry_id,)).fetchall())
+        return rows[0] if rows else None
+
+    def search(self, query, owner=None, limit=HISTORY_SEARCH_LIMIT):
+        words = [w for w in re.findall(r"\w+", query.lower()) if len(w) > 1]
+        if not words: return self.recent(owner, limit)
+        mine, mine_args = ("AND a.owner = ?", [owner]) if owner is not None else ("", [])
+        conn = self._conn()
+        if self.fts:
+            match = " ".join(f'"{w}"*' for w in words)
+            rows = conn.execute(
+                "SELECT a.* FROM analyses_fts f JOIN analyses a ON a.id = f.rowid "
+                f"WHERE analyses_fts MATCH ? {mine} ORDER BY bm25(analyses_fts), a.id DESC LIMIT ?", [match] + mine_args + [limit]
+            ).fetchall()
+        else:
+            clause = " AND ".join("(LOWER(query) LIKE ? OR LOWER(title) LIKE ? OR LOWER(memo) LIKE ?)" for _ in words)
+            rows = conn.execute(f"SELECT * FROM analyses a WHERE {clause} {mine} ORDER BY id DESC LIMIT ?",
+                                [f"%{w}%" for w in words for _ in range(3)] + mine_args + [limit]).fetchall()
+        return self._rows(rows)
+
+    def stats(self):
+        total = self._conn().execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        return {"analyses": total, "pending": len(self.pending), "written": self.written,
+                "write_errors": self.write_errors, "expired": self.expired, "fts": self.fts}
+
+@st.cache_resource
+def get_analysis_history():
+    path = get_setting("ANALYSIS_HISTORY_PATH") or os.path.join(tempfile.gettempdir(), "beholmes_history.sqlite3")
+    return AnalysisHistory(path)
+
+def history_owner():
+    """Whose history this session reads and writes: the signed-in user's, else this browser session's."""
+    try:
+        if st.user.is_logged_in: return f"user:{st.user.email}"
+    except Exception: pass
+    return st.session_state.session_id
+
+def reopen_analysis(entry):
+    """Start a conversation from a stored memo (follow-ups run against today's market)."""
+    cancel_analysis_job()
+    market = resolve_market(entry["slug"]) if entry["slug"] else None
+    st.session_state.current_market_slug = remember_market(market) if market else None
+    st.session_state.user_news_text = entry["query"]
+    st.session_state.search_stage = "analysis"
+    st.session_state.messages = [
+        {"role": "user", "content": f"Analyze this news: {entry['query']}"},
+        {"role": "assistant", "content": entry["memo"], "reopened": entry["created_at"],
+         "then_probability": entry["probability"], "degraded": entry["degraded"]},
+    ]
+    reset_transcript_spill()
+
+# --- ⏳ I. Analysis Job Queue (Bounded Worker Pool) ---
+# Analyses run as jobs on a fixed pool of ANALYSIS_WORKERS threads instead of in the
+# script thread. The queue is a priority heap (follow-ups before new analyses, idle-time
+# speculative ones last) capped at ANALYSIS_QUEUE_LIMIT; beyond that, submissions are
+# refused and the user is asked to retry. A session has at most one live job: starting over cancels it, and queued
+# jobs whose page stopped polling for ANALYSIS_ABANDON_AFTER seconds are dropped.
+ANALYSIS_WORKERS = int(get_setting("ANALYSIS_WORKERS", 4))
+ANALYSIS_QUEUE_LIMIT = int(get_setting("ANALYSIS_QUEUE_LIMIT", 32))
+ANALYSIS_ABANDON_AFTER = 30
+PRIORITY_FOLLOW_UP = 0
+PRIORITY_ANALYSIS = 1
+PRIORITY_SPECULATIVE = 2       # idle-time precompute (see I2)
+
+class AnalysisJob:
+    def __init__(self, session_id, history, market_data, priority, owner=None):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.owner = owner or session_id     # whose history the memo goes to
+        self.history = [dict(m) for m in history]
+        self.market_data = market_data
+        self.priority = priority
+        self.status = "queued"       # queued -> running -> done | failed | cancelled
+        self.stage = None            # while running: "fact_check" -> "memo"
+        self.partial = {}            # stage results available before the memo (e.g. "fact_check")
+        self.result = None
+        self.deadline = Deadline(ANALYSIS_DEADLINE)   # counted from submission: queueing spends it too
+        self.submitted_at = self.last_seen = time.time()
+        self.started_at = self.finished_at = None
+
+class AnalysisJobQueue:
+    def __init__(self, workers=ANALYSIS_WORKERS, max_queued=ANALYSIS_QUEUE_LIMIT, abandon_after=ANALYSIS_ABANDON_AFTER):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.abandon_after = abandon_after
+        self.jobs = {}                 # id -> job (finished jobs kept until collected or stale)
+        self.by_session = {}           # session_id -> id of its live job
+        self.heap = []                 # (priority, seq, job_id)
+        self.seq = 0
+        self.completed = self.rejected = self.cancelled = 0
+        self.service_time = None       # EWMA of seconds per job, for wait estimates
+        self._cond = threading.Condition()
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"analysis-{i}", daemon=True).start()
+
+    def submit(self, session_id, history, market_data, priority=PRIORITY_ANALYSIS, owner=None):
+        """Queue an analysis; returns the job, or None when the queue is full."""
+        with self._cond:
+            self._cancel_session(session_id)
+            if self.queued() >= self.max_queued:
+                self.rejected += 1
+                return None
+            job = AnalysisJob(session_id, history, market_data, priority, owner)
+            self.jobs[job.id] = job
+            self.by_session[session_id] = job.id
+            self.seq += 1
+            heapq.heappush(self.heap, (priority, self.seq, job.id))
+            self._prune()
+            self._cond.notify()
+            return job
+
+    def get(self, job_id):
+        """Look up a job and mark its session as still watching."""
+        job = self.jobs.get(job_id)
+        if job: job.last_seen = time.time()
+        return job
+
+    def collect(self, job_id):
+        """Remove a finished job and hand it over."""
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job and job.status in ("done", "failed", "cancelled"):
+                del self.jobs[job_id]
+                if self.by_session.get(job.session_id) == job_id:
+                    del self.by_session[job.session_id]
+                return job
+        return None
+
+    def cancel_session(self, session_id):
+        with self._cond:
+            self._cancel_session(session_id)
+
+    def _cancel_session(self, session_id):
+        job = self.jobs.get(self.by_session.pop(session_id, None))
+        if job and job.status in ("queued", "running"):
+            # Queued jobs are skipped when popped; a running one finishes but its result is dropped
+            job.status = "cancelled"
+            self.cancelled += 1
+            self.jobs.pop(job.id, None)
+
+    def queued(self):
+        return sum(1 for _, _, jid in self.heap if jid in self.jobs and self.jobs[jid].status == "queued")
+
+    def running(self):
+        return sum(1 for j in self.jobs.values() if j.status == "running")
+
+    def position(self, job):
+        """1-based place in line (0 once running)."""
+        if job.status != "queued": return 0
+        with self._cond:
+            key = (job.priority, next((s for p, s, jid in self.heap if jid == job.id), 0))
+            return 1 + sum(1 for p, s, jid in self.heap if (p, s) < key and jid in self.jobs and self.jobs[jid].status == "queued")
+
+    def estimated_wait(self, job):
+        position = self.position(job)
+        if not position or not self.service_time: return None
+        return math.ceil(position / self.workers) * self.service_time
+
+    def _prune(self):
+        cutoff = time.time() - 600
+        for jid in [jid for jid, j in self.jobs.items() if j.finished_at and j.finished_at < cutoff]:
+            del self.jobs[jid]
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self.heap:
+                    self._cond.wait()
+                _, _, job_id = heapq.heappop(self.heap)
+                job = self.jobs.get(job_id)
+                if job is None or job.status != "queued": continue
+                if time.time() - job.last_seen > self.abandon_after:
+                    job.status = "cancelled"
+                    self.cancelled += 1
+                    self.jobs.pop(job_id, None)
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+            def progress(stage, payload, job=job):
+                job.stage = stage
+                if payload is not None: job.partial[stage] = payload
+            try:
+                result = get_agent_response(job.history, job.market_data, deadline=job.deadline, on_progress=progress)
+                status = "failed" if result.startswith("Agent Analysis Failed") else "done"
+            except Exception as e:
+                result, status = f"Agent Analysis Failed: {str(e)}", "failed"
+            if status == "done" and "fact_check" in job.partial and job.priority != PRIORITY_SPECULATIVE:
+                # Freshly computed (analysis-cache hits skip the stages): keep it, even if the session left
+                get_analysis_history().record(job.history, job.market_data, result, job.partial["fact_check"], job.deadline.degraded, job.owner)
+            with self._cond:
+                job.finished_at = time.time()
+                elapsed = job.finished_at - job.started_at
+                self.service_time = elapsed if self.service_time is None else 0.8 * self.service_time + 0.2 * elapsed
+                if job.status == "cancelled": continue
+                job.result, job.status = result, status
+                self.completed += 1
+
+    def stats(self):
+        with self._cond:
+            return {"workers": self.workers, "queued": self.queued(), "running": self.running(), "completed": self.completed,
+                    "rejected": self.rejected, "cancelled": self.cancelled,
+                    "service_time": round(self.service_time, 1) if self.service_time else None}
+
+@st.cache_resource
+def get_analysis_jobs():
+    return AnalysisJobQueue()
+
+def submit_analysis_job():
+    """Queue the analysis for the pending user turn; False if the queue refused it."""
+    priority = PRIORITY_FOLLOW_UP if len(st.session_state.messages) > 1 else PRIORITY_ANALYSIS
+    live_market = get_live_prices().overlay(session_market())
+    job = get_analysis_jobs().submit(st.session_state.session_id, st.session_state.messages, live_market, priority, owner=history_owner())
+    st.session_state.analysis_job = job.id if job else None
+    return job is not None
+
+def collect_analysis_job():
+    """Move a finished job's result into the transcript. Returns True if one was collected."""
+    job = get_analysis_jobs().collect(st.session_state.analysis_job) if st.session_state.analysis_job else None
+    if job is None: return False
+    st.session_state.analysis_job = None
+    if job.status != "cancelled":
+        reply = {"role": "assistant", "content": job.result}
+        if job.deadline.degraded: reply["degraded"] = job.deadline.degraded
+        st.session_state.messages.append(reply)
+    return True
+
+def cancel_analysis_job():
+    get_analysis_jobs().cancel_session(st.session_state.session_id)
+    st.session_state.analysis_job = None
+
+# --- 🔮 I2. Speculative Pre-Analysis (Idle-Time Precompute) ---
+# Each news refresh hands over its headlines, ranked by how many publishers carry
+# them. While the analysis pool is completely idle, the most-covered ones are
+# analyzed ahead of time against their best precomputed market match, exactly as a
+# click on "Find Markets" -> "Analyze This" would request them. The result lands in
+# the analysis cache under the same key, so that click is answered instantly. At
+# most one speculative job runs at a time, at the lowest queue priority, and the
+# number of speculative memos is capped at SPECULATE_BUDGET per hour (0 disables).
+SPECULATE_BUDGET = int(get_setting("SPECULATE_BUDGET", 20))
+SPECULATE_INTERVAL = 10
+SPECULATE_TOP_HEADLINES = 5
+SPECULATE_MIN_MATCH = 0.25        # only headlines with a confident top market match
+
+class SpeculativeAnalyzer:
+    def __init__(self, budget=SPECULATE_BUDGET):
+        self.budget = budget
+        self.spent = collections.deque()     # submission times within the last hour
+        self.headlines = []                  # latest ranked candidates, from offer()
+        self.tried = set()                   # analysis keys already submitted (or found cached)
+        self.job_id = None
+        self.submitted = self.precomputed = self.failed = self.busy_skips = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self.budget > 0 and (self._thread is None or not self._thread.is_alive()):
+            self._thread = threading.Thread(target=self._run, daemon=True, name="speculative")
+            self._thread.start()
+
+    def offer(self, news):
+        """Hand over a fresh news snapshot (called by the news refresh); the most-published headlines first."""
+        ranked = sorted(enumerate(news), key=lambda x: (-x[1].get('sources', 1), x[0]))
+        with self._lock:
+            self.headlines = [n['title'] for _, n in ranked[:SPECULATE_TOP_HEADLINES]]
+
+    def budget_left(self):
+        """Memos left this hour. Caller holds _lock."""
+        cutoff = time.time() - 3600
+        while self.spent and self.spent[0] < cutoff:
+            self.spent.popleft()
+        return self.budget - len(self.spent)
+
+    def _run(self):
+        while True:
+            time.sleep(SPECULATE_INTERVAL)
+            try: self.tick()
+            except Exception: pass
+
+    def tick(self):
+        jobs = get_analysis_jobs()
+        if self.job_id:
+            job = jobs.get(self.job_id)
+            if job and job.status in ("queued", "running"): return
+            job = jobs.collect(self.job_id)
+            if job and job.status == "done": self.precomputed += 1
+            elif job: self.failed += 1
+            self.job_id = None
+        if jobs.queued() or jobs.running():
+            self.busy_skips += 1
+            return
+        with self._lock:
+            if self.budget_left() <= 0: return
+            headlines = list(self.headlines)
+        for headline in headlines:
+            matches = get_match_matrix().lookup(headline)
+            if not matches or matches[0]['match_score'] < SPECULATE_MIN_MATCH: continue
+            market = get_live_prices().overlay(market_detail(matches[0]))
+            history = [{"role": "user", "content": f"Analyze this news: {headline}"}]
+            key, _, _ = analysis_cache_key(history, market)
+            if key in self.tried: continue
+            if len(self.tried) > 10000: self.tried.clear()
+            self.tried.add(key)
+            if get_analysis_cache().contains(key): continue
+            job = jobs.submit(f"speculative:{key[:16]}", history, market, priority=PRIORITY_SPECULATIVE)
+            if job:
+                self.job_id = job.id
+                with self._lock:
+                    self.spent.append(time.time())
+                self.submitted += 1
+            return
+
+    def stats(self):
+        with self._lock:
+            budget_left = self.budget_left()
+        return {"budget_left": budget_left, "submitted": self.submitted, "precomputed": self.precomputed,
+                "failed": self.failed, "busy_skips": self.busy_skips, "in_flight": bool(self.job_id)}
+
+@st.cache_resource
+def get_speculator():
+    speculator = SpeculativeAnalyzer()
+    speculator.start()
+    return speculator
+
 # ================= 🖥️ 6. MAIN LAYOUT =================
 
+# Restore parked payloads and enforce the per-session memory caps
+compact_session()
+
 # --- Header ---
 st.markdown('<div class="hero-title">BeHolmes News Analysis</div>', unsafe_allow_html=True)
 st.markdown('<div class="hero-subtitle">Narrative vs. Reality Engine</div>', unsafe_allow_html=True)
@@ -985,6 +4318,7 @@ st.markdown('<div class="hero-subtitle">Narrative vs. Reality Engine</div>', uns
 _, s_mid, _ = st.columns([1, 6, 1])
 with s_mid:
     def on_input_change():
+        cancel_analysis_job()
         st.session_state.search_stage = "input"
         st.session_state.search_candidates = []
         st.session_state.debug_logs = [] # Clear logs
@@ -1002,23 +4336,44 @@ with s_mid:
             if st.session_state.news_input_box:
                 st.session_state.user_news_text = st.session_state.news_input_box
                 with st.spinner("🕵️‍♂️ Hunting for prediction markets..."):
-                    candidates = search_market_data_list(st.session_state.user_news_text)
-                    st.session_state.search_candidates = candidates
+                    deadline = Deadline(SEARCH_DEADLINE)
+                    candidates = search_market_data_list(st.session_state.user_news_text, deadline)
+                    st.session_state.search_degraded = deadline.degraded
+                    st.session_state.search_candidates = [remember_market(m) for m in candidates]
                     st.session_state.search_stage = "selection"
                     st.rerun()
 
+        with st.expander("📚 Past Analyses"):
+            history_query = st.text_input("Search past analyses", key="history_query", label_visibility="collapsed",
+                                          placeholder="Search by headline, market or memo text...")
+            history = get_analysis_history()
+            owner = None if HISTORY_SHARED else history_owner()
+            entries = history.search(history_query, owner) if history_query.strip() else history.recent(owner)
+            if not entries:
+                st.caption("No matching analyses yet." if history_query.strip() else "Analyses you run are saved here.")
+            for entry in entries:
+                c1, c2 = st.columns([5, 1])
+                when = datetime.datetime.fromtimestamp(entry["created_at"]).strftime("%Y-%m-%d %H:%M")
+                market = f" · {entry['title']} @ {entry['probability']:.0%}" if entry["title"] and entry["probability"] is not None else ""
+                degraded = " · ⚠️ degraded" if entry["degraded"] else ""
+                c1.caption(f"**{entry['query'][:90]}** · {when}{market}{degraded}")
+                if c2.button("Open", key=f"history_open_{entry['id']}", use_container_width=True):
+                    reopen_analysis(entry)
+                    st.rerun()
+
     # === Step 2: SELECTION List ===
     elif st.session_state.search_stage == "selection":
         st.markdown("##### 🧐 Select a Market to Reality Check:")
+        if st.session_state.search_degraded:
+            st.caption("⚠️ Partial results, cut short by the time budget: " + "; ".join(st.session_state.search_degraded))
         
         # 🔥 UI FIX: Clearly show when no markets are found and offer News Analysis
-        if not st.session_state.search_candidates:
+        candidates = session_candidates()
+        if not candidates:
             st.warning("⚠️ No direct prediction markets found matching your specific query.")
             st.markdown("---")
             if st.button("📝 Analyze News Only (AI Fact Check + Analysis)", use_container_width=True, type="primary"):
-                st.session_state.current_market = None
-                st.session_state.search_stage = "analysis"
-                st.session_state.messages = [{"role": "user", "content": f"Analyze this news: {st.session_state.user_news_text}"}]
+                start_analysis()
                 st.rerun()
             
             if st.button("⬅️ Start Over"):
@@ -1026,7 +4381,7 @@ with s_mid:
                 st.rerun()
         else:
             # Loop through candidates
-            for idx, m in enumerate(st.session_state.search_candidates):
+            for idx, m in enumerate(candidates):
                 with st.container():
                     st.markdown(f"""
                     <div style="padding:12px; background:rgba(255,255,255,0.03); border-radius:8px; border:1px solid rgba(255,255,255,0.1); margin-bottom:10px;">
@@ -1039,17 +4394,23 @@ with s_mid:
                         </div>
                     </div>
                     """, unsafe_allow_html=True)
-                    if st.button("Analyze This", key=f"btn_{idx}", use_container_width=True):
-                        st.session_state.current_market = m
-                        st.session_state.search_stage = "analysis"
-                        st.session_state.messages = [{"role": "user", "content": f"Analyze this news: {st.session_state.user_news_text}"}]
+                    b_analyze, b_watch = st.columns([3, 1])
+                    if b_analyze.button("Analyze This", key=f"btn_{idx}", use_container_width=True):
+                        start_analysis(m)
                         st.rerun()
+                    with b_watch.popover("📌 Watch", use_container_width=True):
+                        kind = st.selectbox(f"Alert when {m.get('outcome') or 'the leading outcome'} price", ["above", "below", "move"], key=f"watch_kind_{idx}",
+                                            format_func=lambda k: {"above": "rises above", "below": "falls below", "move": "moves by"}[k])
+                        threshold = st.number_input("Percentage points", min_value=0.5, max_value=100.0,
+                                                    value=float(min(max(round(m['probability'] * 100), 1), 99)) if kind != "move" else 5.0,
+                                                    step=0.5, key=f"watch_thr_{idx}")
+                        if st.button("Add to Watchlist", key=f"watch_add_{idx}", use_container_width=True):
+                            get_watchlist().add_rule(st.session_state.session_id, m, kind, threshold)
+                            st.toast(f"📌 Watching {m['title'][:40]}")
 
             st.markdown("---")
             if st.button("📝 Analyze News Only (No Market)", use_container_width=True):
-                st.session_state.current_market = None
-                st.session_state.search_stage = "analysis"
-                st.session_state.messages = [{"role": "user", "content": f"Analyze this news: {st.session_state.user_news_text}"}]
+                start_analysis()
                 st.rerun()
                 
             if st.button("⬅️ Start Over"):
@@ -1058,19 +4419,69 @@ with s_mid:
 
     # === Step 3: ANALYSIS Execution (Initial Run) ===
     elif st.session_state.search_stage == "analysis":
+        if collect_analysis_job():
+            st.rerun()
         if st.session_state.messages and st.session_state.messages[-1]['role'] == 'user':
-            with st.spinner("🧠 Generating Alpha Signals..."):
-                response_text = get_agent_response(st.session_state.messages, st.session_state.current_market)
-                st.session_state.messages.append({"role": "assistant", "content": response_text})
-                st.rerun()
+            if not get_analysis_jobs().get(st.session_state.analysis_job) and not submit_analysis_job():
+                st.warning("⚠️ The analysis desk is at capacity right now. Please retry in a moment.")
+                if st.button("🔄 Retry", use_container_width=True):
+                    st.rerun()
+            else:
+                @st.fragment(run_every=1)
+                def render_job_status():
+                    maybe_profile("fragment:render_job_status")
+                    jobs = get_analysis_jobs()
+                    job = jobs.get(st.session_state.analysis_job)
+                    if job is None or job.status not in ("queued", "running"):
+                        st.rerun()
+                    if job.status == "queued":
+                        wait = jobs.estimated_wait(job)
+                        eta = f" · est. wait ~{int(wait)}s" if wait else ""
+                        st.info(f"⏳ Queued for analysis · position {jobs.position(job)}{eta}")
+                    else:
+                        if job.partial.get("fact_check"):
+                            with st.expander("🔎 Fact check (ready)", expanded=True):
+                                st.markdown(job.partial["fact_check"])
+                        step = "Writing memo" if job.stage == "memo" else "Checking facts"
+                        st.info(f"🧠 Generating Alpha Signals... {step} · {int(time.time() - job.started_at)}s · budget {int(job.deadline.remaining())}s left")
+                render_job_status()
 
 st.markdown("<br>", unsafe_allow_html=True)
 
+# === WATCHLIST (pinned markets + alerts) ===
+@st.fragment(run_every=LIVE_POLL_INTERVAL)
+def render_watchlist():
+    maybe_profile("fragment:render_watchlist")
+    watchlist = get_watchlist()
+    sid = st.session_state.session_id
+    rules = watchlist.rules(sid)
+    alerts = watchlist.alerts(sid)
+    if not rules and not alerts: return
+    for alert in alerts:
+        if alert["ts"] > st.session_state.watch_alerts_seen:
+            st.toast(f"🔔 {alert['title'][:50]}: {alert['message']}")
+    if alerts: st.session_state.watch_alerts_seen = alerts[-1]["ts"]
+    _, w_mid, _ = st.columns([1, 6, 1])
+    with w_mid.expander(f"📌 Watchlist · {len(rules)} rules · {len(alerts)} alerts"):
+        for rule in rules:
+            c1, c2 = st.columns([5, 1])
+            price = f"{rule['price']:.1f}%" if rule['price'] is not None else "…"
+            verb = {"above": "above", "below": "below", "move": "moves ±"}[rule['kind']]
+            outcome = f" · {rule['outcome']}" if rule.get('outcome') else ""
+            c1.caption(f"**{rule['title']}**{outcome} · now {price} · alert {verb} {rule['threshold']:g}%")
+            if c2.button("✕", key=f"watch_rm_{rule['id']}"):
+                watchlist.remove_rule(sid, rule['id'])
+                st.rerun(scope="fragment")
+        for alert in reversed(alerts[-10:]):
+            st.caption(f"🔔 {datetime.datetime.fromtimestamp(alert['ts']).strftime('%H:%M:%S')} · {alert['title']} {alert['message']}")
+
+render_watchlist()
+
 # === DISPLAY ANALYSIS & CHAT (Interactive Mode) ===
 if st.session_state.messages and st.session_state.search_stage == "analysis":
     
-    if st.session_state.current_market:
-        m = st.session_state.current_market
+    m = session_market()
+    if m:
         # 1. Market Header (Native Metric Lookalike)
         with st.container():
             st.markdown(f"""
@@ -1082,54 +4493,92 @@ if st.session_state.messages and st.session_state.search_stage == "analysis":
             </div>
             """, unsafe_allow_html=True)
 
-        # 2. Sub-Markets Loop (Native Streamlit)
-        st.markdown("##### 📊 Sub-Market Details")
-        for idx, market in enumerate(m.get('markets', []), 1):
-            with st.container():
-                st.markdown(f"**{idx}. {market['question']}**")
+        # 2. Sub-Markets Loop (Native Streamlit) - re-rendered with live odds
+        @st.fragment(run_every=LIVE_POLL_INTERVAL)
+        def render_sub_markets(m):
+            maybe_profile("fragment:render_sub_markets")
+            if st.session_state.parked:
+                st.caption("💤 Live odds paused while idle. Interact to resume.")
+                return
+            more_key = f"more_sub_markets_{m.get('slug')}"
+            hidden = m.get('markets', [])[SUB_MARKETS_SHOWN:]
+            # Only what is on screen is polled: the top sub-markets, plus the rest while expanded
+            watch_market(m if st.session_state.get(more_key) else dict(m, markets=m.get('markets', [])[:SUB_MARKETS_SHOWN]))
+            m = get_live_prices().overlay(m)
+            st.markdown("##### 📊 Sub-Market Details")
+            if m.get('live_updated_at'):
+                st.caption(f"● LIVE · updated {int(time.time() - m['live_updated_at'])}s ago")
+
+            def draw_sub_market(idx, market):
+                with st.container():
+                    st.markdown(f"**{idx}. {market['question']}**")
                 
-                if market['type'] == 'binary':
-                    c1, c2 = st.columns(2)
-                    with c1:
-                        st.progress(market['yes_price'] / 100)
-                        st.caption(f"Yes: {market['yes_price']:.1f}%")
-                    with c2:
-                        st.progress(market['no_price'] / 100)
-                        st.caption(f"No: {market['no_price']:.1f}%")
-                else:
-                    try:
-                        sorted_opts = sorted(market.get('options', []), key=lambda x: x.get('price', 0), reverse=True)[:3]
-                    except: sorted_opts = []
-                    
-                    for opt in sorted_opts:
-                        c1, c2 = st.columns([1, 4])
+                    if market['type'] == 'binary':
+                        c1, c2 = st.columns(2)
                         with c1:
-                            st.write(f"{opt['price']:.1f}%")
+                            st.progress(market['yes_price'] / 100)
+                            st.caption(f"Yes: {market['yes_price']:.1f}%")
                         with c2:
-                            st.progress(min(opt['price'] / 100, 1.0))
-                            st.caption(opt['option'])
-                st.divider()
+                            st.progress(market['no_price'] / 100)
+                            st.caption(f"No: {market['no_price']:.1f}%")
+                    else:
+                        try:
+                            sorted_opts = sorted(market.get('options', []), key=lambda x: x.get('price', 0), reverse=True)
+                        except: sorted_opts = []
+                    
+                        for opt in sorted_opts:
+                            c1, c2 = st.columns([1, 4])
+                            with c1:
+                                st.write(f"{opt['price']:.1f}%")
+                            with c2:
+                                st.progress(min(opt['price'] / 100, 1.0))
+                                st.caption(opt['option'])
+                    st.divider()
+
+            for idx, market in enumerate(m.get('markets', [])[:SUB_MARKETS_SHOWN], 1):
+                draw_sub_market(idx, market)
+            if hidden:
+                more = st.expander(f"➕ {len(hidden)} more sub-markets", key=more_key, on_change="rerun")
+                if more.open:
+                    with more:
+                        for idx, market in enumerate(m['markets'][SUB_MARKETS_SHOWN:], SUB_MARKETS_SHOWN + 1):
+                            draw_sub_market(idx, market)
+        render_sub_markets(m)
 
     else:
         st.info("🤖 Pure AI Analysis (No Market Data Selected)")
 
-    # Chat History
-    for msg in st.session_state.messages:
+    # Chat History (opening question pinned, older turns archived to disk)
+    for msg_idx, msg in enumerate(st.session_state.messages):
+        if msg_idx == 1 and st.session_state.archived_turns:
+            if st.toggle(f"🗄️ Show {st.session_state.archived_turns} earlier messages"):
+                for old in get_transcript_spill().load(st.session_state.session_id, "turns"):
+                    with st.chat_message(old['role']):
+                        st.markdown(old['content'])
         if msg['role'] == 'user':
             with st.chat_message("user"):
                 st.write(msg['content'].replace("Analyze this news: ", "News: "))
         else:
             with st.chat_message("assistant"):
                 st.markdown(msg['content'])
+                if msg.get('degraded'):
+                    st.caption("⚠️ Degraded: " + "; ".join(msg['degraded']))
+                if msg.get('reopened'):
+                    saved = datetime.datetime.fromtimestamp(msg['reopened']).strftime("%Y-%m-%d %H:%M")
+                    then = msg.get('then_probability')
+                    drift = f" · market then {then:.0%}, now {get_live_prices().overlay(m)['probability']:.0%}" if m and then is not None else ""
+                    st.caption(f"📚 Saved analysis from {saved}{drift}")
 
     # Chat Input
-    if prompt := st.chat_input("Ask a follow-up question..."):
+    if prompt := st.chat_input("Ask a follow-up question...", disabled=bool(st.session_state.analysis_job)):
         st.session_state.messages.append({"role": "user", "content": prompt})
         st.rerun()
 
     st.markdown("---")
     if st.button("⬅️ Start New Analysis"):
+        cancel_analysis_job()
         st.session_state.messages = []
+        reset_transcript_spill()
         st.session_state.search_stage = "input"
         st.rerun()
 
@@ -1157,16 +4606,21 @@ if not st.session_state.messages and st.session_state.search_stage == "input":
         """
         st.markdown(trend_html, unsafe_allow_html=True)
 
-        cat_cols = st.columns(4)
-        cats = ["all", "politics", "web3", "tech"]
+        cats = feed_categories()
         labels = {"all": "🌐 All", "politics": "🏛️ Politics", "web3": "₿ Web3", "tech": "🤖 Tech"}
+        cat_cols = st.columns(len(cats))
         for i, c in enumerate(cats):
-            if cat_cols[i].button(labels[c], key=c, use_container_width=True):
+            if cat_cols[i].button(labels.get(c, f"📰 {c.title()}"), key=c, use_container_width=True):
                 st.session_state.news_category = c
                 st.rerun()
 
         @st.fragment(run_every=1)
         def render_news_feed():
+            maybe_profile("fragment:render_news_feed")
+            # A headline button was clicked inside this fragment: leave the dashboard
+            if st.session_state.pop("pending_app_rerun", False):
+                st.rerun()
+
             now_utc = datetime.datetime.now(datetime.timezone.utc)
             t_nyc = (now_utc - datetime.timedelta(hours=5)).strftime("%H:%M")
             t_lon = now_utc.strftime("%H:%M")
@@ -1183,6 +4637,7 @@ if not st.session_state.messages and st.session_state.search_stage == "input":
 """, unsafe_allow_html=True)
 
             if st.session_state.news_category == "web3":
+                get_correlation_engine()
                 data = fetch_crypto_prices_v2()
                 if data:
                     rows = [data[i:i+2] for i in range(0, len(data), 2)]
@@ -1206,7 +4661,7 @@ if not st.session_state.messages and st.session_state.search_stage == "input":
                     st.info("Loading crypto data...")
             else:
                 all_news = fetch_categorized_news_v2()
-                news_list = all_news.get(st.session_state.news_category, all_news['all'])
+                news_list = all_news.get(st.session_state.news_category, all_news.get('all', []))
                 if news_list:
                     rows = [news_list[i:i+2] for i in range(0, min(len(news_list), 24), 2)]
                     for row in rows:
@@ -1215,16 +4670,22 @@ if not st.session_state.messages and st.session_state.search_stage == "input":
                             cols[i].markdown(f"""
                             <div class="news-grid-card">
                                 <div>
-                                    <div class="news-meta"><span>{news['source']}</span><span style="color:#ef4444">{news['time']}</span></div>
+                                    <div class="news-meta"><span>{news['source']}{f" +{news['sources'] - 1}" if news.get('sources', 1) > 1 else ""}</span><span style="color:#ef4444">{news['time']}</span></div>
                                     <div class="news-body">{news['title']}</div>
                                 </div>
                                 <a href="{news['link']}" target="_blank" style="text-decoration:none; color:#ef4444; font-size:0.8rem; font-weight:600; text-align:right; display:block; margin-top:10px;">🔗 Read Source</a>
                             </div>
                             """, unsafe_allow_html=True)
+                            cols[i].button("🎯 Find Markets", key=f"match_{news.get('cluster_id', news['title'])}",
+                                           on_click=open_headline_matches, args=(news['title'],), use_container_width=True)
                 else:
                     st.info("No news available.")
         render_news_feed()
 
+    # Precompute headline -> market matches in the background for one-click analysis
+    refresh_match_matrix()
+    get_analysis_cache().observe_markets(fetch_open_markets_catalog()["events"])
+
     # === RIGHT: Polymarket (Top 60) ===
     with col_markets:
         st.markdown('<div style="display:flex; justify-content:space-between; align-items:center; margin-bottom:10px; border-bottom:1px solid rgba(220,38,38,0.3); padding-bottom:8px;"><span style="font-size:0.9rem; font-weight:700; color:#ef4444;">💰 PREDICTION MARKETS (TOP VOLUME)</span></div>', unsafe_allow_html=True)
@@ -1237,26 +4698,35 @@ if not st.session_state.messages and st.session_state.search_stage == "input":
             st.session_state.market_sort = "active"
             st.rerun() # Force Rerun to refresh list
         
-        # Pass sort_mode to fetcher
-        markets = fetch_polymarket_v5_simple(60, sort_mode=st.session_state.market_sort)
-        
-        if markets:
-            rows = [markets[i:i+2] for i in range(0, len(markets), 2)]
-            for row in rows:
-                cols = st.columns(2)
-                for i, m in enumerate(row):
-                    cols[i].markdown(f"""
-                    <a href="https://polymarket.com/event/{m['slug']}" target="_blank" style="text-decoration:none;">
-                        <div class="market-card-modern">
-                            <div class="market-head">
-                                <div class="market-title-mod">{m['title']}</div>
-                                <div class="market-vol">{m['vol_str']}</div>
+        # Pass sort_mode to fetcher; odds on the cards follow the live price table
+        @st.fragment(run_every=LIVE_POLL_INTERVAL * 2)
+        def render_market_grid():
+            maybe_profile("fragment:render_market_grid")
+            markets = fetch_polymarket_v5_simple(60, sort_mode=st.session_state.market_sort)
+            if not st.session_state.parked:
+                get_live_prices().watch([m.get('market_id') for m in markets])
+            
+            if markets:
+                live = get_live_prices()
+                rows = [markets[i:i+2] for i in range(0, len(markets), 2)]
+                for row in rows:
+                    cols = st.columns(2)
+                    for i, m in enumerate(row):
+                        m = live.overlay(m)
+                        cols[i].markdown(f"""
+                        <a href="https://polymarket.com/event/{m['slug']}" target="_blank" style="text-decoration:none;">
+                            <div class="market-card-modern">
+                                <div class="market-head">
+                                    <div class="market-title-mod">{m['title']}</div>
+                                    <div class="market-vol">{m['vol_str']}</div>
+                                </div>
+                                <div style="font-size:0.75rem; color:#9ca3af; font-family:'JetBrains Mono'; margin-top:6px;">{m['odds']}</div>
                             </div>
-                        </div>
-                    </a>
-                    """, unsafe_allow_html=True)
-        else:
-            st.info("Loading markets...")
+                        </a>
+                        """, unsafe_allow_html=True)
+            else:
+                st.info("Loading markets...")
+        render_market_grid()
 
 # ================= 🌐 7. FOOTER =================
 if not st.session_state.messages and st.session_state.search_stage == "input":
@@ -1286,3 +4756,43 @@ if not st.session_state.messages and st.session_state.search_stage == "input":
             </a>
             """, unsafe_allow_html=True)
     st.markdown("<br><br>", unsafe_allow_html=True)
+
+# --- Idle janitor: parks this session's payload after SESSION_IDLE_TIMEOUT ---
+@st.fragment(run_every=60)
+def session_janitor():
+    maybe_profile("fragment:session_janitor")
+    release_if_idle()
+session_janitor()
+
+# ================= 🛠️ 8. DEBUG PANEL (?debug=1) =================
+if st.query_params.get("debug") == "1":
+    with st.expander("🛠️ Debug", expanded=False):
+        st.markdown("**Logs**")
+        st.code("\n".join(st.session_state.debug_logs) or "(empty)")
+        content_filter = get_content_filter()
+        st.markdown(f"**Content Filter** · checked {content_filter.checked} · blocked {content_filter.blocked}")
+        if content_filter.hits:
+            st.table(content_filter.stats())
+        analysis_cache = get_analysis_cache()
+        st.markdown(f"**Analysis Cache** · {len(analysis_cache.entries)} entries · {analysis_cache.hits} hits · {analysis_cache.misses} misses")
+        router = get_llm_router()
+        st.markdown(f"**LLM Router** · providers {[p.name for p in router.providers]} · wins {dict(router.wins)} · hedges {router.hedges}")
+        st.markdown(f"**Analysis Jobs** · {get_analysis_jobs().stats()}")
+        st.markdown(f"**Speculative Pre-Analysis** · {get_speculator().stats()}")
+        st.markdown(f"**Watchlist** · {get_watchlist().stats()}")
+        if get_profile_store()["finished"]:
+            last = get_profile_store()["finished"][-1]
+            st.markdown(f"**Profiler** · last `{last['label']}` · wall {last['wall_ms']} ms · cpu {last['cpu_ms']} ms · `{last['files'] or 'export failed'}`")
+            st.table(last["summary"])
+        if get_catalog_mirror():
+            st.markdown(f"**Catalog Mirror** · {get_catalog_mirror().stats()}")
+        correlation = get_correlation_engine()
+        st.markdown(f"**Correlation** · {correlation.stats()}")
+        if correlation.result:
+            st.table(correlation.strongest())
+        st.markdown(f"**Source Content Cache** · {get_content_cache().stats()}")
+        st.markdown(f"**Analysis History** · {get_analysis_history().stats()}")
+        memo = get_event_memo()
+        st.markdown(f"**Event Memo** · {len(memo.entries)} events · {memo.hits} reused · {memo.misses} processed")
+        if NET_MODE in ("record", "replay"):
+            st.markdown(f"**Net Archive** · {get_net_archive().stats()}")
@@ -0,0 +1,72 @@
+import gc
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+from upstream_stubs import start_stub_server, stub_environment  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, "streamlit_app.py")
+
+
+@pytest.fixture(scope="session")
+def stub_server(tmp_path_factory):
+    """One stand-in upstream for the whole run (cache_resource state is process-wide anyway)."""
+    scratch = tmp_path_factory.mktemp("beholmes")
+    server, base = start_stub_server(drift_every=3600)
+    env = stub_environment(base, str(scratch / "feeds.json"))
+    env.update({name: str(scratch / f"{name.lower()}.sqlite3") for name in
+                ["SHARED_CACHE_PATH", "SESSION_SPILL_PATH", "ANALYSIS_HISTORY_PATH", "CATALOG_MIRROR_PATH"]})
+    os.environ.update(env)
+    return server
+
+
+@pytest.fixture
+def new_session(stub_server):
+    from streamlit.testing.v1 import AppTest
+
+    def start():
+        at = AppTest.from_file(APP_PATH, default_timeout=60)
+        at.secrets["GOOGLE_API_KEY"] = "stub"
+        at.secrets["EXA_API_KEY"] = "stub"
+        at.run()
+        return at
+    return start
+
+
+def set_topic_prices(server, topic, yes):
+    """
+    Pin every market of a stub topic (e.g. "Oil") to the given Yes price, then bring the
+    app's catalog mirror up to date, so searches see the move without waiting for its next sync.
+    """
+    now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    with server.catalog.lock:
+        for event in server.catalog.events:
+            if event["title"].startswith(f"{topic}:"):
+                for market in event["markets"]:
+                    server.catalog.markets[market["id"]]["outcomePrices"] = json.dumps([f"{yes:.3f}", f"{1 - yes:.3f}"])
+                    server.catalog.markets[market["id"]]["updatedAt"] = now
+    for mirror in app_resources("CatalogMirror"):
+        if mirror.ready(): mirror.delta_sync()
+
+
+def app_resources(class_name):
+    """Live instances of an app class, e.g. the process-wide objects its st.cache_resource functions hold."""
+    return [obj for obj in gc.get_objects() if type(obj).__name__ == class_name]
+
+
+def load_app_defs(*names, **globals_):
+    """Compile selected top-level functions, classes and constants of streamlit_app.py without running the script."""
+    import ast
+    with open(APP_PATH, encoding="utf-8") as fh:
+        tree = ast.parse(fh.read())
+    body = [node for node in tree.body
+            if (isinstance(node, (ast.FunctionDef, ast.ClassDef)) and node.name in names)
+            or (isinstance(node, ast.Assign) and any(getattr(t, "id", None) in names for t in node.targets))]
+    namespace = dict(globals_)
+    exec(compile(ast.Module(body=body, type_ignores=[]), APP_PATH, "exec"), namespace)
+    return namespace
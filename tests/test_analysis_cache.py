@@ -0,0 +1,97 @@
+import collections
+import functools
+import hashlib
+import json
+import re
+import threading
+import time
+import types
+
+import pytest
+
+from conftest import load_app_defs
+
+
+class DictSharedCache:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ttl, stale_ttl=None):
+        self.data[key] = (value, time.time() + ttl)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture
+def app():
+    shared = DictSharedCache()
+    ns = load_app_defs(
+        "ANALYSIS_CACHE_TTL", "ANALYSIS_CACHE_MAX_ENTRIES", "ANALYSIS_BUCKET_WIDTH", "normalize_query", "probability_bucket",
+        "analysis_cache_key", "is_chinese_input", "AnalysisCache", "analysis_cached",
+        collections=collections, functools=functools, hashlib=hashlib, json=json, re=re, threading=threading, time=time,
+        get_shared_cache=lambda: shared, ANALYSIS_DEADLINE=60,
+    )
+    cache = ns["AnalysisCache"](max_entries=3)
+    ns.update(shared=shared, cache=cache, get_analysis_cache=lambda: cache)
+    return ns
+
+
+def market(slug="fed-cut", probability=0.62):
+    return {"slug": slug, "probability": probability}
+
+
+def ask(text, *follow_ups):
+    return [{"role": "user", "content": text}] + [{"role": r, "content": c} for r, c in follow_ups]
+
+
+def test_key_ignores_prefix_case_and_punctuation(app):
+    key = app["analysis_cache_key"]
+    base, slug, bucket = key(ask("Analyze this news: Fed cuts rates!"), market())
+    assert key(ask("fed   CUTS rates"), market(probability=0.64)) == (base, slug, bucket) == (base, "fed-cut", 12)
+    assert key(ask("Fed cuts rates"), market(probability=0.66))[0] != base            # next 5pp bucket
+    assert key(ask("Fed cuts rates"), market("oil-90"))[0] != base
+    assert key(ask("Fed cuts rates", ("assistant", "memo"), ("user", "why?")), market())[0] != base
+    assert key(ask("美联储降息"), market())[0] != key(ask("Fed cuts rates"), market())[0]
+
+
+def test_lru_evicts_the_least_recently_used(app):
+    cache = app["cache"]
+    for name in "abc":
+        cache.put(name, f"memo {name}", "fed-cut", 12)
+    assert cache.get("a", "fed-cut", 12) == "memo a"
+    cache.put("d", "memo d", "fed-cut", 12)
+    assert list(cache.entries) == ["c", "a", "d"] and "b" not in cache.by_slug["fed-cut"]
+    # The shared backend still has it, and a hit brings it back locally
+    assert cache.get("b", "fed-cut", 12) == "memo b" and "b" in cache.entries
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+def test_bucket_move_evicts_the_slug_everywhere(app):
+    cache, shared = app["cache"], app["shared"]
+    cache.put("k1", "memo at 62%", "fed-cut", 12)
+    cache.put("k2", "oil memo", "oil-90", 4)
+    cache.observe_markets([market(probability=0.63), market("oil-90", 0.30)])
+    assert cache.contains("k1") and not cache.contains("k2")
+    assert "analysis:k2" not in shared.data
+    assert cache.get("k1", "fed-cut", 14) is None
+    assert not cache.entries and "analysis:k1" not in shared.data and cache.misses == 1
+
+
+def test_only_clean_answers_are_cached(app):
+    answers = iter(["Agent Analysis Failed: quota", "partial memo", "full memo"])
+
+    def respond(history, market_data, deadline, on_progress):
+        return next(answers)
+
+    cached = app["analysis_cached"](respond)
+    history = ask("Fed cuts rates")
+    clean = types.SimpleNamespace(degraded=[])
+    assert cached(history, market(), clean) == "Agent Analysis Failed: quota"
+    assert cached(history, market(), types.SimpleNamespace(degraded=["fact check: timed out"])) == "partial memo"
+    assert not app["cache"].entries
+    assert cached(history, market(), clean) == "full memo"
+    assert cached(history, market(), clean) == "full memo"          # served from the cache; no fourth answer needed
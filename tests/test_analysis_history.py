@@ -0,0 +1,85 @@
+import collections
+import json
+import re
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from conftest import load_app_defs
+
+
+@pytest.fixture
+def history(tmp_path):
+    ns = load_app_defs(
+        "HISTORY_WRITE_BATCH", "HISTORY_SEARCH_LIMIT", "HISTORY_PRUNE_INTERVAL", "SOURCE_LINK_RE", "AnalysisHistory",
+        HISTORY_RETENTION_DAYS=30, collections=collections, json=json, re=re, sqlite3=sqlite3, threading=threading, time=time,
+    )
+    return ns["AnalysisHistory"](str(tmp_path / "history.sqlite3"))
+
+
+def record(history, query, owner, memo="Memo text.", degraded=None, created_at=None):
+    market = {"slug": "fed-cut", "title": "Fed cut in December?", "probability": 0.62,
+              "markets": [{"question": "Fed cut in December?", "top_option": "Yes", "top_price": 0.62}]}
+    history.record([{"role": "user", "content": f"Analyze this news: {query}"}], market, memo,
+                   "- [Fed cuts rates](https://reuters.com/fed) (Via reuters.com)", degraded, owner)
+    if created_at is not None:
+        history.pending[-1]["created_at"] = created_at
+
+
+def flush(history, count):
+    for _ in range(100):
+        if history.written >= count: return
+        time.sleep(0.02)
+    raise AssertionError("history writer did not catch up")
+
+
+def test_each_owner_sees_only_their_memos(history):
+    record(history, "Fed signals rate cut", "alice")
+    record(history, "Oil jumps on OPEC cuts", "bob")
+    record(history, "Fed minutes show split", "bob")
+    flush(history, 3)
+    assert [e["query"] for e in history.recent("alice")] == ["Fed signals rate cut"]
+    assert [e["query"] for e in history.search("opec", "bob")] == ["Oil jumps on OPEC cuts"]
+    assert history.search("opec", "alice") == []
+    # Shared history (owner=None) sees everyone's
+    assert len(history.recent()) == 3 and len(history.search("minutes")) == 1
+
+
+def test_entries_keep_sources_and_degraded_notes(history):
+    record(history, "Fed signals rate cut", "alice", degraded=["fact check: timed out after 9.0s"])
+    flush(history, 1)
+    [entry] = history.recent("alice")
+    assert entry["degraded"] == ["fact check: timed out after 9.0s"]
+    assert entry["sources"] == [{"title": "Fed cuts rates", "url": "https://reuters.com/fed"}]
+    assert entry["prices"][0]["top_price"] == 0.62 and entry["owner"] == "alice"
+
+
+def test_prune_drops_old_memos_from_table_and_index(history):
+    record(history, "Ancient fed story", "alice", created_at=time.time() - 40 * 86400)
+    record(history, "Fresh fed story", "alice")
+    flush(history, 2)
+    history.prune()
+    assert [e["query"] for e in history.recent("alice")] == ["Fresh fed story"]
+    assert [e["query"] for e in history.search("fed ancient")] == []
+    assert history.stats()["expired"] == 1
+    if history.fts:
+        assert history._conn().execute("SELECT COUNT(*) FROM analyses_fts WHERE analyses_fts MATCH 'ancient'").fetchone()[0] == 0
+
+
+def test_histories_without_owners_are_migrated(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE analyses (id INTEGER PRIMARY KEY, created_at REAL, query TEXT, turn INTEGER, "
+                 "slug TEXT, title TEXT, probability REAL, prices TEXT, sources TEXT, memo TEXT, degraded TEXT)")
+    conn.execute("INSERT INTO analyses (created_at, query, turn, memo) VALUES (?, 'Old query', 1, 'Old memo')", (time.time(),))
+    conn.commit()
+    conn.close()
+    ns = load_app_defs(
+        "HISTORY_WRITE_BATCH", "HISTORY_SEARCH_LIMIT", "HISTORY_PRUNE_INTERVAL", "SOURCE_LINK_RE", "AnalysisHistory",
+        HISTORY_RETENTION_DAYS=30, collections=collections, json=json, re=re, sqlite3=sqlite3, threading=threading, time=time,
+    )
+    history = ns["AnalysisHistory"](path)
+    assert [e["owner"] for e in history.recent()] == [None]
+    assert history.recent("alice") == []
@@ -0,0 +1,77 @@
+import codecs
+import datetime
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import pytest
+import requests
+
+from conftest import load_app_defs
+
+
+class FakeMemo:
+    """Stands in for the event memo: keeps just what the assertions look at."""
+    def process(self, raw):
+        return {"slug": raw["slug"], "title": raw["title"], "volume": 1.0,
+                "prices": {m["id"]: json.loads(m["outcomePrices"]) for m in raw.get("markets") or []}}
+
+
+@pytest.fixture
+def mirror(stub_server, tmp_path):
+    ns = load_app_defs(
+        "CatalogMirror", "_gamma_ts", "iter_gamma_events", "iter_gamma_markets", "iter_json_array",
+        "_prune_gamma_fields", "_prune_gamma_market_fields", "GAMMA_EVENT_FIELDS", "GAMMA_PAGE_SIZE",
+        "MIRROR_MAX_EVENTS", "MIRROR_DELTA_MAX_PAGES", "MIRROR_CURSOR_OVERLAP",
+        codecs=codecs, datetime=datetime, json=json, os=os, re=re, sqlite3=sqlite3, threading=threading,
+        time=time, zlib=zlib, requests=requests, get_event_memo=FakeMemo,
+        GAMMA_API_BASE=os.environ["GAMMA_API_BASE"],
+    )
+    m = ns["CatalogMirror"](str(tmp_path / "mirror.sqlite3"))
+    m.full_sync()
+    return m
+
+
+def now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def test_price_move_without_event_update_reaches_the_mirror(stub_server, mirror):
+    event = stub_server.catalog.events[7]
+    market = event["markets"][0]
+    with stub_server.catalog.lock:
+        # What Gamma does on a trade: the market changes, the event's updatedAt does not
+        market.update(outcomePrices=json.dumps(["0.123", "0.877"]), updatedAt=now_iso())
+    assert mirror.delta_sync()
+    assert mirror.get(event["slug"])["prices"][market["id"]] == ["0.123", "0.877"]
+
+
+def test_closed_events_are_purged(stub_server, mirror):
+    event = stub_server.catalog.events[9]
+    assert mirror.get(event["slug"]) is not None
+    with stub_server.catalog.lock:
+        event.update(closed=True, updatedAt=now_iso())
+    try:
+        assert mirror.delta_sync()
+        conn = mirror._conn()
+        assert conn.execute("SELECT COUNT(*) FROM events WHERE slug = ?", (event["slug"],)).fetchone()[0] == 0
+        if mirror.fts:
+            assert conn.execute("SELECT COUNT(*) FROM events_fts WHERE slug = ?", (event["slug"],)).fetchone()[0] == 0
+    finally:
+        event["closed"] = False
+
+
+def test_full_sync_drops_events_gone_from_the_listing(stub_server, mirror):
+    event = stub_server.catalog.events[11]
+    with stub_server.catalog.lock:
+        event["closed"] = True      # closed without touching updatedAt: only a full pass notices
+    try:
+        mirror.full_sync()
+        assert mirror.get(event["slug"]) is None
+        assert mirror._conn().execute("SELECT COUNT(*) FROM events WHERE slug = ?", (event["slug"],)).fetchone()[0] == 0
+    finally:
+        event["closed"] = False
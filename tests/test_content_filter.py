@@ -0,0 +1,70 @@
+import collections
+import functools
+import hashlib
+import json
+import re
+import threading
+import time
+import types
+
+import pytest
+
+from conftest import load_app_defs
+
+
+@pytest.fixture
+def app():
+    settings = {}
+    reads = collections.Counter()
+
+    def get_setting(name, default=None):
+        reads[name] += 1
+        return settings.get(name, default)
+
+    ns = load_app_defs(
+        "CONTENT_FILTER_RELOAD", "SENSITIVE_KEYWORDS", "_setting_list", "content_filter_config", "ContentFilter",
+        "_build_content_filter", "_content_filter_state", "get_content_filter",
+        st=types.SimpleNamespace(cache_resource=functools.cache), get_setting=get_setting, collections=collections,
+        hashlib=hashlib, json=json, re=re, threading=threading, time=time,
+    )
+    ns.update(settings=settings, reads=reads)
+    return ns
+
+
+def test_allowlist_wins_over_contained_block_phrase(app):
+    content_filter = app["ContentFilter"](("china", "taiwan"), ("china open",))
+    assert content_filter.blocked_by("Sinner wins the China Open") is None
+    assert content_filter.blocked_by("Tennis", "China tariffs rise") == "china"
+    assert content_filter.blocked_by(None, "Fed cuts rates") is None
+    assert (content_filter.checked, content_filter.blocked) == (3, 1)
+    assert {r["rule"]: r["hits"] for r in content_filter.stats()} == {"china open": 1, "china": 1}
+
+
+def test_list_settings_accept_json_or_commas(app):
+    app["settings"].update(CONTENT_FILTER_BLOCKLIST='["Tariff", " war "]', CONTENT_FILTER_ALLOWLIST="china open, ,taiwan strait")
+    block, allow = app["content_filter_config"]()
+    assert {"tariff", "war", "china"} <= set(block)
+    assert allow == ("china open", "taiwan strait")
+
+
+def test_settings_are_read_once_per_reload_interval(app):
+    get_content_filter = app["get_content_filter"]
+    first = get_content_filter()
+    for _ in range(100):
+        assert get_content_filter() is first
+    assert app["reads"]["CONTENT_FILTER_BLOCKLIST"] == 1
+
+
+def test_changed_settings_rebuild_after_reload(app):
+    get_content_filter = app["get_content_filter"]
+    first = get_content_filter()
+    state = app["_content_filter_state"]()
+    # Unchanged lists: re-read, but the same compiled filter comes back
+    state["read_at"] -= app["CONTENT_FILTER_RELOAD"]
+    assert get_content_filter() is first and app["reads"]["CONTENT_FILTER_BLOCKLIST"] == 2
+    app["settings"]["CONTENT_FILTER_BLOCKLIST"] = "tariff"
+    assert get_content_filter() is first            # not re-read before the interval is up
+    state["read_at"] -= app["CONTENT_FILTER_RELOAD"]
+    updated = get_content_filter()
+    assert updated is not first and updated.version != first.version
+    assert updated.blocked_by("New tariff on steel") == "tariff"
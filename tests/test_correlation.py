@@ -0,0 +1,73 @@
+import math
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from conftest import load_app_defs
+
+
+@pytest.fixture
+def app():
+    return load_app_defs(
+        "CORR_INTERVAL", "CORR_WINDOW", "CORR_MAX_MARKETS", "CORR_MAX_LAG", "CORR_MIN_OBS", "CORR_MIN_ABS",
+        "CorrelationEngine", math=math, np=np, threading=threading, time=time,
+    )
+
+
+def feed(engine, steps, seed=7):
+    """BTC random walk; 'btc-100k' follows it in step, 'btc-lag' two steps later, 'oil-90' on its own."""
+    rng = np.random.default_rng(seed)
+    btc_returns = rng.normal(0, 0.01, steps)
+    oil_moves = rng.normal(0, 0.005, steps)
+    log_btc, p_now, p_lag, p_oil = math.log(60000), 0.5, 0.5, 0.5
+    for t in range(steps):
+        log_btc += btc_returns[t]
+        p_now += 0.5 * btc_returns[t]
+        p_lag += 0.5 * btc_returns[t - 2] if t >= 2 else 0.0
+        p_oil += oil_moves[t]
+        engine.observe([{"symbol": "BTC", "price_value": math.exp(log_btc)}, {"symbol": "ETH", "price_value": None}], [
+            {"slug": "btc-100k", "title": "Bitcoin above $100k?", "volume": 3, "probability": p_now},
+            {"slug": "btc-lag", "title": "Bitcoin ETF flows?", "volume": 2, "probability": p_lag},
+            {"slug": "oil-90", "title": "Oil above $90?", "volume": 1, "probability": p_oil},
+        ])
+
+
+def test_nothing_is_scored_before_enough_samples(app):
+    engine = app["CorrelationEngine"](window=60)
+    feed(engine, app["CORR_MIN_OBS"])
+    assert engine.result is None and engine.pairs_for("btc-100k") == []
+    assert engine.assets == ["BTC"]          # a symbol without a price gets no column
+
+
+def test_in_step_link_has_full_correlation_and_beta(app):
+    engine = app["CorrelationEngine"](window=120)
+    feed(engine, 150)
+    [pair] = engine.pairs_for("btc-100k")
+    assert pair["asset"] == "BTC" and pair["lag"] == 0
+    assert pair["corr"] == pytest.approx(1.0, abs=1e-6) and pair["beta_pp"] == pytest.approx(0.5, rel=1e-3)
+    assert engine.pairs_for("oil-90") == []
+    assert engine.pairs_for("unknown") == []
+
+
+def test_lagging_market_reports_the_lead(app):
+    engine = app["CorrelationEngine"](window=120)
+    feed(engine, 150)
+    [pair] = engine.pairs_for("btc-lag")
+    # BTC moves two samples before the market
+    assert pair["lag"] == 2 and pair["lag_corr"] > 0.95 and abs(pair["corr"]) < app["CORR_MIN_ABS"]
+    assert pair["beta_pp"] == pytest.approx(0.5, rel=0.05)
+    strongest = engine.strongest(top=2)
+    assert {r["market"] for r in strongest} == {"Bitcoin above $100k?", "Bitcoin ETF flows?"}
+
+
+def test_full_engine_recycles_columns_of_markets_gone_quiet(app):
+    engine = app["CorrelationEngine"](window=4, max_markets=1)
+    engine.observe([], [{"slug": "old", "title": "Old", "probability": 0.5}])
+    engine.observe([], [{"slug": "new", "title": "New", "probability": 0.5}])
+    assert list(engine.market_col) == ["old"]            # 'old' was still in the window
+    for _ in range(4):
+        engine.observe([], [])
+    engine.observe([], [{"slug": "new", "title": "New", "probability": 0.5}])
+    assert engine.market_col == {"new": 0} and "old" not in engine.market_title
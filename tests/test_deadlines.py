@@ -0,0 +1,65 @@
+import concurrent.futures
+import functools
+import json
+import time
+import types
+
+import pytest
+import requests
+
+from conftest import load_app_defs
+from upstream_stubs import UpstreamProfile, start_stub_server
+
+
+@pytest.fixture(scope="module")
+def slow_upstreams():
+    """Gamma and Exa stand-ins that take 3s to answer."""
+    slow = UpstreamProfile(latency=3.0, jitter=0.0)
+    server, base = start_stub_server(profiles={"gamma": slow, "exa": slow}, n_events=20)
+    yield base
+    server.shutdown()
+
+
+@pytest.fixture
+def app(slow_upstreams):
+    return load_app_defs(
+        "STAGE_MIN_BUDGET", "Deadline", "get_stage_executor", "run_stage", "fetch_gamma_json", "_exa_request", "exa_search",
+        st=types.SimpleNamespace(cache_resource=functools.cache), shared_cache=lambda *a, **k: (lambda f: f),
+        log_debug=lambda msg: None, time=time, concurrent=concurrent, functools=functools, json=json, requests=requests,
+        Exa=__import__("exa_py").Exa, ExaJSONEncoder=__import__("exa_py.api").api.ExaJSONEncoder,
+        EXA_API_KEY="stub", EXA_API_BASE=f"{slow_upstreams}/exa", GAMMA_API_BASE=f"{slow_upstreams}/gamma",
+    )
+
+
+def test_stage_gets_its_slice_as_timeout(app):
+    seen = {}
+    result = app["run_stage"](app["Deadline"](10), "probe", lambda x, timeout: seen.update(x=x, timeout=timeout) or "ok", 1, share=0.3, cap=2)
+    assert result == "ok"
+    assert seen["x"] == 1 and seen["timeout"] == pytest.approx(2)
+    # Callables that take no timeout opt out
+    assert app["run_stage"](app["Deadline"](10), "probe", lambda: "ok", timeout_kw=None) == "ok"
+
+
+def test_abandoned_fetch_releases_its_worker(app):
+    finished = []
+
+    def fetch(url, timeout):
+        try: return app["fetch_gamma_json"](url, timeout=timeout)
+        finally: finished.append(time.monotonic())
+
+    deadline = app["Deadline"](0.5)
+    start = time.monotonic()
+    assert app["run_stage"](deadline, "market search", fetch, f"{app['GAMMA_API_BASE']}/events?limit=1", default="fallback") == "fallback"
+    assert deadline.degraded and "timed out" in deadline.degraded[0]
+    # The request itself gave up with the stage rather than after the upstream's 3s
+    for _ in range(30):
+        if finished: break
+        time.sleep(0.05)
+    assert finished and finished[0] - start < 1.5
+
+
+def test_exa_search_times_out(app):
+    start = time.monotonic()
+    with pytest.raises(requests.exceptions.Timeout):
+        app["exa_search"]("fed rate cut", 5, timeout=0.3)
+    assert time.monotonic() - start < 1.5
@@ -0,0 +1,40 @@
+import re
+
+from conftest import app_resources
+from test_watchlist import search
+
+
+def watched_ids():
+    """Ids on the process-wide live poll list."""
+    return {mid for table in app_resources("LivePriceTable") for mid in table.watched}
+
+
+def sub_market_ids(at, event):
+    """Ids of the sub-markets drawn on the page, in order."""
+    by_question = {market["question"]: market["id"] for market in event["markets"]}
+    headings = [re.match(r"\*\*\d+\. (.*)\*\*$", md.value) for md in at.markdown]
+    return [by_question[h.group(1)] for h in headings if h]
+
+
+def test_large_event_shows_top_sub_markets_and_watches_only_those(stub_server, new_session):
+    at = new_session()
+    slugs = search(at, "SpaceX files confidentially for IPO, sources say")
+    events = {e["slug"]: e for e in stub_server.catalog.events}
+    idx = next(i for i, slug in enumerate(slugs) if len(events[slug]["markets"]) == 30)
+    slug, event = slugs[idx], events[slugs[idx]]
+    at.button(key=f"btn_{idx}").click().run()
+    assert not at.exception
+
+    shown = sub_market_ids(at, event)
+    assert len(shown) == 6
+    assert [e.label for e in at.expander if "more sub-markets" in e.label] == ["➕ 24 more sub-markets"]
+    hidden = {m["id"] for m in event["markets"]} - set(shown)
+    assert set(shown) <= watched_ids()
+    assert not hidden & watched_ids()
+
+    # Opening the expander draws the rest and puts them on the poll list
+    at.session_state[f"more_sub_markets_{slug}"] = True
+    at.run()
+    assert not at.exception
+    assert len(sub_market_ids(at, event)) == 30
+    assert hidden <= watched_ids()
@@ -0,0 +1,60 @@
+import collections
+import copy
+import hashlib
+import threading
+import types
+
+import pytest
+
+from conftest import load_app_defs
+
+
+@pytest.fixture
+def app():
+    calls = []
+    content_filter = types.SimpleNamespace(version="v1")
+
+    def process(event):
+        calls.append(event.get("id"))
+        return {"slug": event.get("slug"), "probability": float(event["markets"][0]["outcomePrices"][0])}
+
+    ns = load_app_defs(
+        "EVENT_MEMO_MAX", "_EVENT_STAMP_FIELDS", "event_update_stamp", "EventNormalizationMemo",
+        collections=collections, hashlib=hashlib, threading=threading,
+        process_polymarket_event=process, get_content_filter=lambda: content_filter,
+    )
+    ns.update(calls=calls, content_filter=content_filter)
+    return ns
+
+
+def event(event_id, price="0.6", updated="2026-10-01T00:00:00Z"):
+    return {"id": event_id, "slug": f"event-{event_id}", "updatedAt": updated, "title": "Fed decision",
+            "markets": [{"id": f"{event_id}-1", "outcomePrices": [price], "volume": "100", "updatedAt": updated}]}
+
+
+def test_unchanged_events_are_normalized_once(app):
+    memo = app["EventNormalizationMemo"]()
+    first = memo.process(event("1"))
+    assert memo.process(copy.deepcopy(event("1"))) is first
+    assert app["calls"] == ["1"] and (memo.hits, memo.misses) == (1, 1)
+
+
+def test_price_moves_and_filter_changes_invalidate(app):
+    memo = app["EventNormalizationMemo"]()
+    memo.process(event("1"))
+    # Gamma moves a price without touching the event's updatedAt
+    assert memo.process(event("1", price="0.7"))["probability"] == 0.7
+    app["content_filter"].version = "v2"
+    memo.process(event("1", price="0.7"))
+    assert app["calls"] == ["1", "1", "1"]
+    assert app["event_update_stamp"](event("1")) != app["event_update_stamp"](event("1", updated="2026-10-02T00:00:00Z"))
+
+
+def test_memo_is_bounded_lru(app):
+    memo = app["EventNormalizationMemo"](max_entries=2)
+    for event_id in ("1", "2", "1", "3"):
+        memo.process(event(event_id))
+    assert list(memo.entries) == ["1", "3"]
+    # Events without an id or slug are always processed, never stored
+    memo.process({"markets": [{"outcomePrices": ["0.5"]}]})
+    assert len(memo.entries) == 2 and app["calls"][-1] is None
@@ -0,0 +1,107 @@
+import collections
+import concurrent.futures
+import datetime
+import email.utils
+import html
+import json
+import os
+import random
+import threading
+import time
+import types
+import urllib.parse
+import xml.etree.ElementTree as ET
+
+import pytest
+import requests
+
+from conftest import load_app_defs
+
+
+def make_app(feeds_file):
+    return load_app_defs(
+        "DEFAULT_FEEDS", "FEED_MIN_INTERVAL", "FEED_MAX_INTERVAL", "FEED_MAX_WORKERS", "FEED_ITEMS_PER_FEED",
+        "load_feed_registry", "feed_categories", "_xml_local", "_parse_feed_time", "publisher_domain",
+        "stream_feed_entries", "FeedScheduler", "_time_ago",
+        get_setting=lambda name, default=None: feeds_file if name == "NEWS_FEEDS_FILE" else default,
+        get_content_filter=lambda: types.SimpleNamespace(blocked_by=lambda title: "china" if "China" in title else None),
+        collections=collections, concurrent=concurrent, datetime=datetime, email=email, html=html, json=json,
+        random=random, threading=threading, time=time, urllib=urllib, requests=requests, ET=ET,
+    )
+
+
+def test_registry_file_extends_or_replaces_the_defaults(tmp_path):
+    path = tmp_path / "feeds.json"
+    path.write_text(json.dumps([{"name": "Reuters World", "category": "politics", "url": "https://reuters.com/world.rss"},
+                                {"name": "Renamed", "category": "tech", "url": "https://techcrunch.com/feed/"}]))
+    app = make_app(str(path))
+    feeds = {f["url"]: f for f in app["load_feed_registry"]()}
+    assert len(feeds) == len(app["DEFAULT_FEEDS"]) + 1
+    assert feeds["https://techcrunch.com/feed/"]["name"] == "Renamed"
+    path.write_text(json.dumps({"replace_defaults": True, "feeds": [{"url": "https://ft.com/rss", "category": "markets"}]}))
+    assert app["load_feed_registry"]() == [{"name": "News", "category": "markets", "url": "https://ft.com/rss"}]
+    assert app["feed_categories"]() == ["markets"]
+    path.write_text("not json")
+    assert len(app["load_feed_registry"]()) == len(app["DEFAULT_FEEDS"])
+
+
+def entries(n, start=0):
+    return [{"guid": f"g{start + i}", "title": f"Headline {start + i}", "source": "Feed", "domain": "feed.com",
+             "link": f"https://feed.com/{start + i}", "published": time.time() - i} for i in range(n)]
+
+
+def test_quiet_feeds_back_off_and_busy_ones_speed_up():
+    app = make_app(None)
+    scheduler = app["FeedScheduler"]()
+    quiet = scheduler._state({"name": "Quiet", "category": "all", "url": "https://quiet.example/rss"})
+    start = quiet["interval"]
+    for _ in range(3):
+        scheduler._record(quiet, [])
+    assert quiet["interval"] == pytest.approx(start * 1.5 ** 3)
+    for _ in range(10):
+        scheduler._record(quiet, [])
+    assert quiet["interval"] == app["FEED_MAX_INTERVAL"]
+    assert quiet["next_poll"] > time.time() + 0.8 * app["FEED_MAX_INTERVAL"]
+
+    busy = scheduler._state({"name": "Busy", "category": "all", "url": "https://busy.example/rss"})
+    scheduler._record(busy, entries(1))
+    busy["last_new_at"] -= 600                     # ten new entries over the last ten minutes
+    scheduler._record(busy, entries(10, start=1))
+    assert busy["gap"] == pytest.approx(60, rel=0.01)
+    assert busy["interval"] == app["FEED_MIN_INTERVAL"]
+    # The newer batch goes in front, in feed order
+    assert [i["guid"] for i in busy["items"]] == [f"g{i}" for i in range(1, 11)] + ["g0"] and len(busy["seen"]) == 11
+
+
+def test_poll_parses_only_new_entries(stub_server):
+    app = make_app(os.environ["NEWS_FEEDS_FILE"])
+    scheduler = app["FeedScheduler"]()
+    scheduler.poll_due()
+    first = {url: len(s["items"]) for url, s in scheduler.state.items()}
+    assert first and all(n == app["FEED_ITEMS_PER_FEED"] for n in first.values())
+    # Nothing is due again until each feed's interval has passed
+    scheduler._poll = lambda s: pytest.fail("polled a feed before it was due")
+    scheduler.poll_due()
+    del scheduler._poll
+    s = next(iter(scheduler.state.values()))
+    s["items"].clear()
+    scheduler._poll(s)
+    # Every entry was seen already: the parse stops early and nothing is added twice
+    assert len(s["items"]) <= 1 and all(i["guid"] in s["seen"] for i in s["items"])
+
+
+def test_snapshot_filters_and_orders_by_category(tmp_path):
+    path = tmp_path / "feeds.json"
+    path.write_text(json.dumps({"replace_defaults": True, "feeds": [
+        {"name": "A", "category": "world", "url": "https://a.example/rss"},
+        {"name": "B", "category": "world", "url": "https://b.example/rss"}]}))
+    app = make_app(str(path))
+    scheduler = app["FeedScheduler"]()
+    now = time.time()
+    a = scheduler._state({"name": "A", "category": "world", "url": "https://a.example/rss"})
+    b = scheduler._state({"name": "B", "category": "world", "url": "https://b.example/rss"})
+    a["items"].extend([{"guid": "1", "title": "Older", "source": "A", "domain": "a.example", "link": "", "published": now - 7200},
+                       {"guid": "2", "title": "China story", "source": "A", "domain": "a.example", "link": "", "published": now}])
+    b["items"].append({"guid": "3", "title": "Newer", "source": "B", "domain": None, "link": "", "published": now - 120})
+    snapshot = scheduler.snapshot()
+    assert [(i["title"], i["domain"], i["time"]) for i in snapshot["world"]] == [("Newer", "B", "2m ago"), ("Older", "a.example", "2h ago")]
@@ -0,0 +1,84 @@
+import datetime
+import email.utils
+import functools
+import hashlib
+import html
+import io
+import random
+import re
+import threading
+import time
+import types
+import urllib.parse
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from conftest import load_app_defs
+
+
+@pytest.fixture
+def app():
+    return load_app_defs(
+        "MINHASH_PERMUTATIONS", "MINHASH_BANDS", "MINHASH_THRESHOLD", "_MINHASH_PRIME", "_MINHASH_RNG", "_MINHASH_COEFFS",
+        "_HEADLINE_STOPWORDS", "normalize_headline", "minhash_headline", "_minhash_similarity", "HeadlineClusterIndex",
+        "get_headline_index", "cluster_headlines", "publisher_domain", "stream_feed_entries", "_xml_local", "_parse_feed_time",
+        st=types.SimpleNamespace(cache_resource=functools.cache), datetime=datetime, email=email, hashlib=hashlib,
+        html=html, random=random, re=re, threading=threading, time=time, urllib=urllib, ET=ET,
+    )
+
+
+def item(title, link, source="Feed", domain=None):
+    return {"title": title, "link": link, "source": source, "domain": domain}
+
+
+def test_near_duplicates_collapse_and_count_publishers(app):
+    items = [
+        item("Fed cuts interest rates by a quarter point as inflation cools", "https://www.reuters.com/a", "Reuters"),
+        item("Fed cuts interest rates by quarter point as inflation cools - Bloomberg", "https://bloomberg.com/b", "Bloomberg"),
+        item("Fed cuts interest rates by a quarter point as inflation cools", "https://reuters.com/c", "Reuters UK"),
+        item("Tesla deliveries beat estimates on strong demand", "https://cnbc.com/d", "CNBC"),
+    ]
+    result = app["cluster_headlines"](items)
+    assert [r["title"] for r in result] == [items[0]["title"], items[3]["title"]]
+    # Two Reuters editions are one publisher
+    assert [r["sources"] for r in result] == [2, 1]
+
+
+def test_aggregator_links_count_by_source_url(app):
+    rss = b"""<?xml version="1.0"?><rss version="2.0"><channel>
+    <item><title>Oil jumps as OPEC extends production cuts</title><link>https://news.google.com/rss/articles/1</link>
+      <guid>1</guid><source url="https://www.reuters.com">Reuters</source></item>
+    <item><title>Oil jumps as OPEC extends output cuts</title><link>https://news.google.com/rss/articles/2</link>
+      <guid>2</guid><source url="https://www.ft.com">Financial Times</source></item>
+    <item><title>Oil jumps as OPEC extends production cuts</title><link>https://www.wsj.com/oil</link><guid>3</guid></item>
+    </channel></rss>"""
+    resp = types.SimpleNamespace(raw=io.BytesIO(rss))
+    entries = app["stream_feed_entries"](resp, set(), "Google News")
+    assert [e["domain"] for e in entries] == ["reuters.com", "ft.com", "wsj.com"]
+    result = app["cluster_headlines"](entries)
+    assert len(result) == 1 and result[0]["sources"] == 3
+
+
+def test_wordless_headlines_are_never_merged(app):
+    assert app["minhash_headline"]("The | A") is None
+    items = [item("🔥🔥🔥", "https://a.com/1"), item("The", "https://b.com/2"), item("📈", "https://c.com/3")]
+    result = app["cluster_headlines"](items)
+    assert len(result) == 3 and all(r["sources"] == 1 for r in result)
+
+
+def test_preregistered_items_are_not_inserted_again(app):
+    index = app["get_headline_index"]()
+    items = [item("Bitcoin surges past $100k as ETF inflows climb", f"https://site{i}.com/btc", domain=f"site{i}.com") for i in range(3)]
+    ids = [index.add(i["title"], i["domain"], i["link"]) for i in items]
+    index.add = lambda *args: pytest.fail("cluster_headlines re-inserted a registered headline")
+    result = app["cluster_headlines"](items, ids)
+    assert len(result) == 1 and result[0]["sources"] == 3
+
+
+def test_repeat_polls_reuse_the_cluster(app):
+    index = app["HeadlineClusterIndex"]()
+    cid = index.add("SpaceX files confidentially for IPO, sources say", "reuters.com", "https://reuters.com/spacex")
+    assert index.add("SpaceX files confidentially for IPO, sources say", "reuters.com", "https://reuters.com/spacex") == cid
+    assert index.add("SpaceX files confidentially for an IPO, sources say", "ft.com", "https://ft.com/spacex") == cid
+    assert index.source_count(cid) == 2
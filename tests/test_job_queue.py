@@ -0,0 +1,106 @@
+import heapq
+import math
+import threading
+import time
+import types
+import uuid
+
+import pytest
+
+from conftest import load_app_defs
+
+
+class FakeAgent:
+    """Stands in for get_agent_response: records the order of calls, blocks until released."""
+    def __init__(self):
+        self.order = []
+        self.gate = threading.Event()
+        self.recorded = []
+
+    def __call__(self, history, market_data, deadline=None, on_progress=None):
+        self.order.append(history[0]["content"])
+        on_progress("fact_check", "- [Source](https://example.com)")
+        self.gate.wait(5)
+        return f"memo for {history[0]['content']}"
+
+
+@pytest.fixture
+def make_queue():
+    agent = FakeAgent()
+    ns = load_app_defs(
+        "ANALYSIS_ABANDON_AFTER", "PRIORITY_FOLLOW_UP", "PRIORITY_ANALYSIS", "PRIORITY_SPECULATIVE", "Deadline",
+        "AnalysisJob", "AnalysisJobQueue",
+        ANALYSIS_WORKERS=1, ANALYSIS_QUEUE_LIMIT=32, ANALYSIS_DEADLINE=60, heapq=heapq, math=math, threading=threading,
+        time=time, uuid=uuid, log_debug=lambda message: None, get_agent_response=agent,
+        get_analysis_history=lambda: types.SimpleNamespace(record=lambda *args: agent.recorded.append(args)),
+    )
+    ns["agent"] = agent
+    yield lambda **kwargs: (ns["AnalysisJobQueue"](**kwargs), ns)
+    agent.gate.set()
+
+
+def ask(text):
+    return [{"role": "user", "content": text}]
+
+
+def wait_for(predicate):
+    for _ in range(250):
+        if predicate(): return
+        time.sleep(0.02)
+    raise AssertionError("condition not reached")
+
+
+def test_jobs_run_by_priority_then_arrival(make_queue):
+    queue, app = make_queue(workers=1)
+    agent = app["agent"]
+    blocker = queue.submit("s0", ask("first"), {})
+    wait_for(lambda: blocker.status == "running")
+    speculative = queue.submit("s1", ask("speculative"), {}, app["PRIORITY_SPECULATIVE"])
+    analysis = queue.submit("s2", ask("analysis"), {}, app["PRIORITY_ANALYSIS"])
+    follow_up = queue.submit("s3", ask("follow-up"), {}, app["PRIORITY_FOLLOW_UP"])
+    assert [queue.position(j) for j in (follow_up, analysis, speculative)] == [1, 2, 3]
+    assert queue.position(blocker) == 0
+    agent.gate.set()
+    wait_for(lambda: speculative.status == "done")
+    assert agent.order == ["first", "follow-up", "analysis", "speculative"]
+    # Finished memos are recorded in the history, except speculative ones
+    assert [r[0][0]["content"] for r in agent.recorded] == ["first", "follow-up", "analysis"]
+    assert queue.collect(analysis.id).result == "memo for analysis" and queue.collect(analysis.id) is None
+    assert queue.stats()["completed"] == 4 and queue.service_time > 0
+
+
+def test_full_queue_refuses_new_jobs(make_queue):
+    queue, app = make_queue(workers=1, max_queued=1)
+    blocker = queue.submit("s0", ask("first"), {})
+    wait_for(lambda: blocker.status == "running")
+    assert queue.submit("s1", ask("queued"), {}) is not None
+    assert queue.submit("s2", ask("refused"), {}) is None
+    assert queue.stats()["rejected"] == 1 and queue.queued() == 1
+
+
+def test_resubmitting_cancels_the_sessions_live_job(make_queue):
+    queue, app = make_queue(workers=1)
+    blocker = queue.submit("s0", ask("first"), {})
+    wait_for(lambda: blocker.status == "running")
+    old = queue.submit("s1", ask("old question"), {})
+    new = queue.submit("s1", ask("new question"), {})
+    assert old.status == "cancelled" and queue.by_session["s1"] == new.id and queue.queued() == 1
+    # A running job that is cancelled finishes, but its result is dropped
+    queue.cancel_session("s0")
+    app["agent"].gate.set()
+    wait_for(lambda: new.status == "done")
+    assert blocker.result is None and "old question" not in app["agent"].order
+
+
+def test_abandoned_jobs_are_dropped_unstarted(make_queue):
+    queue, app = make_queue(workers=1, abandon_after=0.2)
+    blocker = queue.submit("s0", ask("first"), {})
+    wait_for(lambda: blocker.status == "running")
+    watched = queue.submit("s1", ask("watched"), {})
+    abandoned = queue.submit("s2", ask("abandoned"), {})
+    time.sleep(0.3)
+    queue.get(watched.id)                         # its page is still polling
+    app["agent"].gate.set()
+    wait_for(lambda: watched.status == "done")
+    wait_for(lambda: abandoned.status == "cancelled")
+    assert "abandoned" not in app["agent"].order and abandoned.id not in queue.jobs
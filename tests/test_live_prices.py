@@ -0,0 +1,76 @@
+import collections
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+import pytest
+import requests
+
+from conftest import load_app_defs, set_topic_prices
+
+
+@pytest.fixture
+def app(stub_server):
+    return load_app_defs(
+        "LIVE_POLL_INTERVAL", "LIVE_WATCH_TTL", "LIVE_BATCH_SIZE", "LIVE_STALE_AFTER", "LivePriceTable", "build_sub_market",
+        GAMMA_API_BASE=os.environ["GAMMA_API_BASE"], collections=collections, json=json, threading=threading,
+        time=time, urllib=urllib, requests=requests,
+    )
+
+
+@pytest.fixture
+def table(app):
+    table = app["LivePriceTable"]()
+    table._thread = threading.current_thread()     # polled by hand below, not by the background thread
+    return table
+
+
+@pytest.fixture
+def market(stub_server):
+    """A processed market (main + two sub-markets) of the stub's Election topic, snapshot at 50/50."""
+    event = next(e for e in stub_server.catalog.events if e["title"].startswith("Election:") and len(e["markets"]) >= 2)
+    subs = [{"id": m["id"], "question": m["question"], "volume": 1.0, "type": "binary", "options": [],
+             "yes_price": 50.0, "no_price": 50.0, "top_option": "Yes", "top_price": 0.5} for m in event["markets"][:2]]
+    return {"market_id": subs[0]["id"], "probability": 0.5, "markets": subs}
+
+
+def poll(table):
+    table._poll(table._due())
+
+
+def test_overlay_serves_polled_prices(stub_server, table, market):
+    set_topic_prices(stub_server, "Election", yes=0.8)
+    table.watch([market["market_id"]] + [sm["id"] for sm in market["markets"]])
+    poll(table)
+    live = table.overlay(market)
+    assert [sm["yes_price"] for sm in live["markets"]] == pytest.approx([80.0, 80.0])
+    assert live["probability"] == pytest.approx(0.8) and live["live_updated_at"]
+    assert market["markets"][0]["yes_price"] == 50.0      # the snapshot itself is untouched
+
+
+def test_lapsed_watch_takes_its_price_along(stub_server, app, table, market):
+    set_topic_prices(stub_server, "Election", yes=0.8)
+    ids = [sm["id"] for sm in market["markets"]]
+    table.watch(ids)
+    poll(table)
+    table.watched[ids[1]] -= app["LIVE_WATCH_TTL"]
+    poll(table)
+    assert ids[1] not in table.prices and table.get(ids[1]) is None
+    live = table.overlay(market)
+    assert [sm["yes_price"] for sm in live["markets"]] == pytest.approx([80.0, 50.0])
+
+
+def test_unconfirmed_prices_are_not_served(stub_server, app, table, market):
+    set_topic_prices(stub_server, "Election", yes=0.8)
+    mid = market["markets"][0]["id"]
+    table.watch([mid])
+    poll(table)
+    table.prices[mid]["polled_at"] -= app["LIVE_STALE_AFTER"]
+    assert table.get(mid) is None
+    assert table.overlay(market)["markets"][0]["yes_price"] == 50.0
+    # A poll that finds the price unchanged confirms it again (without counting as a change)
+    version = table.version
+    poll(table)
+    assert table.get(mid)["prices"] == pytest.approx([0.8, 0.2]) and table.version == version
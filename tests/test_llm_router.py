@@ -0,0 +1,67 @@
+import collections
+import concurrent.futures
+import time
+
+import pytest
+
+from conftest import load_app_defs
+
+
+class FakeProvider:
+    def __init__(self, name, delay=0.0, text=None, error=None):
+        self.name, self.delay, self.text, self.error = name, delay, text, error
+        self.calls = []
+
+    def generate(self, messages, timeout):
+        self.calls.append(timeout)
+        time.sleep(self.delay)
+        if self.error: raise self.error
+        return self.text
+
+
+@pytest.fixture
+def router():
+    ns = load_app_defs("LLMRouter", collections=collections, concurrent=concurrent, time=time)
+    return lambda *providers, **kwargs: ns["LLMRouter"](list(providers), **kwargs)
+
+
+MESSAGES = [{"role": "user", "content": "Analyze this news: Fed cuts rates"}]
+
+
+def test_fast_primary_is_not_hedged(router):
+    primary, backup = FakeProvider("gemini", text="memo A"), FakeProvider("openai", text="memo B")
+    r = router(primary, backup, hedge_after=1.0)
+    assert r.generate(MESSAGES) == "memo A"
+    assert backup.calls == [] and r.hedges == 0 and r.wins == {"gemini": 1}
+
+
+def test_slow_primary_is_hedged_and_the_first_answer_wins(router):
+    primary, backup = FakeProvider("gemini", delay=2.0, text="memo A"), FakeProvider("openai", text="memo B")
+    r = router(primary, backup, hedge_after=0.2)
+    start = time.monotonic()
+    assert r.generate(MESSAGES) == "memo B"
+    assert 0.2 <= time.monotonic() - start < 1.0
+    assert r.hedges == 1 and r.wins == {"openai": 1}
+    # The backup only gets what is left of the deadline
+    assert backup.calls[0] < primary.calls[0]
+
+
+def test_failures_fall_through_immediately(router):
+    primary = FakeProvider("gemini", error=RuntimeError("quota"))
+    empty = FakeProvider("openai", text="")
+    last = FakeProvider("local", text="memo C")
+    r = router(primary, empty, last, hedge_after=5.0)
+    start = time.monotonic()
+    assert r.generate(MESSAGES) == "memo C"
+    assert time.monotonic() - start < 1.0 and r.hedges == 0
+
+
+def test_last_error_or_timeout_is_raised(router):
+    r = router(FakeProvider("gemini", error=RuntimeError("quota")), FakeProvider("openai", error=ValueError("bad key")))
+    with pytest.raises(ValueError, match="bad key"):
+        r.generate(MESSAGES)
+    r = router(FakeProvider("gemini", delay=1.0, text="too late"), hedge_after=0.1)
+    with pytest.raises(TimeoutError):
+        r.generate(MESSAGES, deadline=0.3)
+    with pytest.raises(RuntimeError, match="No LLM provider"):
+        router().generate(MESSAGES)
@@ -0,0 +1,32 @@
+import argparse
+import time
+
+import pytest
+import requests
+
+from loadtest import parse_upstream
+from upstream_stubs import UpstreamProfile, start_stub_server
+
+
+def test_upstream_specs_parse_into_profiles():
+    name, profile = parse_upstream("gemini:latency=2,error=0.1,jitter=0.3")
+    assert name == "gemini" and profile == UpstreamProfile(latency=2.0, jitter=0.3, error_rate=0.1)
+    assert parse_upstream("rss") == ("rss", UpstreamProfile())
+    with pytest.raises(argparse.ArgumentTypeError, match="unknown upstream"):
+        parse_upstream("twitter:latency=1")
+    with pytest.raises(argparse.ArgumentTypeError, match="unknown option"):
+        parse_upstream("gamma:timeout=1")
+
+
+def test_profiles_inject_latency_and_errors():
+    server, base = start_stub_server(n_events=10, profiles={
+        "binance": UpstreamProfile(latency=0.3, jitter=0.0), "exa": UpstreamProfile(latency=0.0, error_rate=1.0)})
+    try:
+        start = time.monotonic()
+        assert requests.get(f"{base}/binance/api/v3/ticker/24hr", timeout=5).ok
+        assert time.monotonic() - start >= 0.3
+        assert requests.post(f"{base}/exa/search", json={"query": "fed"}, timeout=5).status_code == 503
+        events = requests.get(f"{base}/gamma/events", params={"limit": 3}, timeout=5).json()
+        assert len(events) == 3 and all(e["markets"] for e in events)
+    finally:
+        server.shutdown()
@@ -0,0 +1,63 @@
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from conftest import load_app_defs
+
+
+@pytest.fixture
+def app():
+    return load_app_defs(
+        "_HEADLINE_STOPWORDS", "normalize_headline", "MATCH_DIM", "MATCH_TOP_K", "MATCH_MIN_SCORE", "_MATCH_STOPWORDS",
+        "match_vector", "HeadlineMarketMatcher", hashlib=hashlib, np=np, re=re, threading=threading,
+    )
+
+
+MARKETS = [
+    {"slug": "fed-cut-december", "title": "Fed decision in December?", "questions": ["Will the Fed cut interest rates in December?"]},
+    {"slug": "bitcoin-100k", "title": "Bitcoin above $100k?", "questions": ["Will Bitcoin reach $100k by year end?"]},
+    {"slug": "spacex-ipo", "title": "SpaceX IPO in 2026?", "questions": ["Will SpaceX go public?"]},
+]
+HEADLINES = ["Fed signals it will cut interest rates next month - Reuters", "Bitcoin rallies toward $100k as ETF inflows climb",
+             "Local bakery wins pie contest"]
+
+
+def test_headlines_match_their_market(app):
+    matcher = app["HeadlineMarketMatcher"]()
+    matcher.update(HEADLINES, MARKETS)
+    assert matcher.lookup(HEADLINES[0])[0]["slug"] == "fed-cut-december"
+    assert matcher.lookup(HEADLINES[1])[0]["slug"] == "bitcoin-100k"
+    assert matcher.lookup(HEADLINES[2]) == []
+    assert matcher.lookup("Never seen headline") == []
+    top = matcher.lookup(HEADLINES[0])
+    assert top[0]["match_score"] >= app["MATCH_MIN_SCORE"] and len(top) <= app["MATCH_TOP_K"]
+
+
+def test_incremental_updates_equal_a_full_rebuild(app):
+    matcher = app["HeadlineMarketMatcher"]()
+    matcher.update(HEADLINES[:2], MARKETS[:2])
+    matcher.update(HEADLINES[1:], MARKETS[1:])          # one row and one column dropped, one of each added
+    fresh = app["HeadlineMarketMatcher"]()
+    fresh.update(HEADLINES[1:], MARKETS[1:])
+    assert matcher.S.shape == (2, 2)
+    for h in HEADLINES[1:]:
+        assert [(m["slug"], pytest.approx(m["match_score"])) for m in matcher.lookup(h)] == \
+               [(m["slug"], m["match_score"]) for m in fresh.lookup(h)]
+    assert matcher.lookup(HEADLINES[0]) == []
+    assert all(m["slug"] != "fed-cut-december" for h in HEADLINES for m in matcher.lookup(h))
+
+
+def test_refresh_runs_once_per_version(app):
+    matcher = app["HeadlineMarketMatcher"]()
+    matcher.refresh_async("v1", HEADLINES, MARKETS)
+    for _ in range(100):
+        if matcher.version == "v1": break
+        time.sleep(0.02)
+    assert matcher.lookup(HEADLINES[0])[0]["slug"] == "fed-cut-december"
+    matcher.update = lambda *args: pytest.fail("rescored an unchanged snapshot")
+    matcher.refresh_async("v1", HEADLINES, MARKETS)
+    time.sleep(0.05)
@@ -0,0 +1,80 @@
+import collections
+import datetime
+import email.utils
+import hashlib
+import html
+import io
+import json
+import sqlite3
+import threading
+import time
+import urllib.parse
+import xml.etree.ElementTree as ET
+import zlib
+
+import pytest
+import requests
+import urllib3
+
+from conftest import load_app_defs
+
+
+@pytest.fixture
+def net(stub_server, tmp_path):
+    """The record/replay layer installed on requests, removed again afterwards."""
+    ns = load_app_defs(
+        "exchange_key", "NetArchive", "_rebuild_response", "_TeeRaw", "_tee_stream", "install_http_archive",
+        "stream_feed_entries", "publisher_domain", "_xml_local", "_parse_feed_time",
+        collections=collections, datetime=datetime, email=email, html=html, ET=ET, hashlib=hashlib, io=io, json=json, sqlite3=sqlite3, threading=threading,
+        time=time, urllib=urllib, zlib=zlib, requests=requests, urllib3=urllib3, NET_MODE="record",
+    )
+    ns["archive"] = ns["NetArchive"](str(tmp_path / "archive.sqlite3"), time_scale=0)
+    ns["install_http_archive"](ns["archive"])
+    ns["base"] = f"http://127.0.0.1:{stub_server.server_address[1]}"
+    ns["url"] = ns["base"] + "/article/1"
+    yield ns
+    adapter = requests.adapters.HTTPAdapter
+    adapter.send = adapter._live_send
+    del adapter._live_send, adapter._net_archive
+
+
+def test_streamed_response_is_recorded_as_read(net):
+    live = requests.get(net["url"]).content
+    with requests.get(net["url"], stream=True) as resp:
+        assert net["archive"].recorded == 1      # the body is only read (and recorded) as the caller streams it
+        streamed = b"".join(resp.iter_content(1024))
+    assert streamed == live
+    assert net["archive"].recorded == 2
+
+    net["NET_MODE"] = "replay"
+    assert requests.get(net["url"]).content == live
+    with requests.get(net["url"], stream=True) as resp:
+        assert b"".join(resp.iter_content(1024)) == live
+
+
+def test_abandoned_stream_records_the_prefix_read(net):
+    with requests.get(net["url"], stream=True) as resp:
+        first = next(resp.iter_content(100))
+    assert net["archive"].recorded == 1
+
+    net["NET_MODE"] = "replay"
+    assert requests.get(net["url"]).content == first
+
+
+def test_streamed_text_decoding(net):
+    with requests.get(net["url"], stream=True) as resp:
+        resp.encoding = "utf-8"
+        text = "".join(resp.iter_content(64, decode_unicode=True))
+    assert text.startswith("<html>") and net["archive"].recorded == 1
+
+
+def test_rss_poll_read_through_raw_is_recorded(net):
+    url = net["base"] + "/rss/all.xml"
+    with requests.get(url, stream=True) as resp:
+        live = net["stream_feed_entries"](resp, {}, "Stub")
+    assert len(live) == 30 and net["archive"].recorded == 1
+
+    net["NET_MODE"] = "replay"
+    with requests.get(url, stream=True) as resp:
+        replayed = net["stream_feed_entries"](resp, {}, "Stub")
+    assert [i["guid"] for i in replayed] == [i["guid"] for i in live]
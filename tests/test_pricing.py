@@ -0,0 +1,88 @@
+import math
+
+import pytest
+
+from conftest import load_app_defs
+
+
+@pytest.fixture
+def app():
+    return load_app_defs(
+        "PRICING_MAX_ROWS", "EV_PROBABILITY_OFFSETS", "EV_TARGET_EDGE", "implied_odds", "outcome_prices",
+        "liquidity_confidence", "price_market", "pricing_table", math=math,
+    )
+
+
+def binary(question, yes, no, volume=1.0):
+    return {"question": question, "type": "binary", "yes_price": yes, "no_price": no, "volume": volume, "options": []}
+
+
+def ev_row(pricing, q):
+    return next(r for r in pricing["ev"] if r["q"] == pytest.approx(q))
+
+
+def test_implied_odds_for_favourites_and_underdogs(app):
+    decimal, american = app["implied_odds"](0.8)
+    assert decimal == pytest.approx(1.25) and american == pytest.approx(-400)
+    decimal, american = app["implied_odds"](0.25)
+    assert decimal == pytest.approx(4.0) and american == pytest.approx(300)
+    assert app["implied_odds"](0.5)[1] == pytest.approx(-100)
+    assert app["implied_odds"](0) == (None, None) and app["implied_odds"](1) == (None, None)
+
+
+def test_liquidity_confidence_is_log_linear(app):
+    confidence = app["liquidity_confidence"]
+    assert confidence(0) == 0 and confidence(1_000) == 0
+    assert confidence(31_623) == pytest.approx(0.5, abs=1e-3)
+    assert confidence(1_000_000) == 1 and confidence(50_000_000) == 1
+
+
+def test_ev_against_uses_the_other_sides_own_price(app):
+    # Overround book: Yes 60¢ + No 45¢ = 105¢, so buying No costs 45¢, not 40¢
+    market = {"liquidity": 1_000_000, "markets": [binary("Fed cut in December?", 60.0, 45.0)]}
+    pricing = app["price_market"](market)
+    assert (pricing["outcome"], pricing["against"]) == ("Yes", "No")
+    assert pricing["against_price"] == pytest.approx(0.45) and pricing["confidence"] == 1
+    row = ev_row(pricing, 0.40)
+    assert row["ev_for"] == pytest.approx(0.40 / 0.60 - 1)
+    assert row["ev_against"] == pytest.approx(0.60 / 0.45 - 1)
+    assert row["side"] == "No"
+    # Kelly on a 45¢ share with a 60% win chance: (0.60 - 0.45) / (1 - 0.45)
+    assert row["kelly_adj"] == pytest.approx(0.15 / 0.55)
+    assert row["max_entry_against"] == pytest.approx(0.60 / 1.10)
+    row = ev_row(pricing, 0.80)
+    assert row["side"] == "Yes" and row["kelly_adj"] == pytest.approx(0.20 / 0.40)
+    assert row["max_entry_for"] == pytest.approx(0.80 / 1.10)
+
+
+def test_no_edge_means_no_side(app):
+    market = {"liquidity": 1_000_000, "markets": [binary("Fed cut in December?", 60.0, 45.0)]}
+    row = ev_row(app["price_market"](market), 0.60)
+    # At the market's own price Yes breaks even and No, at 45¢ for a 40% chance, loses
+    assert row["ev_for"] == pytest.approx(0) and row["ev_against"] < 0
+    assert row["side"] is None and row["kelly_adj"] == 0
+
+
+def test_kelly_scales_with_liquidity(app):
+    thin = {"liquidity": 31_623, "markets": [binary("Fed cut in December?", 50.0, 50.0)]}
+    row = ev_row(app["price_market"](thin), 0.70)
+    assert row["side"] == "Yes" and row["kelly_adj"] == pytest.approx(0.4 * 0.5, abs=1e-3)
+
+
+def test_multi_outcome_market_has_no_against_side(app):
+    options = [{"option": name, "price": price} for name, price in [("Trump", 55.0), ("Harris", 40.0), ("Other", 6.0)]]
+    market = {"liquidity": 1_000_000, "markets": [{"question": "Who wins?", "type": "multiple", "options": options}]}
+    pricing = app["price_market"](market)
+    assert pricing["against"] is None and pricing["against_price"] is None
+    assert all(r["ev_against"] is None and r["max_entry_against"] is None for r in pricing["ev"])
+    [sub] = pricing["sub_markets"]
+    assert sub["spread_pp"] == pytest.approx(15.0) and sub["overround_pp"] == pytest.approx(1.0)
+
+
+def test_table_quotes_both_prices(app):
+    market = {"liquidity": 1_000_000, "markets": [binary("Fed cut in December?", 60.0, 45.0)]}
+    table = app["pricing_table"](market, is_cn=False)
+    assert "'Yes' trades at 60.0¢, 'No' at 45.0¢" in table
+    assert "| Fed cut in December? | Yes | 60.0¢ | 1.67 / -150 | 15.0pp | +5.0pp |" in table
+    assert "| 40% | -33% | +33% | No | 27.3% | 36.4¢ | 54.5¢ |" in table
+    assert app["pricing_table"]({"markets": []}) == ""
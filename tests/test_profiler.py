@@ -0,0 +1,75 @@
+import collections
+import datetime
+import functools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import types
+import uuid
+
+from conftest import load_app_defs
+
+
+def make_app(tmp_path, on_request, keep=3):
+    st = types.SimpleNamespace(cache_resource=functools.cache, query_params={"profile": "1"})
+    return load_app_defs(
+        "PROFILE_INTERVAL", "PROFILE_MAX_SECONDS", "get_profile_store", "RerunProfiler", "prune_profiles", "maybe_profile",
+        st=st, PROFILE_SAMPLE_RATE=0, PROFILE_ON_REQUEST=on_request, PROFILE_DIR=str(tmp_path), PROFILE_KEEP=keep,
+        collections=collections, datetime=datetime, json=json, os=os, random=random, re=re, sys=sys,
+        threading=threading, time=time, uuid=uuid,
+    )
+
+
+def busy_rerun(app):
+    app["maybe_profile"]("rerun")
+    end = time.perf_counter() + 0.05
+    while time.perf_counter() < end:
+        pass
+
+
+def wait_finished(store, count=1):
+    for _ in range(100):
+        if len(store["finished"]) >= count: return
+        time.sleep(0.02)
+    raise AssertionError("profiler did not finish")
+
+
+def test_profile_param_ignored_unless_enabled(tmp_path):
+    app = make_app(tmp_path, on_request=False)
+    busy_rerun(app)
+    time.sleep(0.05)
+    store = app["get_profile_store"]()
+    assert not store["active"] and not store["finished"]
+    assert not os.listdir(tmp_path)
+
+
+def test_profile_param_exports_flame_graph(tmp_path):
+    app = make_app(tmp_path, on_request=True)
+    busy_rerun(app)
+    store = app["get_profile_store"]()
+    wait_finished(store)
+    last = store["finished"][-1]
+    assert last["label"] == "rerun" and last["wall_ms"] > 0
+    assert any(row["function"].startswith("busy_rerun") for row in last["summary"])
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(last["files"]) + ext for ext in (".folded", ".speedscope.json")])
+
+
+def test_only_the_newest_profiles_are_kept(tmp_path):
+    app = make_app(tmp_path, on_request=True, keep=2)
+    for stamp in ["20261001-000000", "20261002-000000", "20261003-000000"]:
+        for ext in (".folded", ".speedscope.json"):
+            (tmp_path / f"{stamp}-rerun-abc123{ext}").write_text("x")
+    (tmp_path / "notes.txt").write_text("not a profile")
+    app["prune_profiles"](str(tmp_path), 2)
+    assert sorted(os.listdir(tmp_path)) == ["20261002-000000-rerun-abc123.folded", "20261002-000000-rerun-abc123.speedscope.json",
+                                            "20261003-000000-rerun-abc123.folded", "20261003-000000-rerun-abc123.speedscope.json",
+                                            "notes.txt"]
+    # Exports prune too: the new profile displaces the oldest one left
+    busy_rerun(app)
+    wait_finished(app["get_profile_store"]())
+    assert not any(name.startswith("20261002") for name in os.listdir(tmp_path))
+    assert len([n for n in os.listdir(tmp_path) if n.endswith(".folded")]) == 2
@@ -0,0 +1,90 @@
+import collections
+import json
+import random
+import sqlite3
+import threading
+import time
+import types
+import zlib
+
+import pytest
+
+from conftest import load_app_defs
+
+
+def market(slug):
+    return {"slug": slug, "title": slug.replace("-", " ").title(), "markets": [{"question": "?"}]}
+
+
+@pytest.fixture
+def app(tmp_path):
+    store_box = {}
+    ns = load_app_defs(
+        "CHAT_HISTORY_LIMIT", "DEBUG_LOG_LIMIT", "SESSION_IDLE_TIMEOUT", "MARKET_STORE_MAX", "MarketStore", "TranscriptSpill",
+        "compact_session", "release_if_idle",
+        collections=collections, json=json, random=random, sqlite3=sqlite3, threading=threading, time=time, zlib=zlib,
+        get_market_store=lambda: store_box["store"], get_transcript_spill=lambda: store_box["spill"],
+    )
+    store_box.update(store=ns["MarketStore"](max_entries=2), spill=ns["TranscriptSpill"](str(tmp_path / "spill.sqlite3")))
+    ns.update(store_box)
+    return ns
+
+
+def session(app, sid="s1", messages=None):
+    state = types.SimpleNamespace(session_id=sid, messages=messages or [], debug_logs=[], parked=False, archived_turns=0,
+                                  last_active=time.time(), current_market_slug=None, search_candidates=[])
+    app["st"] = types.SimpleNamespace(session_state=state)
+    return state
+
+
+def test_store_shares_one_copy_and_evicts_unreferenced_first(app):
+    store = app["store"]
+    fed = market("fed-cut")
+    assert store.put(fed, "s1") == "fed-cut" and store.put(dict(fed), "s2") == "fed-cut"
+    store.put(market("oil-90"))
+    store.put(market("btc-100k"))
+    # Over the bound: the unreferenced LRU entry goes, the referenced one stays
+    assert list(store.markets) == ["fed-cut", "btc-100k"]
+    assert store.refs["fed-cut"] == {"s1", "s2"}
+    store.release("s1")
+    assert store.refs["fed-cut"] == {"s2"}
+    store.release("s2")
+    assert "fed-cut" not in store.refs
+    assert store.put({"title": "no slug"}) is None
+
+
+def test_referenced_markets_are_kept_up_to_twice_the_bound(app):
+    store = app["store"]
+    for i in range(6):
+        store.put(market(f"m{i}"), "s1")
+    assert list(store.markets) == ["m2", "m3", "m4", "m5"]
+
+
+def test_long_chats_spill_their_middle_turns(app):
+    opening = {"role": "user", "content": "Analyze this news: Fed cuts rates"}
+    turns = [{"role": "assistant" if i % 2 else "user", "content": f"turn {i}"} for i in range(1, 20)]
+    state = session(app, messages=[opening] + turns)
+    state.debug_logs = [f"log {i}" for i in range(80)]
+    app["compact_session"]()
+    limit = app["CHAT_HISTORY_LIMIT"]
+    assert len(state.messages) == limit and state.messages[0] == opening and state.messages[-1] == turns[-1]
+    assert state.archived_turns == 20 - limit
+    assert app["spill"].load("s1", "turns") == turns[:20 - limit]
+    assert len(state.debug_logs) == app["DEBUG_LOG_LIMIT"] and state.debug_logs[-1] == "log 79"
+
+
+def test_idle_sessions_are_parked_and_restored(app):
+    store = app["store"]
+    messages = [{"role": "user", "content": "Analyze this news: Oil jumps"}, {"role": "assistant", "content": "memo"}]
+    state = session(app, messages=list(messages))
+    state.current_market_slug = store.put(market("oil-90"), "s1")
+    state.search_candidates = [store.put(market("fed-cut"), "s1")]
+    app["release_if_idle"]()
+    assert not state.parked                       # still active
+    state.last_active -= app["SESSION_IDLE_TIMEOUT"]
+    app["release_if_idle"]()
+    assert state.parked and state.messages == [] and not store.refs
+    app["compact_session"]()
+    assert not state.parked and state.messages == messages
+    assert store.refs == {"oil-90": {"s1"}, "fed-cut": {"s1"}}
+    assert app["spill"].load("s1", "parked") == []
@@ -0,0 +1,82 @@
+import functools
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+import types
+
+import pytest
+
+from conftest import load_app_defs
+
+
+def replica(path, replica_id):
+    """One replica's view of the shared SQLite file (each replica has its own REPLICA_ID)."""
+    ns = load_app_defs(
+        "SharedCacheBackend", "SQLiteSharedCache", "shared_cache",
+        REPLICA_ID=replica_id, functools=functools, hashlib=hashlib, json=json, random=random,
+        sqlite3=sqlite3, threading=threading, time=time,
+    )
+    cache = ns["SQLiteSharedCache"](path)
+    ns["get_shared_cache"] = lambda: cache
+    return types.SimpleNamespace(cache=cache, shared_cache=ns["shared_cache"])
+
+
+@pytest.fixture
+def replicas(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    return replica(path, "a"), replica(path, "b")
+
+
+def test_fresh_entries_are_shared_across_replicas(replicas):
+    a, b = replicas
+    calls = []
+    loader = lambda: calls.append(1) or {"events": [1, 2]}
+    assert a.cache.get_or_refresh("catalog", loader, ttl=60) == {"events": [1, 2]}
+    assert b.cache.get_or_refresh("catalog", loader, ttl=60) == {"events": [1, 2]}
+    assert len(calls) == 1
+
+
+def test_stale_copy_is_served_while_another_replica_refreshes(replicas):
+    a, b = replicas
+    a.cache.set("news", ["old"], ttl=-1, stale_ttl=600)
+    assert a.cache.acquire_lease("lease:news", 30)
+    assert b.cache.get_or_refresh("news", lambda: pytest.fail("b refreshed without the lease"), ttl=60) == ["old"]
+    # Once the holder releases the lease, the next stale read refreshes
+    a.cache.release_lease("lease:news")
+    assert b.cache.get_or_refresh("news", lambda: ["new"], ttl=60) == ["new"]
+    assert a.cache.get("news")[0] == ["new"]
+
+
+def test_cold_key_waits_for_the_lease_holder(replicas):
+    a, b = replicas
+    assert a.cache.acquire_lease("lease:quotes", 30)
+    threading.Timer(0.3, lambda: a.cache.set("quotes", {"BTC": 1}, ttl=60)).start()
+    assert b.cache.get_or_refresh("quotes", lambda: pytest.fail("b loaded a key a was publishing"), ttl=60, wait=3) == {"BTC": 1}
+    # A holder that never publishes: b gives up waiting and loads it itself
+    assert a.cache.acquire_lease("lease:other", 30)
+    assert b.cache.get_or_refresh("other", lambda: "local", ttl=60, wait=0.3) == "local"
+
+
+def test_uncacheable_results_are_not_stored(replicas):
+    a, _ = replicas
+    assert a.cache.get_or_refresh("catalog", lambda: {"events": []}, ttl=60, cacheable=lambda v: bool(v["events"])) == {"events": []}
+    assert a.cache.get("catalog") is None
+    assert a.cache.acquire_lease("lease:catalog", 30)          # and the lease was released
+
+
+def test_decorator_keys_on_arguments_minus_ignored_kwargs(replicas):
+    a, _ = replicas
+    calls = []
+
+    @a.shared_cache("gamma", ttl=60, ignore=("timeout",))
+    def fetch(url, timeout=10):
+        calls.append((url, timeout))
+        return {"url": url}
+
+    assert fetch("/events", timeout=3) == {"url": "/events"}
+    assert fetch("/events", timeout=9) == {"url": "/events"}
+    assert fetch("/markets", timeout=3) == {"url": "/markets"}
+    assert calls == [("/events", 3), ("/markets", 3)]
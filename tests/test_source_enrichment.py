@@ -0,0 +1,112 @@
+import codecs
+import collections
+import functools
+import re
+import threading
+import time
+import types
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from conftest import load_app_defs
+
+ARTICLE = """<html><head><title>Fed</title>{meta}<script>var x = "ignore me";</script></head>
+<body><nav>Home | Markets | Politics | Sign in</nav>
+<article><h1>Fed cuts rates</h1>
+<p>The Federal Reserve cut its benchmark interest rate by a quarter point on Wednesday, citing cooling inflation.</p>
+<p>Officials in Zürich and São Paulo said the move was widely expected by markets and economists alike.</p>
+<p>Separately, the weather in the capital was mild for the season, with light winds and scattered clouds.</p>
+</article><footer>Copyright 2026 News Corp. All rights reserved worldwide by everyone everywhere.</footer></body></html>"""
+
+PAGES = {
+    "/header-utf8": ("text/html; charset=utf-8", ARTICLE.format(meta="").encode("utf-8")),
+    "/bare-utf8": ("text/html", ARTICLE.format(meta="").encode("utf-8")),
+    "/meta-latin1": ("text/html", ARTICLE.format(meta='<meta charset="iso-8859-1">').encode("latin-1")),
+    "/pdf": ("application/pdf", b"%PDF-1.4"),
+}
+
+
+@pytest.fixture(scope="module")
+def pages():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            content_type, body = PAGES.get(self.path, ("text/html", b""))
+            self.send_response(200 if self.path in PAGES else 404)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def app():
+    return load_app_defs(
+        "ENRICH_TIMEOUT", "ENRICH_MAX_PAGE_BYTES", "CONTENT_CACHE_BYTES", "CONTENT_FAILURE_TTL", "PASSAGE_CHARS",
+        "_HEADLINE_STOPWORDS", "ContentCache", "get_content_cache", "_MainTextExtractor", "extract_main_text",
+        "_META_CHARSET", "page_encoding", "fetch_article_text", "key_passages", "fact_check_cacheable",
+        st=types.SimpleNamespace(cache_resource=functools.cache), HTMLParser=HTMLParser, re=re, codecs=codecs,
+        collections=collections, threading=threading, time=time, requests=requests,
+    )
+
+
+def test_extract_main_text_keeps_body_copy(app):
+    text = app["extract_main_text"](ARTICLE.format(meta=""))
+    assert text.splitlines()[0].startswith("The Federal Reserve cut")
+    assert "ignore me" not in text and "Sign in" not in text and "Copyright" not in text
+    # Short pages have no sentence-length blocks: everything readable is kept
+    assert app["extract_main_text"]("<p>Short note</p><p>Another</p>") == "Short note\nAnother"
+
+
+def test_key_passages_prefers_sentences_matching_the_query(app):
+    text = app["extract_main_text"](ARTICLE.format(meta=""))
+    passage = app["key_passages"](text, "Analyze this news: Federal Reserve cuts interest rate")
+    assert passage.startswith("The Federal Reserve cut") and "weather" not in passage
+    # Nothing matches: the lead stands in, cut to max_chars on a word boundary
+    lead = app["key_passages"](text, "bitcoin halving", max_chars=60)
+    assert lead.startswith("The Federal Reserve") and lead.endswith("…") and len(lead) <= 61
+    assert app["key_passages"]("", "anything") == ""
+
+
+@pytest.mark.parametrize("path", ["/header-utf8", "/bare-utf8", "/meta-latin1"])
+def test_fetch_article_text_decodes_the_page_charset(app, pages, path):
+    text = app["fetch_article_text"](f"{pages}{path}")
+    assert "Zürich and São Paulo" in text
+    assert app["get_content_cache"]().get(f"{pages}{path}") == (True, text)
+
+
+def test_fetch_article_text_caches_failures(app, pages):
+    for path in ["/pdf", "/missing"]:
+        assert app["fetch_article_text"](f"{pages}{path}") is None
+        assert app["get_content_cache"]().get(f"{pages}{path}") == (True, None)
+
+
+def test_content_cache_evicts_least_recently_used(app):
+    cache = app["ContentCache"](max_bytes=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get("a") == (True, "aaaa")      # a is now the most recent
+    cache.put("c", "cccc")
+    assert cache.get("b") == (False, None)
+    assert cache.get("a")[0] and cache.get("c")[0]
+    assert cache.size == 8
+    cache.put("huge", "x" * 11)                  # larger than the whole cache: not stored
+    assert cache.get("huge") == (False, None) and cache.size == 8
+
+
+def test_only_complete_fact_checks_are_cacheable(app):
+    cacheable = app["fact_check_cacheable"]
+    assert cacheable("✅ **全网事实核查 (Web Fact Check)**:\n- [a](b)\n\n**📄 来源摘录 (Key Passages)**\n> x")
+    assert not cacheable("✅ **全网事实核查 (Web Fact Check)**:\n- [a](b)\n\n(AI将基于上述搜索结果验证事件真实性)")
+    assert not cacheable("⚠️ 事实核查服务暂时不可用 (Connection Error)")
+    assert cacheable("⚠️ **事实核查警报**：全网未搜索到与此事件直接相关的权威新闻报道。")
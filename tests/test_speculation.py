@@ -0,0 +1,90 @@
+import collections
+import threading
+import time
+import types
+
+import pytest
+
+from conftest import load_app_defs
+
+
+class FakeJobs:
+    def __init__(self):
+        self.submitted = []
+        self.busy = False
+
+    def submit(self, session_id, history, market, priority=0):
+        self.submitted.append((session_id, history[0]["content"], market["slug"], priority))
+        return types.SimpleNamespace(id=len(self.submitted))
+
+    def get(self, job_id):
+        return types.SimpleNamespace(status="running") if self.busy else None
+
+    def collect(self, job_id):
+        return None
+
+    def queued(self):
+        return 1 if self.busy else 0
+
+    def running(self):
+        return 0
+
+
+@pytest.fixture
+def app():
+    jobs = FakeJobs()
+    matches = {
+        "Fed cuts rates": [{"slug": "fed-cut", "match_score": 0.9}],
+        "Oil jumps": [{"slug": "oil-90", "match_score": 0.6}],
+        "Local fair opens": [{"slug": "weather", "match_score": 0.1}],
+    }
+    cached = set()
+    ns = load_app_defs(
+        "SPECULATE_INTERVAL", "SPECULATE_TOP_HEADLINES", "SPECULATE_MIN_MATCH", "SpeculativeAnalyzer",
+        SPECULATE_BUDGET=2, PRIORITY_SPECULATIVE=2, collections=collections, threading=threading, time=time,
+        get_analysis_jobs=lambda: jobs,
+        get_match_matrix=lambda: types.SimpleNamespace(lookup=lambda headline: matches.get(headline, [])),
+        get_live_prices=lambda: types.SimpleNamespace(overlay=lambda market: market),
+        market_detail=lambda market: market,
+        analysis_cache_key=lambda history, market: (f"{market['slug']}:{history[0]['content']}", None, None),
+        get_analysis_cache=lambda: types.SimpleNamespace(contains=lambda key: key in cached),
+    )
+    ns.update(jobs=jobs, cached=cached)
+    return ns
+
+
+def news(*titles_and_sources):
+    return [{"title": title, "sources": sources} for title, sources in titles_and_sources]
+
+
+def test_offer_ranks_by_publisher_count(app):
+    speculator = app["SpeculativeAnalyzer"]()
+    speculator.offer(news(("Local fair opens", 1), ("Oil jumps", 3), ("Fed cuts rates", 5), ("Tie breaker", 3)))
+    assert speculator.headlines == ["Fed cuts rates", "Oil jumps", "Tie breaker", "Local fair opens"]
+
+
+def test_tick_submits_the_top_confident_match_once(app):
+    speculator = app["SpeculativeAnalyzer"]()
+    speculator.offer(news(("Local fair opens", 9), ("Fed cuts rates", 5), ("Oil jumps", 3)))
+    speculator.tick()
+    [(session_id, question, slug, priority)] = app["jobs"].submitted
+    assert session_id.startswith("speculative:") and priority == 2
+    assert (question, slug) == ("Analyze this news: Fed cuts rates", "fed-cut")
+    # The finished Fed memo is not resubmitted; the next headline is
+    speculator.tick()
+    assert [s[2] for s in app["jobs"].submitted] == ["fed-cut", "oil-90"]
+    assert speculator.stats()["budget_left"] == 0
+    speculator.tick()
+    assert len(app["jobs"].submitted) == 2
+
+
+def test_tick_waits_for_an_idle_pool_and_skips_cached_memos(app):
+    speculator = app["SpeculativeAnalyzer"]()
+    speculator.offer(news(("Fed cuts rates", 5), ("Oil jumps", 3)))
+    app["jobs"].busy = True
+    speculator.tick()
+    assert not app["jobs"].submitted and speculator.stats()["busy_skips"] == 1
+    app["jobs"].busy = False
+    app["cached"].add("fed-cut:Analyze this news: Fed cuts rates")
+    speculator.tick()
+    assert [s[2] for s in app["jobs"].submitted] == ["oil-90"]
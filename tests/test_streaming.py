@@ -0,0 +1,53 @@
+import codecs
+import json
+import os
+
+import pytest
+import requests
+
+from conftest import load_app_defs
+
+iter_json_array = load_app_defs("iter_json_array", json=json, codecs=codecs)["iter_json_array"]
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.data = text.encode("utf-8")
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.data), chunk_size):
+            yield self.data[i:i + chunk_size]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64])
+def test_scalars_split_across_chunks(chunk_size):
+    text = '[1, 23, 456, -7.5e3, true, null, "x", 1000000]'
+    assert list(iter_json_array(FakeResponse(text), chunk_size=chunk_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 9, 4096])
+def test_objects_and_multibyte_text(chunk_size):
+    items = [{"id": i, "title": f"Évènement {i} ✓", "markets": [{"p": 0.5}] * (i % 3)} for i in range(20)]
+    text = json.dumps(items, ensure_ascii=False)
+    assert list(iter_json_array(FakeResponse(text), chunk_size=chunk_size)) == items
+
+
+def test_truncated_array_raises():
+    with pytest.raises(ValueError):
+        list(iter_json_array(FakeResponse('[1, 2, {"a": '), chunk_size=4))
+
+
+def test_pruning_hook_keeps_only_read_fields():
+    app = load_app_defs("GAMMA_EVENT_FIELDS", "_prune_gamma_fields", "iter_json_array", json=json, codecs=codecs)
+    text = json.dumps([{"title": "Fed", "slug": "fed", "image": "x" * 1000, "tags": [{"label": "Rates"}],
+                        "markets": [{"id": "1", "question": "Cut?", "description": "long", "outcomePrices": '["0.6"]'}]}])
+    [event] = app["iter_json_array"](FakeResponse(text), chunk_size=16, object_pairs_hook=app["_prune_gamma_fields"])
+    assert event == {"title": "Fed", "slug": "fed", "markets": [{"id": "1", "question": "Cut?", "outcomePrices": '["0.6"]'}]}
+
+
+def test_gamma_events_stream_from_the_server(stub_server):
+    app = load_app_defs("GAMMA_EVENT_FIELDS", "_prune_gamma_fields", "iter_json_array", "iter_gamma_events",
+                        GAMMA_API_BASE=os.environ["GAMMA_API_BASE"], json=json, codecs=codecs, requests=requests)
+    events = list(app["iter_gamma_events"]({"closed": "false", "limit": 5, "offset": 0}))
+    assert len(events) == 5
+    assert all(set(e) <= app["GAMMA_EVENT_FIELDS"] and e["markets"] for e in events)
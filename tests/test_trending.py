@@ -0,0 +1,72 @@
+import bisect
+import math
+import random
+import threading
+
+import pytest
+
+from conftest import load_app_defs
+
+ns = load_app_defs("TrendingRanker", "TREND_HALF_LIFE", "TREND_TOP_K", "TREND_WEIGHTS", "TREND_REBASE_HALF_LIVES",
+                   bisect=bisect, math=math, threading=threading)
+TrendingRanker, HALF_LIFE, W = ns["TrendingRanker"], ns["TREND_HALF_LIFE"], ns["TREND_WEIGHTS"]
+
+
+def full_recompute(history):
+    """Reference: re-score every event from scratch, snapshot by snapshot."""
+    state = {}
+    for events, as_of in history:
+        current = {}
+        for e in events:
+            prev = state.get(e["slug"])
+            if prev is None:
+                score = W["price"] * abs(e["change_24h"]) * 100
+            else:
+                score = (prev["score"] * 0.5 ** ((as_of - prev["ts"]) / HALF_LIFE)
+                         + W["volume"] * math.log1p(max(e["volume"] - prev["volume"], 0))
+                         + W["price"] * abs(e["probability"] - prev["probability"]) * 100
+                         + W["liquidity"] * math.log1p(abs(e["liquidity"] - prev["liquidity"])))
+            current[e["slug"]] = dict(e, ts=as_of, score=score)
+        state = current
+    return state
+
+
+def snapshots(n_snapshots, step, seed=3):
+    rng = random.Random(seed)
+    events = {f"e{i}": {"slug": f"e{i}", "volume": rng.uniform(1e3, 1e6), "probability": rng.random(),
+                        "liquidity": rng.uniform(1e3, 1e5), "change_24h": rng.uniform(-0.1, 0.1)} for i in range(300)}
+    next_id, as_of = 300, 1_700_000_000.0
+    for _ in range(n_snapshots):
+        for e in rng.sample(list(events.values()), 20):
+            e.update(volume=e["volume"] + rng.uniform(0, 5e4), probability=min(max(e["probability"] + rng.uniform(-0.05, 0.05), 0), 1))
+        for slug in rng.sample(sorted(events), 3):
+            del events[slug]
+        for _ in range(3):
+            events[f"e{next_id}"] = {"slug": f"e{next_id}", "volume": rng.uniform(1e3, 1e6), "probability": rng.random(),
+                                     "liquidity": rng.uniform(1e3, 1e5), "change_24h": rng.uniform(-0.1, 0.1)}
+            next_id += 1
+        as_of += step
+        yield [dict(e) for e in events.values()], as_of
+
+
+@pytest.mark.parametrize("step", [60, HALF_LIFE * 100])   # the second one forces re-anchoring the scale
+def test_matches_full_recompute(step):
+    ranker, history = TrendingRanker(top_k=50), []
+    for events, as_of in snapshots(40, step):
+        ranker.observe(events, as_of)
+        history.append((events, as_of))
+    expected = full_recompute(history)
+    by_volume = sorted(expected, key=lambda s: -expected[s]["volume"])[:50]
+    assert [e["slug"] for e in ranker.top("volume", 50)] == by_volume
+    active = ranker.top("active", 50)
+    assert [e["slug"] for e in active] == sorted(expected, key=lambda s: -expected[s]["score"])[:50]
+    for e in active:
+        assert e["trend_score"] == pytest.approx(expected[e["slug"]]["score"], rel=1e-9, abs=1e-12)
+
+
+def test_stale_snapshot_is_ignored():
+    ranker = TrendingRanker()
+    events, as_of = next(snapshots(1, 60))
+    ranker.observe(events, as_of)
+    ranker.observe([], as_of)
+    assert len(ranker.top("volume", 10)) == 10
@@ -0,0 +1,68 @@
+import time
+
+from conftest import set_topic_prices
+
+POLL_WAIT = 7   # one LIVE_POLL_INTERVAL plus slack
+
+
+def search(at, query):
+    at.text_area(key="news_input_box").input(query)
+    next(b for b in at.button if b.label == "Begin Analysis").click().run()
+    return at.session_state["search_candidates"]
+
+
+def add_rule(at, kind, threshold, idx=0):
+    at.selectbox(key=f"watch_kind_{idx}").set_value(kind).run()
+    at.number_input(key=f"watch_thr_{idx}").set_value(threshold).run()
+    at.button(key=f"watch_add_{idx}").click().run()
+
+
+def alerts_after_poll(at):
+    time.sleep(POLL_WAIT)
+    at.run()
+    return [c.value for c in at.caption if c.value.startswith("🔔")]
+
+
+def test_rule_follows_the_outcome_the_popover_shows(stub_server, new_session):
+    set_topic_prices(stub_server, "Fed", yes=0.2)
+    at = new_session()
+    slugs = search(at, "Fed signals interest rate cut as inflation cools")
+    assert slugs[0].startswith("fed-")
+    assert "No price" in at.selectbox(key="watch_kind_0").label
+    add_rule(at, "below", 70)
+    assert not at.exception
+    assert alerts_after_poll(at) == []
+
+    set_topic_prices(stub_server, "Fed", yes=0.35)
+    alerts = alerts_after_poll(at)
+    assert len(alerts) == 1 and "No" in alerts[0] and "below" in alerts[0]
+
+
+def test_threshold_already_passed_does_not_fire_on_first_price(stub_server, new_session):
+    set_topic_prices(stub_server, "Oil", yes=0.7)
+    at = new_session()
+    assert search(at, "Traders expect oil to trade above $90")[0].startswith("oil-")
+    add_rule(at, "above", 50)
+    assert alerts_after_poll(at) == []
+    assert alerts_after_poll(at) == []
+
+    set_topic_prices(stub_server, "Oil", yes=0.4)
+    assert alerts_after_poll(at) == []
+    set_topic_prices(stub_server, "Oil", yes=0.7)
+    assert len(alerts_after_poll(at)) == 1
+
+
+def test_move_rule_arms_from_the_live_price(stub_server, new_session):
+    set_topic_prices(stub_server, "Tesla", yes=0.6)
+    at = new_session()
+    query = "Tesla deliveries beat estimates on strong demand"
+    slug = search(at, query)[0]
+    # Opening the market puts it on the live poll list before any rule exists
+    at.button(key="btn_0").click().run()
+    time.sleep(POLL_WAIT)
+    at.run()
+    next(b for b in at.button if b.label == "⬅️ Start New Analysis").click().run()
+    add_rule(at, "move", 5, idx=search(at, query).index(slug))
+    set_topic_prices(stub_server, "Tesla", yes=0.67)
+    alerts = alerts_after_poll(at)
+    assert len(alerts) == 1 and "moved" in alerts[0]
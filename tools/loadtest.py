@@ -0,0 +1,407 @@
+"""
+Multi-session load test for streamlit_app.py against local stand-in upstreams.
+
+One `streamlit run` server is started on the app, and every simulated analyst is
+a websocket client of it speaking the same /_stcore/stream protocol as a browser
+tab: dashboard load -> news feed tick -> search -> market selection -> analysis
+-> follow-up questions. All sessions therefore share one process, with its
+cache_resource pools, caches, mirror and LLM router, exactly as in production.
+Gamma, Binance, RSS, Exa and Gemini are served by tools/upstream_stubs.py with
+configurable latency and error injection.
+
+    python tools/loadtest.py --sessions 20 --iterations 3
+    python tools/loadtest.py --sessions 50 --upstream gemini:latency=4,error=0.05 --json report.json
+
+Reports throughput, per-stage latency percentiles, and the server's CPU and RSS memory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from upstream_stubs import TOPICS, UPSTREAMS, UpstreamProfile, start_stub_server, stub_environment  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+STAGES = ["dashboard", "news_tick", "search", "selection", "analysis", "follow_up"]
+RUN_DONE = {ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR}
+
+
+def parse_upstream(spec):
+    """'gemini:latency=2,error=0.1,jitter=0.3' -> ("gemini", UpstreamProfile(...))"""
+    name, _, opts = spec.partition(":")
+    if name not in UPSTREAMS:
+        raise argparse.ArgumentTypeError(f"unknown upstream {name!r} (choose from {', '.join(UPSTREAMS)})")
+    profile = UpstreamProfile()
+    for opt in filter(None, opts.split(",")):
+        key, _, value = opt.partition("=")
+        key = {"error": "error_rate"}.get(key, key)
+        if not hasattr(profile, key):
+            raise argparse.ArgumentTypeError(f"unknown option {key!r}")
+        setattr(profile, key, float(value))
+    return name, profile
+
+
+def read_rss_mb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def read_cpu_seconds(pid):
+    """utime + stime of a process (Linux /proc)."""
+    try:
+        with open(f"/proc/{pid}/stat") as fh:
+            fields = fh.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except OSError:
+        return 0.0
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.samples = {}      # first error message seen per stage
+
+    async def time(self, stage, step):
+        start = time.perf_counter()
+        error = None
+        try:
+            client = await step
+            if client is not None and client.exceptions():
+                error = client.exceptions()[0]
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        self.latencies[stage].append(time.perf_counter() - start)
+        if error:
+            self.errors[stage] += 1
+            self.samples.setdefault(stage, error)
+        return error is None
+
+
+class AppClient:
+    """
+    A browser tab, minus the rendering: keeps the element tree the server streams
+    (delta path -> element / block), sends widget states on each rerun, and fires
+    the run_every fragments the server asks for (st.fragment timers live in the
+    browser, so a client that never fires them never sees a finished job).
+    """
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.elements = {}       # delta path -> Element
+        self.blocks = {}         # delta path -> Block
+        self.touched = set()
+        self.values = {}         # widget id -> WidgetState carried into every rerun
+        self.fragments = {}      # fragment id -> auto-rerun interval
+        self.started = asyncio.Event()
+        self.idle = asyncio.Event()
+        self.ws = None
+        self.reader = None
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None, open_timeout=self.timeout)
+        self.reader = asyncio.create_task(self._read())
+        return await self.rerun()
+
+    async def close(self):
+        if self.reader: self.reader.cancel()
+        if self.ws: await self.ws.close()
+
+    async def _read(self):
+        async for data in self.ws:
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                if not msg.new_session.fragment_ids_this_run:
+                    # A full run re-registers the fragment timers of whatever it draws
+                    self.touched, self.fragments = set(), {}
+                self.idle.clear()
+                self.started.set()
+            elif kind == "delta":
+                path = tuple(msg.metadata.delta_path)
+                self.touched.add(path)
+                if msg.delta.HasField("new_element"):
+                    self.elements[path] = msg.delta.new_element
+                    self.blocks.pop(path, None)
+                elif msg.delta.HasField("add_block"):
+                    self.blocks[path] = msg.delta.add_block
+                    self.elements.pop(path, None)
+            elif kind == "auto_rerun":
+                self.fragments[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+            elif kind == "script_finished" and msg.script_finished in RUN_DONE:
+                if msg.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY:
+                    # A full run redraws the page: whatever it did not touch is gone
+                    self.elements = {p: e for p, e in self.elements.items() if p in self.touched}
+                    self.blocks = {p: b for p, b in self.blocks.items() if p in self.touched}
+                self.idle.set()
+
+    async def rerun(self, *triggers, fragment_id=""):
+        """Send a rerun (with the current widget values plus one-shot triggers) and wait until it settles."""
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.fragment_id = fragment_id
+        state.is_auto_rerun = bool(fragment_id)
+        state.widget_states.widgets.extend(list(self.values.values()) + list(triggers))
+        self.started.clear()
+        await self.ws.send(msg.SerializeToString())
+        await asyncio.wait_for(self.started.wait(), self.timeout)
+        await asyncio.wait_for(self.idle.wait(), self.timeout)
+        return self
+
+    async def tick(self):
+        """One round of the page's run_every fragments (news feed, live odds, job status...)."""
+        for fragment_id in list(self.fragments):
+            if fragment_id not in self.fragments:
+                continue    # dropped by a full run earlier in this round
+            try:
+                await self.rerun(fragment_id=fragment_id)
+            except asyncio.TimeoutError:
+                # The server ignores reruns of fragments a full run removed
+                self.fragments.pop(fragment_id, None)
+        return self
+
+    # --- Reading the page ---
+    def _ordered(self, items):
+        return [v for _, v in sorted(items.items())]
+
+    def widgets(self, kind):
+        return [getattr(e, kind) for e in self._ordered(self.elements) if e.WhichOneof("type") == kind]
+
+    def exceptions(self):
+        return [e.exception.message for e in self._ordered(self.elements) if e.WhichOneof("type") == "exception"]
+
+    def chat_roles(self):
+        return [b.chat_message.name for b in self._ordered(self.blocks) if b.WhichOneof("type") == "chat_message"]
+
+    def find(self, kind, label=None, key=None):
+        for widget in self.widgets(kind):
+            if (label and widget.label == label) or (key and widget.id.endswith(f"-{key}")):
+                return widget
+        raise LookupError(label or key)
+
+    # --- Acting on it ---
+    async def type_text(self, key, text):
+        widget = self.find("text_area", key=key)
+        self.values[widget.id] = WidgetState(id=widget.id, string_value=text)
+
+    async def click(self, label=None, key=None):
+        return await self.rerun(WidgetState(id=self.find("button", label=label, key=key).id, trigger_value=True))
+
+    async def chat(self, text):
+        widget = self.widgets("chat_input")[0]
+        state = WidgetState(id=widget.id)
+        state.chat_input_value.data = text
+        return await self.rerun(state)
+
+
+def reply_ready(client):
+    """The pending turn is answered: the chat input is enabled again and the last turn is the assistant's."""
+    inputs = client.widgets("chat_input")
+    roles = client.chat_roles()
+    return bool(inputs) and not inputs[0].disabled and bool(roles) and roles[-1] == "assistant"
+
+
+async def wait_for_reply(client, timeout):
+    """Fire the page's fragment timers until the background job's answer is on the page."""
+    deadline = time.monotonic() + timeout
+    while not reply_ready(client):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"no reply within {timeout:g}s")
+        await asyncio.sleep(0.5)
+        await client.tick()
+    return client
+
+
+async def search(client, headline):
+    await client.type_text("news_input_box", headline)
+    await client.click(label="Begin Analysis")
+    if not any(b.id.endswith("-btn_0") or b.label.startswith("📝 Analyze News Only") for b in client.widgets("button")):
+        raise RuntimeError("search did not reach the market selection")
+    return client
+
+
+async def select(client, label):
+    await client.click(label=label)
+    if not client.widgets("chat_input"):
+        raise RuntimeError("selection did not open the analysis view")
+    return client
+
+
+async def ask(client, question, timeout):
+    await client.chat(question)
+    return await wait_for_reply(client, timeout)
+
+
+async def run_session(session_no, args, url, rec):
+    rng = random.Random(session_no)
+    for _ in range(args.iterations):
+        client = AppClient(url, args.timeout)
+        try:
+            if not await rec.time("dashboard", client.connect()): continue
+            if not await rec.time("news_tick", client.tick()): continue
+
+            headline = rng.choice(TOPICS)[2]
+            if not await rec.time("search", search(client, headline)): continue
+
+            analyze = [b for b in client.widgets("button") if b.id.endswith("-btn_0")]
+            label = "Analyze This" if analyze else "📝 Analyze News Only (AI Fact Check + Analysis)"
+            if not await rec.time("selection", select(client, label)): continue
+            if not await rec.time("analysis", wait_for_reply(client, args.timeout)): continue
+
+            for n in range(args.follow_ups):
+                if not await rec.time("follow_up", ask(client, f"What is the downside risk? ({n})", args.timeout)):
+                    break
+        finally:
+            await client.close()
+
+
+async def run_sessions(args, url, rec):
+    await asyncio.gather(*(run_session(i, args, url, rec) for i in range(args.sessions)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app_server(workdir, port, timeout=120):
+    """`streamlit run` the app headless on `port` (environment inherited); returns the Popen once it is healthy."""
+    secrets = os.path.join(workdir, "secrets.toml")
+    with open(secrets, "w") as fh:
+        fh.write('GOOGLE_API_KEY = "stub-key"\nEXA_API_KEY = "stub-key"\n')
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless", "true",
+         "--server.address", "127.0.0.1", "--server.port", str(port), "--server.enableXsrfProtection", "false",
+         "--server.enableCORS", "false", "--browser.gatherUsageStats", "false", "--secrets.files", secrets],
+        stdout=open(os.path.join(workdir, "server.log"), "wb"), stderr=subprocess.STDOUT, cwd=workdir,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"streamlit exited with {proc.returncode}; see {workdir}/server.log")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=2) as resp:
+                if resp.status == 200: return proc
+        except OSError:
+            time.sleep(0.5)
+    proc.kill()
+    raise RuntimeError(f"streamlit did not come up within {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent simulated analysts")
+    parser.add_argument("--iterations", type=int, default=2, help="full flows per session")
+    parser.add_argument("--follow-ups", type=int, default=1, help="follow-up questions per analysis")
+    parser.add_argument("--latency", type=float, default=0.05, help="default upstream latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="default upstream error rate")
+    parser.add_argument("--upstream", type=parse_upstream, action="append", default=[],
+                        help="per-upstream override, e.g. gemini:latency=3,error=0.05")
+    parser.add_argument("--llm", choices=["gemini", "openai"], default="gemini", help="which stand-in LLM API the app uses")
+    parser.add_argument("--timeout", type=float, default=120, help="per-step timeout (s)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    profiles = {name: UpstreamProfile(latency=args.latency, error_rate=args.error_rate) for name in UPSTREAMS}
+    profiles.update(dict(args.upstream))
+    server, base = start_stub_server(profiles=profiles)
+
+    workdir = tempfile.mkdtemp(prefix="beholmes-loadtest-")
+    os.environ.update(stub_environment(base, os.path.join(workdir, "feeds.json")))
+    os.environ.update({
+        "SHARED_CACHE_PATH": os.path.join(workdir, "shared_cache.sqlite3"),
+        "SESSION_SPILL_PATH": os.path.join(workdir, "sessions.sqlite3"),
+        "ANALYSIS_HISTORY_PATH": os.path.join(workdir, "history.sqlite3"),
+        "CATALOG_MIRROR_PATH": os.path.join(workdir, "catalog.sqlite3"),
+        "LLM_PROVIDERS": args.llm,
+    })
+    port = free_port()
+    app = start_app_server(workdir, port)
+
+    rss_samples = []
+    stop = threading.Event()
+    def sample_memory():
+        while not stop.is_set():
+            rss_samples.append(read_rss_mb(app.pid))
+            stop.wait(0.5)
+    threading.Thread(target=sample_memory, daemon=True).start()
+
+    rec = Recorder()
+    cpu_start = read_cpu_seconds(app.pid)
+    wall_start = time.perf_counter()
+    try:
+        asyncio.run(run_sessions(args, f"ws://127.0.0.1:{port}/_stcore/stream", rec))
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = read_cpu_seconds(app.pid) - cpu_start
+        stop.set()
+        app.terminate()
+        app.wait(timeout=30)
+        server.shutdown()
+
+    def pct(values, q):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))] if values else 0.0
+
+    report = {
+        "sessions": args.sessions,
+        "iterations": args.iterations,
+        "wall_seconds": round(wall, 2),
+        "completed_analyses": len(rec.latencies["analysis"]) - rec.errors["analysis"],
+        "analyses_per_minute": round((len(rec.latencies["analysis"]) - rec.errors["analysis"]) / wall * 60, 2),
+        "cpu_seconds": round(cpu, 2),
+        "cpu_utilization": round(cpu / wall, 2),
+        "rss_mb": {"peak": round(max(rss_samples or [0]), 1), "mean": round(statistics.mean(rss_samples or [0]), 1)},
+        "error_samples": rec.samples,
+        "stages": {
+            stage: {
+                "count": len(rec.latencies[stage]),
+                "errors": rec.errors[stage],
+                "p50": round(pct(rec.latencies[stage], 50), 3),
+                "p90": round(pct(rec.latencies[stage], 90), 3),
+                "p99": round(pct(rec.latencies[stage], 99), 3),
+                "max": round(max(rec.latencies[stage] or [0]), 3),
+            } for stage in STAGES
+        },
+    }
+
+    print(f"\n{args.sessions} sessions x {args.iterations} iterations in {report['wall_seconds']}s "
+          f"| {report['analyses_per_minute']} analyses/min | server CPU {report['cpu_utilization']:.0%} "
+          f"| server RSS peak {report['rss_mb']['peak']} MB")
+    print(f"{'stage':<12}{'count':>7}{'errors':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    for stage, s in report["stages"].items():
+        print(f"{stage:<12}{s['count']:>7}{s['errors']:>8}{s['p50']:>9}{s['p90']:>9}{s['p99']:>9}{s['max']:>9}")
+    for stage, message in rec.samples.items():
+        print(f"  first {stage} error: {message[:200]}")
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
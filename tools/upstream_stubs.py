@@ -0,0 +1,291 @@
+"""
+Local stand-in servers for every upstream Be Holmes talks to:
+Polymarket Gamma, Binance, RSS feeds, Exa, Gemini (REST), an
+OpenAI-compatible chat endpoint and a sink for watchlist webhooks.
+Each upstream gets its own latency and error-injection profile so load
+tests can model slow or flaky providers without touching the real services.
+
+    server, base = start_stub_server(profiles={"gemini": UpstreamProfile(latency=2.0)})
+    os.environ.update(stub_environment(base))
+"""
+import json
+import random
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+UPSTREAMS = ["gamma", "binance", "rss", "exa", "gemini", "openai", "webhook"]
+
+TOPICS = [
+    ("Fed", "Will the Fed cut interest rates in {m}?", "Fed signals interest rate cut as inflation cools"),
+    ("Bitcoin", "Will Bitcoin close above $100k in {m}?", "Bitcoin surges past $100k as ETF inflows climb"),
+    ("SpaceX", "SpaceX IPO before {m}?", "SpaceX files confidentially for IPO, sources say"),
+    ("Election", "Will the incumbent win the {m} election?", "Incumbent leads new election poll by five points"),
+    ("Oil", "Will oil trade above $90 in {m}?", "Oil jumps as OPEC extends production cuts"),
+    ("AI", "Will OpenAI release GPT-6 before {m}?", "OpenAI teases next model release at developer event"),
+    ("Tesla", "Will Tesla deliver 500k cars in {m}?", "Tesla deliveries beat estimates on strong demand"),
+    ("Ukraine", "Ceasefire in Ukraine before {m}?", "Diplomats meet as ceasefire talks resume"),
+]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
+SYMBOLS = ["BTC", "ETH", "SOL", "BNB", "XRP", "DOGE", "ADA", "AVAX", "SHIB", "DOT", "LINK", "TRX",
+           "MATIC", "LTC", "BCH", "UNI", "NEAR", "APT", "FIL", "ICP", "PEPE", "WIF", "SUI", "FET"]
+CATEGORIES = ["all", "politics", "web3", "tech"]
+
+
+@dataclass
+class UpstreamProfile:
+    latency: float = 0.05      # mean seconds added to every response
+    jitter: float = 0.5        # +/- fraction of latency
+    error_rate: float = 0.0    # probability of a 503
+
+    def delay(self):
+        if self.latency > 0:
+            time.sleep(max(0.0, random.uniform(self.latency * (1 - self.jitter), self.latency * (1 + self.jitter))))
+
+
+class StubCatalog:
+    """Deterministic synthetic market catalog whose prices drift over time."""
+
+    def __init__(self, n_events=600, seed=7):
+        rng = random.Random(seed)
+        self.events = []
+        self.markets = {}
+        self.market_event = {}
+        self.lock = threading.Lock()
+        self.webhook_posts = []
+        market_id = 100000
+        for i in range(n_events):
+            topic, question, _ = TOPICS[i % len(TOPICS)]
+            month = MONTHS[(i // len(TOPICS)) % 12]
+            markets = []
+            # Most events carry a handful of sub-markets; every 25th is a large ladder
+            for j in range(30 if i % 25 == 0 else rng.randint(1, 8)):
+                market_id += 1
+                p = round(rng.uniform(0.03, 0.97), 3)
+                market = {
+                    "id": str(market_id),
+                    "question": question.format(m=f"{month} {2026 + j}"),
+                    "outcomes": json.dumps(["Yes", "No"]),
+                    "outcomePrices": json.dumps([str(p), str(round(1 - p, 3))]),
+                    "volume": str(round(rng.uniform(2_000, 5_000_000), 2)),
+                    "liquidity": str(round(rng.uniform(1_000, 500_000), 2)),
+                    "oneDayPriceChange": round(rng.uniform(-0.1, 0.1), 3),
+                    # Last trades spread over the day before the catalog's snapshot time
+                    "updatedAt": f"2026-10-18T{(market_id // 60) % 24:02d}:{market_id % 60:02d}:00Z",
+                }
+                markets.append(market)
+                self.markets[market["id"]] = market
+            self.events.append({
+                "id": str(i + 1),
+                "slug": f"{topic.lower()}-{month.lower()}-{i}",
+                "title": f"{topic}: {question.format(m=month)}",
+                "closed": False,
+                "updatedAt": "2026-10-19T00:00:00Z",
+                "markets": markets,
+            })
+            for market in markets:
+                self.market_event[market["id"]] = self.events[-1]
+
+    def drift(self, close_rate=0.02):
+        """Move a few prices and occasionally close an event.
+
+        Like Gamma, a price move bumps the market's updatedAt but not its event's;
+        closing an event does bump the event.
+        """
+        with self.lock:
+            now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+            for market in random.sample(list(self.markets.values()), k=min(20, len(self.markets))):
+                p = float(json.loads(market["outcomePrices"])[0])
+                p = min(max(p + random.uniform(-0.03, 0.03), 0.01), 0.99)
+                market["outcomePrices"] = json.dumps([f"{p:.3f}", f"{1 - p:.3f}"])
+                market["volume"] = str(float(market["volume"]) + random.uniform(0, 20_000))
+                market["updatedAt"] = now
+            if random.random() < close_rate:
+                event = random.choice([e for e in self.events if not e["closed"]])
+                event["closed"], event["updatedAt"] = True, now
+
+
+def make_handler(catalog, profiles):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _upstream(self):
+            if "/v1beta/" in self.path: return "gemini"
+            return self.path.lstrip("/").split("/", 1)[0]
+
+        def _send(self, status, body, content_type="application/json"):
+            data = body if isinstance(body, bytes) else json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _inject(self):
+            profile = profiles.get(self._upstream(), UpstreamProfile())
+            profile.delay()
+            if random.random() < profile.error_rate:
+                self._send(503, {"error": "injected failure"})
+                return True
+            return False
+
+        def do_GET(self):
+            if self._inject(): return
+            url = urllib.parse.urlparse(self.path)
+            qs = urllib.parse.parse_qs(url.query)
+            upstream = self._upstream()
+            if upstream == "gamma" and url.path.endswith("/events"):
+                self._send(200, self._events(qs))
+            elif upstream == "gamma" and url.path.endswith("/markets") and "id" in qs:
+                with catalog.lock:
+                    self._send(200, [catalog.markets[i] for i in qs.get("id", []) if i in catalog.markets])
+            elif upstream == "gamma" and url.path.endswith("/markets"):
+                self._send(200, self._markets(qs))
+            elif upstream == "binance":
+                self._send(200, [{
+                    "symbol": f"{s}USDT", "lastPrice": str(random.uniform(0.1, 90_000)),
+                    "priceChangePercent": str(random.uniform(-8, 8)), "volume": str(random.uniform(1e4, 1e8)),
+                } for s in SYMBOLS])
+            elif upstream == "rss":
+                self._send(200, self._rss(url.path.rsplit("/", 1)[-1].replace(".xml", "")), "application/rss+xml")
+            elif upstream == "article":
+                # Page chrome around a few paragraphs of body copy, like a real article
+                paragraphs = "".join(f"<p>{headline}, according to people familiar with the matter. "
+                                     f"Analysts said the move could reshape expectations for {topic.lower()} over the coming months.</p>"
+                                     for topic, _, headline in TOPICS)
+                page = (f"<html><head><script>var tracking = 1;</script><style>p {{}}</style></head><body>"
+                        f"<nav><a href='/'>Home</a> <a href='/markets'>Markets</a></nav>"
+                        f"<article><h1>Report {url.path.rsplit('/', 1)[-1]}</h1>{paragraphs}</article>"
+                        f"<footer>© Stub News</footer></body></html>")
+                self._send(200, page.encode(), "text/html")
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self._inject(): return
+            upstream = self._upstream()
+            if upstream == "exa":
+                query = payload.get("query", "")
+                slugs = [e["slug"] for e in catalog.events[:5]]
+                self._send(200, {"results": [{
+                    "id": f"r{i}", "title": f"{query} report {i}", "score": 0.9 - i * 0.1,
+                    "url": f"https://polymarket.com/event/{slug}" if "polymarket" in query else f"http://{self.headers['Host']}/article/{i}",
+                    "publishedDate": "2026-10-19", "author": "Stub",
+                } for i, slug in enumerate(slugs)]})
+            elif upstream == "gemini":
+                self._send(200, {"candidates": [{
+                    "content": {"role": "model", "parts": [{"text": self._memo(payload)}]},
+                    "finishReason": "STOP", "index": 0,
+                }]})
+            elif upstream == "webhook":
+                with catalog.lock:
+                    catalog.webhook_posts.append(payload)
+                self._send(200, {"ok": True})
+            elif upstream == "openai":
+                self._send(200, {
+                    "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": payload.get("model", "stub"),
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": self._memo(payload)}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+            else:
+                self._send(404, {"error": "not found"})
+
+        def _events(self, qs):
+            limit = int(qs.get("limit", ["500"])[0])
+            offset = int(qs.get("offset", ["0"])[0])
+            events = catalog.events
+            if qs.get("closed") == ["false"]:
+                events = [e for e in events if not e["closed"]]
+            if qs.get("order") == ["updatedAt"]:
+                events = sorted(events, key=lambda e: e["updatedAt"], reverse=qs.get("ascending") != ["true"])
+            if "slug" in qs:
+                events = [e for e in events if e["slug"] == qs["slug"][0]]
+            elif "q" in qs:
+                words = [w for w in qs["q"][0].lower().split() if len(w) > 2]
+                events = [e for e in events if any(w in e["title"].lower() for w in words)]
+            with catalog.lock:
+                return json.loads(json.dumps(events[offset:offset + limit]))
+
+        def _markets(self, qs):
+            """The /markets listing: each market carries its parent event, as on Gamma."""
+            limit = int(qs.get("limit", ["500"])[0])
+            offset = int(qs.get("offset", ["0"])[0])
+            with catalog.lock:
+                markets = list(catalog.markets.values())
+                if qs.get("closed") == ["false"]:
+                    markets = [m for m in markets if not catalog.market_event[m["id"]]["closed"]]
+                if qs.get("order") == ["updatedAt"]:
+                    markets = sorted(markets, key=lambda m: m["updatedAt"], reverse=qs.get("ascending") != ["true"])
+                page = []
+                for m in markets[offset:offset + limit]:
+                    event = catalog.market_event[m["id"]]
+                    page.append(dict(m, events=[{"id": event["id"], "slug": event["slug"], "title": event["title"]}]))
+                return json.loads(json.dumps(page))
+
+        def _rss(self, category):
+            now = time.time()
+            items = []
+            for i in range(30):
+                _, _, headline = TOPICS[(i + CATEGORIES.index(category) if category in CATEGORIES else i) % len(TOPICS)]
+                stamp = int(now // 60) - i * 7   # a new item roughly every minute
+                items.append(
+                    f"<item><title>{headline} ({stamp % 1000})</title><link>http://stub/{category}/{stamp}</link>"
+                    f"<guid>{category}-{stamp}</guid><pubDate>{formatdate(stamp * 60, usegmt=True)}</pubDate>"
+                    f"<source url=\"http://stub\">Stub {category.title()}</source></item>"
+                )
+            return f"<?xml version=\"1.0\"?><rss version=\"2.0\"><channel><title>{category}</title>{''.join(items)}</channel></rss>".encode()
+
+        @staticmethod
+        def _memo(payload):
+            if "contents" in payload:   # Gemini
+                prompt = " ".join(p.get("text", "") for c in payload["contents"] for p in c.get("parts", []))
+            else:                       # OpenAI-compatible
+                prompt = " ".join(m.get("content", "") for m in payload.get("messages", []))
+            if "keywords for searching on Polymarket" in prompt:
+                words = prompt.rsplit("Input:", 1)[-1].split()
+                return " ".join(w for w in words if len(w) > 3)[:40] or "news"
+            return "### Stub Memo\n\n" + "Lorem ipsum dolor sit amet. " * 60
+
+    return StubHandler
+
+
+def start_stub_server(host="127.0.0.1", port=0, profiles=None, n_events=600, drift_every=5.0):
+    """Start the stand-in server in a daemon thread. Returns (server, base_url)."""
+    catalog = StubCatalog(n_events=n_events)
+    server = ThreadingHTTPServer((host, port), make_handler(catalog, profiles or {}))
+    server.daemon_threads = True
+    server.catalog = catalog
+    threading.Thread(target=server.serve_forever, daemon=True, name="upstream-stubs").start()
+
+    def drift():
+        while True:
+            time.sleep(drift_every)
+            catalog.drift()
+    threading.Thread(target=drift, daemon=True, name="upstream-drift").start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def stub_environment(base, feeds_file):
+    """Settings that point the app at the stand-in server (see get_setting in streamlit_app.py)."""
+    with open(feeds_file, "w", encoding="utf-8") as fh:
+        json.dump({"replace_defaults": True, "feeds": [
+            {"name": f"Stub {c.title()}", "category": c, "url": f"{base}/rss/{c}.xml"} for c in CATEGORIES
+        ]}, fh)
+    return {
+        "GAMMA_API_BASE": f"{base}/gamma",
+        "BINANCE_API_BASE": f"{base}/binance",
+        "EXA_API_BASE": f"{base}/exa",
+        "GEMINI_API_ENDPOINT": base,
+        "OPENAI_BASE_URL": f"{base}/openai/v1",
+        "NEWS_FEEDS_FILE": feeds_file,
+        "WATCHLIST_WEBHOOK_URL": f"{base}/webhook",
+    }